@@ -0,0 +1,239 @@
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+
+from .models.attachment import AttachmentBlob
+
+load_dotenv()
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+# Python/app/attachment_store.py -> project root (BTG-GASIGY-COMBINED/)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The .NET UserPanel resolves stored attachment paths against its content root
+DOTNET_CONTENT_ROOT = os.getenv(
+    "DOTNET_CONTENT_ROOT", os.path.join(PROJECT_ROOT, "API", "UserPanel", "UserPanel")
+)
+UPLOADED_FILES_MARKER = "UploadedFiles"
+
+# Blobs live inside the .NET UploadedFiles tree so both apps can open them
+ATTACHMENT_STORE_DIR = Path(
+    os.getenv("ATTACHMENT_STORE_DIR", os.path.join(DOTNET_CONTENT_ROOT, UPLOADED_FILES_MARKER, "blobs"))
+)
+# Where blobs were written before the store moved. Still served; a re-upload of
+# the same content is rewritten into ATTACHMENT_STORE_DIR.
+LEGACY_ATTACHMENT_STORE_DIR = Path(__file__).parent / "uploads" / "blobs"
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Extension -> accepted content types. Browsers sometimes send a generic type,
+# so application/octet-stream is accepted for every extension.
+ALLOWED_TYPES = {
+    ".pdf": {"application/pdf"},
+    ".png": {"image/png"},
+    ".jpg": {"image/jpeg", "image/pjpeg"},
+    ".jpeg": {"image/jpeg", "image/pjpeg"},
+    ".gif": {"image/gif"},
+    ".bmp": {"image/bmp", "image/x-ms-bmp"},
+    ".webp": {"image/webp"},
+    ".tif": {"image/tiff"},
+    ".tiff": {"image/tiff"},
+    ".doc": {"application/msword"},
+    ".docx": {"application/vnd.openxmlformats-officedocument.wordprocessingml.document"},
+    ".xls": {"application/vnd.ms-excel"},
+    ".xlsx": {"application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+    ".csv": {"text/csv", "application/vnd.ms-excel", "text/plain"},
+    ".txt": {"text/plain"},
+}
+GENERIC_CONTENT_TYPES = {"", "application/octet-stream", "binary/octet-stream"}
+
+
+@dataclass
+class StoredAttachment:
+    attachment_id: int
+    sha256: str
+    path: str
+    size_bytes: int
+    content_type: Optional[str]
+    original_name: str
+    deduplicated: bool
+
+
+# ----------------------------------------------------------
+# HELPERS (run in the threadpool, never on the event loop)
+# ----------------------------------------------------------
+def _open_temp_file():
+    tmp_dir = ATTACHMENT_STORE_DIR / ".tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    # Same filesystem as the store so the final move is an atomic rename
+    return tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False)
+
+
+def _write_chunk(tmp, hasher, chunk: bytes):
+    hasher.update(chunk)
+    tmp.write(chunk)
+
+
+def _discard(tmp):
+    try:
+        tmp.close()
+    finally:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+
+
+def _commit_blob(tmp, sha256: str, ext: str) -> tuple:
+    """Moves the temp file to its content-addressed location. Returns (path, already_existed)."""
+    tmp.close()
+    target_dir = ATTACHMENT_STORE_DIR / sha256[:2]
+    target_dir.mkdir(parents=True, exist_ok=True)
+    target = target_dir / f"{sha256}{ext}"
+
+    if target.exists():
+        os.remove(tmp.name)
+        return str(target), True
+
+    os.replace(tmp.name, target)
+    return str(target), False
+
+
+def _in_store(path: str) -> bool:
+    store = os.path.abspath(ATTACHMENT_STORE_DIR)
+    try:
+        return os.path.commonpath([os.path.abspath(path), store]) == store
+    except ValueError:
+        return False
+
+
+def _validate_type(filename: str, content_type: Optional[str]) -> str:
+    ext = Path(filename).suffix.lower()
+    if ext not in ALLOWED_TYPES:
+        raise HTTPException(status_code=415, detail=f"File type '{ext or filename}' is not allowed")
+
+    ctype = (content_type or "").split(";")[0].strip().lower()
+    if ctype not in GENERIC_CONTENT_TYPES and ctype not in ALLOWED_TYPES[ext]:
+        raise HTTPException(status_code=415, detail=f"Content type '{ctype}' does not match '{ext}'")
+    return ext
+
+
+# ----------------------------------------------------------
+# PUBLIC ENTRY POINT
+# ----------------------------------------------------------
+def content_root_path(path: str) -> str:
+    """
+    The form the .NET app stores and downloads: relative to DOTNET_CONTENT_ROOT,
+    e.g. "UploadedFiles/blobs/ab/<sha256>.pdf". Paths outside the content root
+    come back unchanged.
+    """
+    root = os.path.abspath(DOTNET_CONTENT_ROOT)
+    full = os.path.abspath(path)
+    try:
+        if os.path.commonpath([full, root]) == root:
+            return os.path.relpath(full, root).replace(os.sep, "/")
+    except ValueError:
+        pass
+    return path
+
+
+async def store_upload(
+    db: AsyncSession,
+    upload: UploadFile,
+    user_id: Optional[int] = None,
+    max_bytes: int = UPLOAD_MAX_BYTES,
+) -> StoredAttachment:
+    """
+    Streams an upload to disk in chunks, enforcing size/type limits, and stores it
+    content-addressed. The metadata row is flushed inside the caller's transaction,
+    so the caller still decides when to commit.
+    """
+    original_name = os.path.basename(upload.filename or "").strip()
+    if not original_name:
+        raise HTTPException(status_code=400, detail="Uploaded file has no name")
+
+    ext = _validate_type(original_name, upload.content_type)
+
+    hasher = hashlib.sha256()
+    size = 0
+    tmp = await run_in_threadpool(_open_temp_file)
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File '{original_name}' exceeds the {max_bytes // (1024 * 1024)} MB limit"
+                )
+            await run_in_threadpool(_write_chunk, tmp, hasher, chunk)
+    except BaseException:
+        await run_in_threadpool(_discard, tmp)
+        raise
+
+    if size == 0:
+        await run_in_threadpool(_discard, tmp)
+        raise HTTPException(status_code=400, detail=f"File '{original_name}' is empty")
+
+    sha256 = hasher.hexdigest()
+
+    # Reuse the metadata row (and its file, whatever extension it was stored
+    # under) when the same content was uploaded before
+    result = await db.execute(select(AttachmentBlob).where(AttachmentBlob.sha256 == sha256))
+    blob = result.scalars().first()
+    deduplicated = blob is not None
+
+    if (
+        blob is not None
+        and _in_store(blob.storage_path)
+        and await run_in_threadpool(os.path.exists, blob.storage_path)
+    ):
+        await run_in_threadpool(_discard, tmp)
+        path, file_existed = blob.storage_path, True
+    else:
+        path, file_existed = await run_in_threadpool(_commit_blob, tmp, sha256, ext)
+        if blob is not None:
+            # The recorded file is gone or in the legacy store; point the row at the one just written
+            blob.storage_path = path
+
+    if blob is None:
+        blob = AttachmentBlob(
+            sha256=sha256,
+            size_bytes=size,
+            content_type=(upload.content_type or None),
+            original_name=original_name,
+            storage_path=path,
+            created_by=user_id,
+        )
+        try:
+            async with db.begin_nested():
+                db.add(blob)
+        except IntegrityError:
+            # A concurrent upload of the same content won the insert
+            result = await db.execute(select(AttachmentBlob).where(AttachmentBlob.sha256 == sha256))
+            blob = result.scalars().first()
+            deduplicated = True
+            if not file_existed and blob.storage_path != path:
+                # The winner stored it under another extension; ours is referenced by nothing
+                await run_in_threadpool(os.remove, path)
+
+    return StoredAttachment(
+        attachment_id=blob.attachment_id,
+        sha256=sha256,
+        path=blob.storage_path or path,
+        size_bytes=size,
+        content_type=blob.content_type,
+        original_name=original_name,
+        deduplicated=deduplicated or file_existed,
+    )
@@ -1,8 +1,9 @@
+import logging
 import os
 import secrets
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -14,6 +15,8 @@ from .models.user import User
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
@@ -21,6 +24,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
 VALID_ISSUER = os.getenv("JWT_VALID_ISSUER", "http://localhost:5000")
 VALID_AUDIENCE = os.getenv("JWT_VALID_AUDIENCE", "http://localhost:5000")
 
+# Shared secret for the operational /admin endpoints (slow queries, profiles). Unset = disabled.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 # Password Hashing
 # Note: ASP.NET Identity often uses PBKDF2. 
 # passlib's 'bcrypt' works for new hashes if we migrate to bcrypt.
@@ -83,31 +89,40 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         uid: str = payload.get("uid")
         
         if username is None and uid is None:
-            print("Auth Error: Token missing sub and uid")
+            logger.warning("Auth Error: Token missing sub and uid")
             raise credentials_exception
     except JWTError as e:
-        print(f"Auth Error: JWT Decode Invalid: {e}")
+        logger.warning("Auth Error: JWT Decode Invalid: %s", e)
         raise credentials_exception
         
     # Query DB
     user = None
     if uid:
         # Prioritize lookup by integer ID (more reliable)
-        print(f"Auth Loopup: Checking User ID {uid}")
+        logger.debug("Auth Lookup: Checking User ID %s", uid)
         try:
             result = await db.execute(select(User).where(User.Id == int(uid)))
             user = result.scalars().first()
         except Exception as e:
-            print(f"Auth Error: DB Lookup by ID failed: {e}")
+            logger.exception("Auth Error: DB Lookup by ID failed: %s", e)
 
     if not user and username:
         # Fallback to username
-        print(f"Auth Loopup: Checking Username {username}")
+        logger.debug("Auth Lookup: Checking Username %s", username)
         result = await db.execute(select(User).where(User.UserName == username))
         user = result.scalars().first()
     
     if user is None:
-        print("Auth Error: User not found in DB")
+        logger.warning("Auth Error: User not found in DB")
         raise credentials_exception
         
     return user
+
+def is_admin_token(value: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and bool(value) and secrets.compare_digest(value, ADMIN_TOKEN)
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin endpoints are disabled")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token")
@@ -0,0 +1,274 @@
+import abc
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI
+from dotenv import load_dotenv
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - depends on deployment
+    aioredis = None
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()  # memory | redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "finance:invalidate")
+
+# Worker processes serving the app (uvicorn and gunicorn read WEB_CONCURRENCY).
+# The report, dimension and lookup caches stay in each process; the bus below is
+# what keeps them coherent, and the memory backend cannot reach other processes.
+# More than one worker therefore requires CACHE_BACKEND=redis: startup fails otherwise.
+CACHE_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Identifies this process on the bus so it ignores its own invalidations
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+# ----------------------------------------------------------
+# BACKENDS
+# ----------------------------------------------------------
+class CacheBackend(abc.ABC):
+    """Pub/sub channel carrying invalidation messages between worker processes."""
+
+    name = "base"
+    # True when messages reach other processes, not just this one
+    shared = False
+
+    @abc.abstractmethod
+    async def publish(self, channel: str, message: bytes):
+        ...
+
+    @abc.abstractmethod
+    async def listen(self, channel: str, callback: Callable[[bytes], None]):
+        """Calls callback for each message on channel until cancelled."""
+
+    async def check(self):
+        """Raises when the backend cannot be reached."""
+
+    async def close(self):
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Delivers to listeners in this process only, which is all a single worker
+    needs and lets tests stand two buses on one backend in place of Redis.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._listeners: Dict[str, List[asyncio.Queue]] = {}
+
+    async def publish(self, channel: str, message: bytes):
+        for queue in list(self._listeners.get(channel, ())):
+            queue.put_nowait(message)
+
+    async def listen(self, channel: str, callback: Callable[[bytes], None]):
+        queue: asyncio.Queue = asyncio.Queue()
+        self._listeners.setdefault(channel, []).append(queue)
+        try:
+            while True:
+                callback(await queue.get())
+        finally:
+            self._listeners[channel].remove(queue)
+
+
+class RedisBackend(CacheBackend):
+    """Any server speaking the Redis protocol (Redis, Valkey, KeyDB, a test stand-in)."""
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str = REDIS_URL, client=None):
+        if client is None:
+            if aioredis is None:
+                raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+            client = aioredis.from_url(url)
+        self._client = client
+
+    async def publish(self, channel: str, message: bytes):
+        await self._client.publish(channel, message)
+
+    async def check(self):
+        await self._client.ping()
+
+    async def listen(self, channel: str, callback: Callable[[bytes], None]):
+        pubsub = self._client.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    callback(message["data"])
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_backend(kind: str = CACHE_BACKEND) -> CacheBackend:
+    if kind == "redis":
+        return RedisBackend()
+    if kind != "memory":
+        logger.warning("Unknown CACHE_BACKEND %r; using memory", kind)
+    return MemoryBackend()
+
+
+# ----------------------------------------------------------
+# INVALIDATION BUS
+# ----------------------------------------------------------
+class InvalidationBus:
+    """
+    Broadcasts invalidations to the other worker processes. publish() is
+    fire-and-forget and safe from any thread (SQLAlchemy events, threadpool
+    endpoints); messages are sent by a task on the event loop. Handlers run
+    for messages from other workers only: the publisher has already applied
+    the change locally.
+    """
+
+    def __init__(self, backend: CacheBackend, channel: str = CACHE_INVALIDATION_CHANNEL, worker_id: str = WORKER_ID):
+        self.backend = backend
+        self.channel = channel
+        self.worker_id = worker_id
+        self._handlers: Dict[str, List[Callable[[Any], None]]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+
+    def on(self, kind: str, handler: Callable[[Any], None]):
+        handlers = self._handlers.setdefault(kind, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+    def publish(self, kind: str, payload: Any = None):
+        loop, queue = self._loop, self._queue
+        if loop is None or queue is None:
+            return  # not started: single process, nothing to tell
+        message = json.dumps({"origin": self.worker_id, "kind": kind, "payload": payload}, default=str).encode()
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+        except RuntimeError:
+            self.dropped += 1  # loop already closed during shutdown
+
+    def _deliver(self, raw: bytes):
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return
+        if message.get("origin") == self.worker_id:
+            return
+        self.received += 1
+        for handler in self._handlers.get(message.get("kind"), ()):
+            try:
+                handler(message.get("payload"))
+            except Exception as e:
+                logger.exception("Invalidation handler for %s failed: %s", message.get("kind"), e)
+
+    async def _sender(self):
+        while True:
+            message = await self._queue.get()
+            try:
+                await self.backend.publish(self.channel, message)
+                self.sent += 1
+            except Exception as e:
+                self.dropped += 1
+                logger.warning("Could not publish cache invalidation: %s", e)
+
+    async def _listener(self):
+        while True:
+            try:
+                await self.backend.listen(self.channel, self._deliver)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Invalidation listener lost its connection (%s); retrying", e)
+                await asyncio.sleep(1.0)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._sender(), name="cache-bus-sender"),
+            asyncio.create_task(self._listener(), name="cache-bus-listener"),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks = []
+        self._loop = None
+        self._queue = None
+
+    def snapshot(self) -> Dict:
+        return {
+            "backend": self.backend.name,
+            "worker_id": self.worker_id,
+            "running": bool(self._tasks),
+            "sent": self.sent,
+            "received": self.received,
+            "dropped": self.dropped,
+        }
+
+
+backend = create_backend()
+bus = InvalidationBus(backend)
+
+
+# ----------------------------------------------------------
+# WIRING
+# ----------------------------------------------------------
+async def check_backend(backend_: CacheBackend, workers: int = CACHE_WORKERS):
+    """Refuses to start with caches that would silently go stale across workers."""
+    if workers > 1 and not backend_.shared:
+        raise RuntimeError(
+            f"WEB_CONCURRENCY={workers} but CACHE_BACKEND={backend_.name}: invalidations would not "
+            "reach the other workers. Set CACHE_BACKEND=redis and REDIS_URL."
+        )
+    try:
+        await backend_.check()
+    except Exception as e:
+        raise RuntimeError(f"Cache backend {backend_.name} is unreachable: {e}") from e
+
+
+def install(app: FastAPI):
+    """Runs the invalidation bus for the lifetime of the app."""
+    original_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app_):
+        await check_backend(backend)
+        await bus.start()
+        try:
+            async with original_lifespan(app_) as state:
+                yield state
+        finally:
+            await bus.stop()
+            await backend.close()
+
+    app.router.lifespan_context = lifespan
@@ -0,0 +1,98 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from fastapi import HTTPException
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+FORMAT_ROWS = "rows"
+FORMAT_COLUMNAR = "columnar"
+RESPONSE_FORMATS = (FORMAT_ROWS, FORMAT_COLUMNAR)
+
+# Auto dictionary-encoding: string columns whose distinct values are at most this share of the rows
+DICTIONARY_MAX_RATIO = 0.5
+DICTIONARY_MIN_ROWS = 16
+
+
+def check_format(response_format: str) -> str:
+    """Validates the ?format= query value; call before any DB work."""
+    value = (response_format or FORMAT_ROWS).lower()
+    if value not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(RESPONSE_FORMATS)}")
+    return value
+
+
+# ----------------------------------------------------------
+# ENCODING
+# ----------------------------------------------------------
+def _column_names(rows: Sequence[Dict[str, Any]]) -> List[str]:
+    # Union in first-seen order; report rows like the bank book opening balance can carry extra keys
+    names: Dict[str, None] = {}
+    for row in rows:
+        for key in row:
+            if key not in names:
+                names[key] = None
+    return list(names)
+
+
+def _dictionary_encode(values: List[Any]):
+    lookup: Dict[Any, int] = {}
+    dictionary: List[Any] = []
+    codes = []
+    for value in values:
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(dictionary)
+            dictionary.append(value)
+        codes.append(code)
+    return dictionary, codes
+
+
+def _worth_encoding(values: List[Any]) -> bool:
+    if len(values) < DICTIONARY_MIN_ROWS:
+        return False
+    if not all(v is None or isinstance(v, str) for v in values):
+        return False
+    return len(set(values)) <= len(values) * DICTIONARY_MAX_RATIO
+
+
+def to_columnar(rows: Sequence[Dict[str, Any]], dictionary_columns: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Rows -> {"columns": [...], "row_count": n, "values": [[...], ...], "dictionaries": {...}}.
+
+    values[i] holds column i top to bottom. A column listed in "dictionaries"
+    stores integer codes into that list instead of the values themselves:
+
+        value = dictionaries[name][values[i][r]] if name in dictionaries else values[i][r]
+
+    dictionary_columns forces encoding for those columns; other string
+    columns are encoded when they repeat enough to be worth it.
+    """
+    columns = _column_names(rows)
+    forced = set(dictionary_columns or ())
+    values: List[List[Any]] = []
+    dictionaries: Dict[str, List[Any]] = {}
+
+    for name in columns:
+        column = [row.get(name) for row in rows]
+        if name in forced or _worth_encoding(column):
+            dictionary, codes = _dictionary_encode(column)
+            if len(dictionary) < len(column) or name in forced:
+                dictionaries[name] = dictionary
+                column = codes
+        values.append(column)
+
+    return {
+        "format": FORMAT_COLUMNAR,
+        "columns": columns,
+        "row_count": len(rows),
+        "values": values,
+        "dictionaries": dictionaries,
+    }
+
+
+def shape_rows(rows: Sequence[Dict[str, Any]], response_format: str, dictionary_columns: Optional[Iterable[str]] = None):
+    """Returns rows unchanged for format=rows, the columnar block for format=columnar."""
+    if response_format == FORMAT_COLUMNAR:
+        return to_columnar(rows, dictionary_columns)
+    return rows
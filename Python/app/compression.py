@@ -0,0 +1,311 @@
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import zlib
+from typing import Dict, Optional
+
+from anyio import to_thread
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from dotenv import load_dotenv
+
+from .file_serving import etag_matches
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on deployment
+    brotli = None
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Bodies at least this large are compressed in the threadpool instead of on the event loop
+COMPRESSION_OFFLOAD_BYTES = int(os.getenv("COMPRESSION_OFFLOAD_BYTES", str(256 * 1024)))
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "text/",
+    "image/svg+xml",
+)
+
+ENCODING_BR = "br"
+ENCODING_GZIP = "gzip"
+
+
+def _supported_encodings():
+    return (ENCODING_BR, ENCODING_GZIP) if brotli is not None else (ENCODING_GZIP,)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported encoding the client accepts (q > 0); brotli preferred."""
+    accepted: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    for encoding in _supported_encodings():
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == ENCODING_BR:
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _is_compressible(content_type: str) -> bool:
+    content_type = (content_type or "").lower()
+    return any(content_type.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+
+# ----------------------------------------------------------
+# STREAMING COMPRESSORS
+# ----------------------------------------------------------
+class _GzipStream:
+    def __init__(self):
+        self._z = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        # Sync flush so each streamed chunk reaches the client without waiting for the next one
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._c = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+def _stream_for(encoding: str):
+    return _BrotliStream() if encoding == ENCODING_BR else _GzipStream()
+
+
+# ----------------------------------------------------------
+# ASGI MIDDLEWARE
+# ----------------------------------------------------------
+class CompressionMiddleware:
+    """
+    gzip / brotli for compressible responses of at least COMPRESSION_MIN_SIZE
+    bytes. Single-body responses are compressed in one go (large ones off the
+    event loop); streaming responses are compressed chunk by chunk. Responses
+    that already carry Content-Encoding (precompressed payloads) pass through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "mode": None, "stream": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+
+            if message["type"] != "http.response.body":
+                if state["mode"] is None and state["start"] is not None:
+                    # e.g. http.response.pathsend for files: nothing to compress
+                    state["mode"] = "identity"
+                    await send(state["start"])
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if state["mode"] is None:
+                start = state["start"]
+                response_headers = {k.lower(): v for k, v in start.get("headers", [])}
+                eligible = (
+                    start["status"] not in (204, 206, 304)
+                    and b"content-encoding" not in response_headers
+                    and _is_compressible(response_headers.get(b"content-type", b"").decode("latin-1"))
+                )
+                if eligible and (more_body or len(body) >= COMPRESSION_MIN_SIZE):
+                    state["mode"] = "stream" if more_body else "whole"
+                else:
+                    state["mode"] = "identity"
+                    if eligible:
+                        start["headers"] = _with_vary(start.get("headers", []))
+                    await send(start)
+                    await send(message)
+                    return
+
+                new_headers = [
+                    (k, v) for k, v in start.get("headers", [])
+                    if k.lower() not in (b"content-length", b"etag")
+                ]
+                etag = response_headers.get(b"etag")
+                if etag is not None:
+                    # The compressed bytes differ from what a strong validator describes
+                    new_headers.append((b"etag", etag if etag.startswith(b"W/") else b"W/" + etag))
+                new_headers.append((b"content-encoding", encoding.encode()))
+                new_headers = _with_vary(new_headers)
+
+                if state["mode"] == "whole":
+                    if len(body) >= COMPRESSION_OFFLOAD_BYTES:
+                        compressed = await to_thread.run_sync(compress, body, encoding)
+                    else:
+                        compressed = compress(body, encoding)
+                    new_headers.append((b"content-length", str(len(compressed)).encode()))
+                    start["headers"] = new_headers
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+                state["stream"] = _stream_for(encoding)
+                start["headers"] = new_headers
+                await send(start)
+
+            if state["mode"] == "identity":
+                await send(message)
+                return
+
+            stream = state["stream"]
+            out = stream.chunk(body) if body else b""
+            if not more_body:
+                out += stream.finish()
+            await send({"type": "http.response.body", "body": out, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _with_vary(headers):
+    for i, (k, v) in enumerate(headers):
+        if k.lower() == b"vary":
+            if b"accept-encoding" not in v.lower():
+                headers = list(headers)
+                headers[i] = (k, v + b", Accept-Encoding")
+            return headers
+    return list(headers) + [(b"vary", b"Accept-Encoding")]
+
+
+# ----------------------------------------------------------
+# PRECOMPRESSED PAYLOADS
+# ----------------------------------------------------------
+class PrecompressedBody:
+    """
+    An encoded response body plus its compressed variants, built once per
+    encoding. Cache entries keep one of these so repeat hits skip both the
+    query and recompression.
+    """
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        self._variants: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._etag: Optional[str] = None
+
+    @property
+    def etag(self) -> str:
+        """Weak validator of the identity body; it holds for every encoded variant."""
+        if self._etag is None:
+            self._etag = 'W/"%s"' % hashlib.blake2b(self.body, digest_size=12).hexdigest()
+        return self._etag
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body) + sum(len(v) for v in self._variants.values())
+
+    def has_variant(self, encoding: str) -> bool:
+        return encoding in self._variants
+
+    def variant(self, encoding: str) -> bytes:
+        cached = self._variants.get(encoding)
+        if cached is None:
+            with self._lock:
+                cached = self._variants.get(encoding)
+                if cached is None:
+                    cached = self._variants[encoding] = compress(self.body, encoding)
+        return cached
+
+
+def precompressed_response_sync(
+    request: Request,
+    payload: PrecompressedBody,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Serves the variant matching Accept-Encoding (CompressionMiddleware leaves
+    it untouched), or 304 when If-None-Match carries the payload's ETag.
+    """
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept-Encoding"
+    if status_code == 200:
+        headers["ETag"] = payload.etag
+        if etag_matches(request.headers.get("if-none-match", ""), payload.etag):
+            return Response(status_code=304, headers=headers)
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    if encoding is None or len(payload.body) < COMPRESSION_MIN_SIZE:
+        return Response(payload.body, status_code=status_code, media_type=payload.media_type, headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(payload.variant(encoding), status_code=status_code, media_type=payload.media_type, headers=headers)
+
+
+async def precompressed_response(
+    request: Request,
+    payload: PrecompressedBody,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """precompressed_response_sync for async endpoints; a large first compression runs in the threadpool."""
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    if (
+        encoding is not None
+        and len(payload.body) >= COMPRESSION_OFFLOAD_BYTES
+        and not payload.has_variant(encoding)
+        and not etag_matches(request.headers.get("if-none-match", ""), payload.etag)
+    ):
+        await to_thread.run_sync(payload.variant, encoding)
+    return precompressed_response_sync(request, payload, status_code, headers)
+
+
+# ----------------------------------------------------------
+# WIRING
+# ----------------------------------------------------------
+def install(app: FastAPI):
+    app.add_middleware(CompressionMiddleware)
+    logger.debug("Response compression enabled: %s", ", ".join(_supported_encodings()))
@@ -1,22 +1,34 @@
+import logging
 from sqlalchemy import text
 import re
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from . import schemas
+from typing import Dict, List, Optional
+from . import customer_balance, schemas
 from .models.finance import ARReceipt
-from sqlalchemy import select, desc, update
+from sqlalchemy import bindparam, select, desc, update
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # --- UPDATED DEFAULTS TO LIVE DATABASES ---
 DB_NAME_FINANCE = os.getenv('DB_NAME_FINANCE', 'btggasify_finance_live')
 DB_NAME_USER = os.getenv('DB_NAME_USER', 'btggasify_live')
 DB_NAME_USER_NEW = os.getenv('DB_NAME_USER_NEW', 'btggasify_userpanel_live')
 DB_NAME_MASTER = os.getenv('DB_NAME_MASTER', 'btggasify_masterpanel_live')
 
+# Ids per statement in the bulk AR updates (bounds the IN list / packet size)
+BULK_REFERENCE_CHUNK = int(os.getenv("BULK_REFERENCE_CHUNK", "500"))
+
+
+def _expanding(sql: str, *names: str):
+    """text() whose named params are lists bound as IN (...)."""
+    return text(sql).bindparams(*(bindparam(n, expanding=True) for n in names))
+
+
 # ----------------------------------------------------------
 # 1. CREATE AR RECEIPT
 # ----------------------------------------------------------
@@ -66,6 +78,7 @@ async def create_ar_receipt(db: AsyncSession, command: schemas.CreateARCommand):
         created_records.append(db_receipt)
 
     await db.commit()
+    await customer_balance.refresh([r.customer_id for r in created_records])
     for record in created_records:
         await db.refresh(record)
     return created_records
@@ -92,6 +105,33 @@ async def get_receipt_by_id(db: AsyncSession, receipt_id: int):
     return result.scalars().first()
 
 
+def _verified_reference(reference_no: Optional[str], reply_message: Optional[str], linked_invoices: List[str]) -> Optional[str]:
+    """Receipt reference with the verification reply and linked invoices appended, or None to keep it."""
+    current_desc = reference_no or ""
+
+    # Clean up existing automated suffixes (Old & New Format)
+    current_desc = re.sub(r'\s*\|\s*Inv:.*', '', current_desc, flags=re.IGNORECASE)
+    current_desc = re.sub(r'\s*\|\s*Reply:.*', '', current_desc, flags=re.IGNORECASE)
+    current_desc = re.sub(r'\s*\(Inv:.*?\)', '', current_desc, flags=re.IGNORECASE)
+    current_desc = re.sub(r'\s*\(Reply:.*?\)', '', current_desc, flags=re.IGNORECASE)
+    current_desc = current_desc.strip()
+
+    # Construct new reference string (Reply + Linked Invoices)
+    additional_info = []
+    if reply_message:
+        additional_info.append(f"(Reply: {reply_message})")
+
+    if linked_invoices:
+        # Join invoice numbers (e.g., "INV-001, INV-002")
+        inv_str = ", ".join(linked_invoices)
+        additional_info.append(f"(Inv: {inv_str})")
+
+    if not additional_info:
+        return None
+    # User wants "test-1234 (Inv: 88730)"
+    return f"{current_desc} {' '.join(additional_info)}".strip()
+
+
 # ----------------------------------------------------------
 # 4. UPDATE CUSTOMER + VERIFY
 # ----------------------------------------------------------
@@ -111,6 +151,9 @@ async def update_customer_and_verify(
     if not record:
         return None 
 
+    # Balances of every customer this touches: the receipt's old and new customer, the invoices' customers
+    touched_customers = {record.customer_id}
+
     # 2. Update Receipt Details
     if data.customer_id and data.customer_id != 0:
         record.customer_id = data.customer_id
@@ -144,12 +187,13 @@ async def update_customer_and_verify(
             
             # 🟢 TASK: Link Receipt to AR for Reporting
             # 3.1 Fetch AR ID from tbl_accounts_receivable
-            get_ar_sql = text(f"SELECT ar_id, already_received FROM {DB_NAME_FINANCE}.tbl_accounts_receivable WHERE invoice_id = :inv_id LIMIT 1")
+            get_ar_sql = text(f"SELECT ar_id, already_received, customer_id FROM {DB_NAME_FINANCE}.tbl_accounts_receivable WHERE invoice_id = :inv_id LIMIT 1")
             ar_res = await db.execute(get_ar_sql, {"inv_id": alloc.invoice_id})
             ar_row = ar_res.fetchone()
             
             if ar_row:
                  ar_id = ar_row.ar_id
+                 touched_customers.add(ar_row.customer_id)
                  current_received = ar_row.already_received or 0
                  
                  # 3.2 Insert into tbl_receipt_ag_ar
@@ -194,33 +238,16 @@ async def update_customer_and_verify(
                      record.ar_id = ar_id
 
     # Update Reference with Linked Invoices
-    current_desc = record.reference_no or ""
-    
-    # Clean up existing automated suffixes (Old & New Format)
-    current_desc = re.sub(r'\s*\|\s*Inv:.*', '', current_desc, flags=re.IGNORECASE)
-    current_desc = re.sub(r'\s*\|\s*Reply:.*', '', current_desc, flags=re.IGNORECASE)
-    current_desc = re.sub(r'\s*\(Inv:.*?\)', '', current_desc, flags=re.IGNORECASE)
-    current_desc = re.sub(r'\s*\(Reply:.*?\)', '', current_desc, flags=re.IGNORECASE)
-    current_desc = current_desc.strip()
-    
-    # Construct new reference string (Reply + Linked Invoices)
-    additional_info = []
-    if data.reply_message:
-        additional_info.append(f"(Reply: {data.reply_message})")
-    
-    if linked_invoices:
-        # Join invoice numbers (e.g., "INV-001, INV-002")
-        inv_str = ", ".join(linked_invoices)
-        additional_info.append(f"(Inv: {inv_str})")
-        
-    if additional_info:
-        # User wants "test-1234 (Inv: 88730)"
-        record.reference_no = f"{current_desc} {' '.join(additional_info)}".strip()
+    new_reference = _verified_reference(record.reference_no, data.reply_message, linked_invoices)
+    if new_reference is not None:
+        record.reference_no = new_reference
 
     record.pending_verification = False
     record.modified_on = datetime.now()
 
+    touched_customers.add(record.customer_id)
     await db.commit()
+    await customer_balance.refresh(touched_customers)
     await db.refresh(record)
 
     return record
@@ -295,7 +322,7 @@ async def post_invoice_to_ar(db: AsyncSession, request: schemas.PostInvoiceToARR
 
         if existing_row:
             # --- UPDATE SCENARIO (Upsert / Aggregation Fix) ---
-            print(f"Aggregating AR record for Invoice No: {invoice_number}. New Total: {grand_total}")
+            logger.debug("Aggregating AR record for Invoice No: %s. New Total: %s", invoice_number, grand_total)
             
             update_ar_sql = text(f"""
                 UPDATE {DB_NAME_FINANCE}.tbl_accounts_receivable
@@ -317,7 +344,7 @@ async def post_invoice_to_ar(db: AsyncSession, request: schemas.PostInvoiceToARR
 
         else:
             # --- INSERT SCENARIO ---
-            print(f"Inserting new AR record for Invoice No: {invoice_number}")
+            logger.debug("Inserting new AR record for Invoice No: %s", invoice_number)
             
             insert_sql = text(f"""
                 INSERT INTO {DB_NAME_FINANCE}.tbl_accounts_receivable (
@@ -393,11 +420,19 @@ async def post_invoice_to_ar(db: AsyncSession, request: schemas.PostInvoiceToARR
         
         await db.execute(update_header_flag_sql, {"inv_id": str(request.invoiceId)})
 
+        # 6. Customers whose balance to refresh once committed
+        cust_res = await db.execute(
+            text(f"SELECT DISTINCT customer_id FROM {DB_NAME_FINANCE}.tbl_accounts_receivable WHERE invoice_no = :nbr"),
+            {"nbr": invoice_number}
+        )
+        touched_customers = cust_res.scalars().all()
+
         await db.commit()
+        await customer_balance.refresh(touched_customers)
         return True
 
     except Exception as e:
-        print(f"CRITICAL ERROR in post_invoice_to_ar: {str(e)}")
+        logger.exception("CRITICAL ERROR in post_invoice_to_ar: %s", e)
         await db.rollback()
         return False
 
@@ -406,7 +441,13 @@ async def post_invoice_to_ar(db: AsyncSession, request: schemas.PostInvoiceToARR
 # ----------------------------------------------------------
 async def update_ar_receipt(db: AsyncSession, command: schemas.CreateARCommand):
     updated_count = 0
-    
+
+    # An edit can move a receipt to another customer: both balances change
+    prev_res = await db.execute(
+        select(ARReceipt.customer_id).where(ARReceipt.receipt_id.in_([item.receipt_id for item in command.header]))
+    )
+    touched_customers = set(prev_res.scalars().all()) | {item.customer_id for item in command.header}
+
     for item in command.header:
         is_cleared_status = False
         if item.deposit_bank_id and str(item.deposit_bank_id) != "0" and str(item.deposit_bank_id).strip() != "":
@@ -450,6 +491,7 @@ async def update_ar_receipt(db: AsyncSession, command: schemas.CreateARCommand):
         updated_count += result.rowcount
 
     await db.commit()
+    await customer_balance.refresh(touched_customers)
     return updated_count > 0
 
 # ----------------------------------------------------------
@@ -551,58 +593,431 @@ async def update_invoice_reference(db: AsyncSession, invoice_id: int, new_refere
         await db.commit()
         return result.rowcount > 0
     except Exception as e:
-        print(f"Error updating reference: {e}")
+        logger.exception("Error updating reference: %s", e)
         await db.rollback()
         return False
 
 # 🟢 FIXED BULK UPDATE LOGIC TO PREVENT DUPLICATE ERRORS
 async def bulk_update_ar_reference(db: AsyncSession, ar_ids: List[int], new_reference: str):
+    """
+    Renames the reference of many AR rows: their delivery-order details, the
+    AR rows and their sales headers. Three set-based UPDATEs per chunk of
+    BULK_REFERENCE_CHUNK ids, all in one transaction. Returns the number of
+    ids processed, or -1 after a rollback.
+    """
     try:
         if not ar_ids:
-            return 0 
+            return 0
 
-        updated_count = 0
+        # 🟢 FIXED: Removed the if-index logic that added suffixes like -1, -2
+        ids = list(dict.fromkeys(ar_ids))
+        touched_customers = set()
 
-        for ar_id in ar_ids:
-            # 🟢 FIXED: Removed the if-index logic that added suffixes like -1, -2
-            unique_ref = new_reference
+        for start in range(0, len(ids), BULK_REFERENCE_CHUNK):
+            params = {"ids": ids[start:start + BULK_REFERENCE_CHUNK], "ref": new_reference}
 
             # 1. Update Details (Preserve DO Linkage)
-            preserve_do_query = text(f"""
+            await db.execute(_expanding(f"""
                 UPDATE {DB_NAME_USER_NEW}.tbl_salesinvoices_details d
                 INNER JOIN {DB_NAME_FINANCE}.tbl_accounts_receivable ar 
                     ON d.salesinvoicesheaderid = ar.invoice_id
                 SET d.DOnumber = :ref
-                WHERE ar.ar_id = :id
-            """)
-            await db.execute(preserve_do_query, {"id": ar_id, "ref": unique_ref})
-            
+                WHERE ar.ar_id IN :ids
+            """, "ids"), params)
+
             # 2. Update Finance AR Table
-            query_finance = text(f"""
+            await db.execute(_expanding(f"""
                 UPDATE {DB_NAME_FINANCE}.tbl_accounts_receivable 
                 SET invoice_no = :ref 
-                WHERE ar_id = :id
-            """)
-            await db.execute(query_finance, {"ref": unique_ref, "id": ar_id})
+                WHERE ar_id IN :ids
+            """, "ids"), params)
 
             # 3. Update Sales Header Table
-            query_sales = text(f"""
+            await db.execute(_expanding(f"""
                 UPDATE {DB_NAME_USER_NEW}.tbl_salesinvoices_header
                 SET salesinvoicenbr = :ref
                 WHERE id IN (
                     SELECT invoice_id 
                     FROM {DB_NAME_FINANCE}.tbl_accounts_receivable 
-                    WHERE ar_id = :id
+                    WHERE ar_id IN :ids
                 )
-            """)
-            await db.execute(query_sales, {"ref": unique_ref, "id": ar_id})
-            
-            updated_count += 1
+            """, "ids"), params)
+
+            # DN/CN link to AR by invoice number, so the rename can move them
+            cust_res = await db.execute(_expanding(
+                f"SELECT DISTINCT customer_id FROM {DB_NAME_FINANCE}.tbl_accounts_receivable WHERE ar_id IN :ids", "ids"
+            ), params)
+            touched_customers.update(cust_res.scalars().all())
+
+        await db.commit()
+        await customer_balance.refresh(touched_customers)
+        # Same count as the per-id loop this replaced: every id in the request
+        return len(ar_ids)
+
+    except Exception as e:
+        logger.exception("CRITICAL DB ERROR in bulk_update: %s", e)
+        await db.rollback()
+        return -1
+
+
+# ----------------------------------------------------------
+# 🟢 9. BULK VERIFY (ONE TRANSACTION, SET-BASED)
+# ----------------------------------------------------------
+# Per-item result codes of the bulk endpoints
+BULK_OK_VERIFIED = "verified"
+BULK_OK_SUBMITTED = "submitted"
+BULK_NOT_FOUND = "not_found"
+BULK_NOT_PENDING = "not_pending"
+BULK_ALREADY_SUBMITTED = "already_submitted"
+BULK_DUPLICATE = "duplicate"
+
+
+
+async def bulk_verify_receipts(db: AsyncSession, items: List[schemas.BulkVerifyItem]) -> List[Dict]:
+    """
+    update_customer_and_verify for many receipts in one transaction. Receipts,
+    invoice numbers and AR rows are read with one query each; the invoice,
+    allocation and AR writes are batched per table. Items that cannot be
+    verified (unknown id, not pending, repeated in the request) get their
+    code and are skipped; the rest commit together.
+    """
+    results = [{"receipt_id": item.receipt_id, "code": None} for item in items]
+
+    # 1. Receipts
+    receipt_ids = {item.receipt_id for item in items}
+    rec_res = await db.execute(select(ARReceipt).where(ARReceipt.receipt_id.in_(receipt_ids)))
+    receipts = {r.receipt_id: r for r in rec_res.scalars().all()}
+
+    accepted = []
+    seen = set()
+    for item, result in zip(items, results):
+        record = receipts.get(item.receipt_id)
+        if item.receipt_id in seen:
+            result["code"] = BULK_DUPLICATE
+        elif record is None:
+            result["code"] = BULK_NOT_FOUND
+        elif not record.pending_verification:
+            result["code"] = BULK_NOT_PENDING
+        else:
+            accepted.append((item, record, result))
+        seen.add(item.receipt_id)
+
+    if not accepted:
+        return results
+
+    # 2. Invoice numbers and AR rows of every allocated invoice
+    invoice_ids = sorted({
+        alloc.invoice_id
+        for item, _, _ in accepted
+        for alloc in item.allocations
+        if alloc.amount_allocated > 0
+    })
+    invoice_nbrs: Dict[int, str] = {}
+    ar_rows: Dict[int, object] = {}
+    if invoice_ids:
+        nbr_res = await db.execute(
+            _expanding(f"SELECT id, salesinvoicenbr FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_header WHERE id IN :ids", "ids"),
+            {"ids": invoice_ids}
+        )
+        invoice_nbrs = {int(row.id): row.salesinvoicenbr for row in nbr_res.fetchall()}
+
+        ar_res = await db.execute(
+            _expanding(f"""
+                SELECT ar_id, invoice_id, customer_id
+                FROM {DB_NAME_FINANCE}.tbl_accounts_receivable
+                WHERE invoice_id IN :ids
+                ORDER BY ar_id
+            """, "ids"),
+            {"ids": invoice_ids}
+        )
+        for row in ar_res.fetchall():
+            # First AR row per invoice, as the single-receipt path's LIMIT 1
+            ar_rows.setdefault(int(row.invoice_id), row)
+
+    # 3. Apply in memory, collecting the batched writes
+    paid_by_invoice: Dict[int, float] = {}
+    received_by_ar: Dict[int, float] = {}
+    ar_updated_by: Dict[int, object] = {}
+    allocation_rows = []
+    touched_customers = set()
+    now = datetime.now()
+
+    for item, record, result in accepted:
+        touched_customers.add(record.customer_id)
+        if item.customer_id and item.customer_id != 0:
+            record.customer_id = item.customer_id
+
+        record.bank_charges = item.bank_charges
+        record.tax_rate = item.tax_deduction
+        record.exchange_rate = item.exchange_rate
+
+        user_id = item.user_id if item.user_id else (record.created_by or 'System')
+        linked_invoices = []
+        for alloc in item.allocations:
+            if alloc.amount_allocated <= 0:
+                continue
+            paid_by_invoice[alloc.invoice_id] = paid_by_invoice.get(alloc.invoice_id, 0) + alloc.amount_allocated
+
+            inv_nbr = invoice_nbrs.get(alloc.invoice_id)
+            if inv_nbr:
+                linked_invoices.append(inv_nbr)
+
+            ar_row = ar_rows.get(alloc.invoice_id)
+            if ar_row:
+                touched_customers.add(ar_row.customer_id)
+                allocation_rows.append({
+                    "rid": record.receipt_id,
+                    "arid": ar_row.ar_id,
+                    "amount": alloc.amount_allocated,
+                    "rdate": record.receipt_date or now.date(),
+                    "uid": user_id,
+                    "ip": record.created_ip or '127.0.0.1',
+                })
+                received_by_ar[ar_row.ar_id] = received_by_ar.get(ar_row.ar_id, 0) + alloc.amount_allocated
+                ar_updated_by[ar_row.ar_id] = user_id
+                if record.ar_id is None:
+                    record.ar_id = ar_row.ar_id
+
+        new_reference = _verified_reference(record.reference_no, item.reply_message, linked_invoices)
+        if new_reference is not None:
+            record.reference_no = new_reference
+
+        record.pending_verification = False
+        record.modified_on = now
+        touched_customers.add(record.customer_id)
+        result["code"] = BULK_OK_VERIFIED
+
+    # 4. Batched writes (executemany: one round trip per table)
+    if paid_by_invoice:
+        await db.execute(text(f"""
+            UPDATE {DB_NAME_USER_NEW}.tbl_salesinvoices_header
+            SET PaidAmount = IFNULL(PaidAmount, 0) + :amount
+            WHERE id = :inv_id
+        """), [{"inv_id": k, "amount": v} for k, v in paid_by_invoice.items()])
+
+    if allocation_rows:
+        await db.execute(text(f"""
+            INSERT INTO {DB_NAME_FINANCE}.tbl_receipt_ag_ar
+            (receipt_id, ar_id, payment_amount, receipt_date, created_date, created_by, created_ip, is_active)
+            VALUES (:rid, :arid, :amount, :rdate, NOW(), :uid, :ip, 1)
+        """), allocation_rows)
+
+    if received_by_ar:
+        await db.execute(text(f"""
+            UPDATE {DB_NAME_FINANCE}.tbl_accounts_receivable
+            SET already_received = already_received + :amount,
+                balance_amount = balance_amount - :amount,
+                updated_date = NOW(),
+                updated_by = :uid
+            WHERE ar_id = :arid
+        """), [
+            {"arid": ar_id, "amount": amount, "uid": ar_updated_by[ar_id]}
+            for ar_id, amount in received_by_ar.items()
+        ])
+
+    await db.commit()
+    await customer_balance.refresh(touched_customers)
+    return results
+
+
+# ----------------------------------------------------------
+# 🟢 10. BULK SUBMIT
+# ----------------------------------------------------------
+async def bulk_submit_receipts(db: AsyncSession, receipt_ids: List[int]) -> List[Dict]:
+    """submit_receipt for many receipts: one read, one UPDATE ... WHERE receipt_id IN, one commit."""
+    found_res = await db.execute(
+        select(ARReceipt.receipt_id, ARReceipt.is_submitted).where(ARReceipt.receipt_id.in_(set(receipt_ids)))
+    )
+    found = {row.receipt_id: row.is_submitted for row in found_res.all()}
+
+    results = []
+    to_submit = []
+    seen = set()
+    for receipt_id in receipt_ids:
+        if receipt_id in seen:
+            code = BULK_DUPLICATE
+        elif receipt_id not in found:
+            code = BULK_NOT_FOUND
+        elif found[receipt_id]:
+            code = BULK_ALREADY_SUBMITTED
+        else:
+            code = BULK_OK_SUBMITTED
+            to_submit.append(receipt_id)
+        seen.add(receipt_id)
+        results.append({"receipt_id": receipt_id, "code": code})
+
+    if to_submit:
+        await db.execute(
+            update(ARReceipt)
+            .where(ARReceipt.receipt_id.in_(to_submit))
+            .values(is_submitted=True, pending_verification=True)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    return results
+
+
+# ----------------------------------------------------------
+# 🟢 11. BATCH POST TO AR (GROUPED AGGREGATION)
+# ----------------------------------------------------------
+POST_INSERTED = "inserted"
+POST_UPDATED = "updated"
+
+
+def _invoice_totals_sql(nbr_param: str) -> str:
+    """Grand total per invoice number over its active headers: the aggregation of post_invoice_to_ar, grouped."""
+    return f"""
+        SELECT salesinvoicenbr,
+               SUM(TotalAmount) as GrandTotal,
+               SUM(CalculatedPrice) as GrandTotalIDR,
+               MIN(id) as PrimaryID
+        FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_header
+        WHERE salesinvoicenbr IN :{nbr_param} AND isactive = 1
+        GROUP BY salesinvoicenbr
+    """
+
+
+async def post_invoices_to_ar(db: AsyncSession, request: schemas.PostInvoicesToARRequest) -> Optional[List[Dict]]:
+    """
+    post_invoice_to_ar for many invoice ids in one transaction. The invoice
+    numbers are aggregated with one GROUP BY inside each AR write; AR rows are
+    updated and inserted set-based, and DO deactivation and header flags are
+    one UPDATE each. Returns an outcome per invoice id (inserted / updated /
+    not_found), or None after a rollback.
+    """
+    try:
+        invoice_ids = list(dict.fromkeys(request.invoiceIds))
+        if not invoice_ids:
+            return []
+
+        # 1. Invoice numbers, and whether each already has an AR row
+        lookup_res = await db.execute(_expanding(f"""
+            SELECT h.id, h.salesinvoicenbr,
+                   EXISTS (
+                       SELECT 1 FROM {DB_NAME_FINANCE}.tbl_accounts_receivable ar
+                       WHERE ar.invoice_no = h.salesinvoicenbr
+                   ) as has_ar
+            FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_header h
+            WHERE h.id IN :ids
+        """, "ids"), {"ids": invoice_ids})
+        headers = {int(row.id): row for row in lookup_res.fetchall()}
+
+        outcomes = []
+        update_nbrs = []
+        insert_source_ids = {}  # invoice number -> header id its AR row is built from
+        for invoice_id in invoice_ids:
+            row = headers.get(invoice_id)
+            if row is None or not row.salesinvoicenbr:
+                outcomes.append({"invoice_id": invoice_id, "invoice_no": None, "code": BULK_NOT_FOUND})
+                continue
+            nbr = row.salesinvoicenbr
+            if row.has_ar:
+                code = POST_UPDATED
+                if nbr not in update_nbrs:
+                    update_nbrs.append(nbr)
+            elif nbr in insert_source_ids:
+                # Another id of a number this batch inserts: posted one by one, it would update
+                code = POST_UPDATED
+            else:
+                code = POST_INSERTED
+                insert_source_ids[nbr] = invoice_id
+            outcomes.append({"invoice_id": invoice_id, "invoice_no": nbr, "code": code})
+
+        posted_ids = [o["invoice_id"] for o in outcomes if o["code"] != BULK_NOT_FOUND]
+        if not posted_ids:
+            return outcomes
+
+        # 2. Existing AR rows: re-aggregate (UPDATE SCENARIO)
+        if update_nbrs:
+            await db.execute(_expanding(f"""
+                UPDATE {DB_NAME_FINANCE}.tbl_accounts_receivable ar
+                LEFT JOIN ({_invoice_totals_sql("nbrs")}) t ON t.salesinvoicenbr = ar.invoice_no
+                SET
+                    ar.inv_amount = COALESCE(t.GrandTotal, 0),
+                    ar.invoice_amt_idr = COALESCE(t.GrandTotalIDR, 0),
+                    ar.balance_amount = (COALESCE(t.GrandTotal, 0) - ar.already_received),
+                    ar.updated_by = :userId,
+                    ar.updated_date = NOW()
+                WHERE ar.invoice_no IN :nbrs
+            """, "nbrs"), {"nbrs": update_nbrs, "userId": request.userId})
+
+        # 3. New AR rows (INSERT SCENARIO), one per invoice number
+        if insert_source_ids:
+            await db.execute(_expanding(f"""
+                INSERT INTO {DB_NAME_FINANCE}.tbl_accounts_receivable (
+                    orgid, branchid, 
+                    ar_no, 
+                    invoice_no, invoice_id, invoice_date, 
+                    customer_id, customer_name, 
+                    inv_amount, balance_amount, already_received, 
+                    invoice_amt_idr, currencyid, 
+                    created_by, created_ip, created_date, 
+                    is_active, is_partial
+                )
+                SELECT 
+                    :orgId, :branchId,
+                    CONCAT('AR-', h.salesinvoicenbr), 
+                    h.salesinvoicenbr, 
+                    COALESCE(t.PrimaryID, h.id),  -- Use the Min ID to keep the link stable
+                    h.Salesinvoicesdate,
+                    h.customerid, 
+                    IFNULL(c.CustomerName, 'Unknown'), 
+                    COALESCE(t.GrandTotal, 0),
+                    COALESCE(t.GrandTotal, 0), 
+                    0, 
+                    COALESCE(t.GrandTotalIDR, 0), 
+                    
+                    (SELECT COALESCE(d.Currencyid, 1) 
+                     FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_details d 
+                     WHERE d.salesinvoicesheaderid = h.id 
+                     LIMIT 1), 
+                      
+                    :userId, '127.0.0.1', NOW(), 
+                    1, 0
+                FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_header h
+                LEFT JOIN ({_invoice_totals_sql("nbrs")}) t ON t.salesinvoicenbr = h.salesinvoicenbr
+                LEFT JOIN {DB_NAME_USER_NEW}.master_customer c ON h.customerid = c.Id
+                WHERE h.id IN :source_ids
+            """, "nbrs", "source_ids"), {
+                "orgId": request.orgId,
+                "branchId": request.branchId,
+                "userId": request.userId,
+                "nbrs": list(insert_source_ids),
+                "source_ids": list(insert_source_ids.values()),
+            })
+
+        # 4. Deactivate relevant DOs from AR Book
+        await db.execute(_expanding(f"""
+            UPDATE {DB_NAME_FINANCE}.tbl_accounts_receivable
+            SET is_active = 0
+            WHERE is_active = 1
+              AND invoice_no IN (
+                  SELECT DISTINCT DOnumber 
+                  FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_details 
+                  WHERE salesinvoicesheaderid IN :ids 
+                    AND DOnumber IS NOT NULL 
+                    AND DOnumber != ''
+              )
+        """, "ids"), {"ids": posted_ids})
+
+        # 5. UPDATE HEADER FLAGS (for the posted ids)
+        await db.execute(_expanding(f"""
+            UPDATE {DB_NAME_USER_NEW}.tbl_salesinvoices_header 
+            SET IsAR = 1 
+            WHERE id IN :ids
+        """, "ids"), {"ids": posted_ids})
+
+        # 6. Customers whose balances to refresh once committed
+        cust_res = await db.execute(_expanding(
+            f"SELECT DISTINCT customer_id FROM {DB_NAME_FINANCE}.tbl_accounts_receivable WHERE invoice_no IN :nbrs", "nbrs"
+        ), {"nbrs": update_nbrs + list(insert_source_ids)})
+        touched_customers = cust_res.scalars().all()
 
         await db.commit()
-        return updated_count
+        await customer_balance.refresh(touched_customers)
+        return outcomes
 
     except Exception as e:
-        print(f"CRITICAL DB ERROR in bulk_update: {str(e)}")
+        logger.exception("CRITICAL ERROR in post_invoices_to_ar: %s", e)
         await db.rollback()
-        return -1
\ No newline at end of file
+        return None
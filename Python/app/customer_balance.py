@@ -0,0 +1,374 @@
+import logging
+import os
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from .database import SessionLocal
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DB_NAME_FINANCE = os.getenv('DB_NAME_FINANCE', 'btggasify_finance_live')
+DB_NAME_OLD = os.getenv('DB_NAME_OLD', 'btggasify_live')
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+# Off switch for the read model: writes never depend on it, but a deployment
+# without tbl_customer_balance can skip the refresh queries entirely
+CUSTOMER_BALANCE_ENABLED = os.getenv("CUSTOMER_BALANCE_ENABLED", "1").lower() in ("1", "true", "yes")
+CUSTOMER_BALANCE_TABLE = "tbl_customer_balance"
+# Seconds a refresh waits for another refresh of the same customer
+CUSTOMER_BALANCE_LOCK_TIMEOUT = int(os.getenv("CUSTOMER_BALANCE_LOCK_TIMEOUT", "10"))
+# Customer ids per verifier pass: one grouped source query and one table read each
+CUSTOMER_BALANCE_VERIFY_CHUNK = int(os.getenv("CUSTOMER_BALANCE_VERIFY_CHUNK", "500"))
+# Differences below this (IDR) are rounding, not drift
+CUSTOMER_BALANCE_TOLERANCE = Decimal(os.getenv("CUSTOMER_BALANCE_TOLERANCE", "0.01"))
+
+AMOUNT_COLUMNS = ("invoice_outstanding", "unapplied_credits", "total_outstanding")
+
+
+# ----------------------------------------------------------
+# SOURCE QUERY
+# ----------------------------------------------------------
+def build_balance_source_query(customer_filter: str) -> str:
+    """
+    Source amounts per (orgid, branchid, customer_id) in IDR, converted with
+    the same master_currency rates as /AR/aging: invoice outstanding (amount -
+    allocated receipts + linked DN - linked CN) and unallocated receipts per
+    branch, plus the customer's unlinked DN / CN totals, which carry no
+    org/branch and repeat on every row (_balance_rows attributes them once).
+    customer_filter constrains `customer_id` (e.g. "IN :ids").
+    """
+    rate = "COALESCE(cur.ExchangeRate, 1)"
+    return f"""
+        SELECT
+            s.orgid, s.branchid, s.customer_id,
+            COALESCE(inv.amount, 0) as invoice_amount,
+            COALESCE(rc.amount, 0) as receipt_amount,
+            COALESCE(dn.amount, 0) as debit_note_amount,
+            COALESCE(cn.amount, 0) as credit_note_amount
+        FROM (
+            SELECT DISTINCT orgid, branchid, customer_id
+            FROM {DB_NAME_FINANCE}.tbl_accounts_receivable
+            WHERE is_active = 1 AND customer_id {customer_filter}
+            UNION
+            SELECT DISTINCT orgid, branchid, customer_id
+            FROM {DB_NAME_FINANCE}.tbl_ar_receipt
+            WHERE is_active = 1 AND ar_id IS NULL AND customer_id {customer_filter}
+        ) s
+        LEFT JOIN (
+            SELECT ar.orgid, ar.branchid, ar.customer_id,
+                   SUM((ar.inv_amount - ar.already_received
+                        + COALESCE(dnl.amount, 0) - COALESCE(cnl.amount, 0)) * {rate}) as amount
+            FROM {DB_NAME_FINANCE}.tbl_accounts_receivable ar
+            LEFT JOIN (
+                SELECT TRIM(di.InvoiceNo) as invoice_no, SUM(dn.Amount) as amount
+                FROM {DB_NAME_FINANCE}.debit_invoice di
+                JOIN {DB_NAME_FINANCE}.Debit_Notes dn ON di.DebitNoteId = dn.DebitNoteId
+                WHERE dn.IsSubmitted = 1
+                GROUP BY TRIM(di.InvoiceNo)
+            ) dnl ON dnl.invoice_no = TRIM(ar.invoice_no)
+            LEFT JOIN (
+                SELECT TRIM(ci.InvoiceNo) as invoice_no, SUM(cn.Amount) as amount
+                FROM {DB_NAME_FINANCE}.credit_invoice ci
+                JOIN {DB_NAME_FINANCE}.Credit_Notes cn ON ci.CreditNoteId = cn.CreditNoteId
+                WHERE cn.IsSubmitted = 1
+                GROUP BY TRIM(ci.InvoiceNo)
+            ) cnl ON cnl.invoice_no = TRIM(ar.invoice_no)
+            LEFT JOIN {DB_NAME_OLD}.master_currency cur ON ar.currencyid = cur.CurrencyId
+            WHERE ar.is_active = 1 AND ar.customer_id {customer_filter}
+            GROUP BY ar.orgid, ar.branchid, ar.customer_id
+        ) inv ON inv.orgid = s.orgid AND inv.branchid = s.branchid AND inv.customer_id = s.customer_id
+        LEFT JOIN (
+            SELECT dn.CustomerId as customer_id, SUM(dn.Amount * {rate}) as amount
+            FROM {DB_NAME_FINANCE}.Debit_Notes dn
+            LEFT JOIN {DB_NAME_OLD}.master_currency cur ON dn.CurrencyId = cur.CurrencyId
+            WHERE dn.IsSubmitted = 1 AND dn.CustomerId {customer_filter}
+              AND NOT EXISTS (SELECT 1 FROM {DB_NAME_FINANCE}.debit_invoice di WHERE di.DebitNoteId = dn.DebitNoteId)
+            GROUP BY dn.CustomerId
+        ) dn ON dn.customer_id = s.customer_id
+        LEFT JOIN (
+            SELECT cn.CustomerId as customer_id, SUM(cn.Amount * {rate}) as amount
+            FROM {DB_NAME_FINANCE}.Credit_Notes cn
+            LEFT JOIN {DB_NAME_OLD}.master_currency cur ON cn.CurrencyId = cur.CurrencyId
+            WHERE cn.IsSubmitted = 1 AND cn.CustomerId {customer_filter}
+              AND NOT EXISTS (SELECT 1 FROM {DB_NAME_FINANCE}.credit_invoice ci WHERE ci.CreditNoteId = cn.CreditNoteId)
+            GROUP BY cn.CustomerId
+        ) cn ON cn.customer_id = s.customer_id
+        LEFT JOIN (
+            SELECT r.orgid, r.branchid, r.customer_id,
+                   SUM((r.cash_amount + r.bank_amount) * {rate}) as amount
+            FROM {DB_NAME_FINANCE}.tbl_ar_receipt r
+            LEFT JOIN {DB_NAME_OLD}.master_currency cur ON r.currencyid = cur.CurrencyId
+            WHERE r.is_active = 1 AND r.ar_id IS NULL AND r.customer_id {customer_filter}
+            GROUP BY r.orgid, r.branchid, r.customer_id
+        ) rc ON rc.orgid = s.orgid AND rc.branchid = s.branchid AND rc.customer_id = s.customer_id
+    """
+
+
+def _ids_statement(sql: str):
+    return text(sql).bindparams(bindparam("ids", expanding=True))
+
+
+def _money(value: Any) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _balance_rows(source_rows) -> List[Dict[str, Any]]:
+    """
+    Balance rows from source rows. A customer's unlinked DN / CN totals go to
+    their first org/branch only (lowest orgid, branchid), so summing a
+    customer's rows counts each note once.
+    """
+    balances = []
+    home_seen = set()
+    for row in sorted(source_rows, key=lambda r: (int(r["customer_id"]), int(r["orgid"]), int(r["branchid"]))):
+        customer_id = int(row["customer_id"])
+        is_home = customer_id not in home_seen
+        home_seen.add(customer_id)
+        invoice_outstanding = _money(row["invoice_amount"])
+        unapplied_credits = _money(row["receipt_amount"])
+        if is_home:
+            invoice_outstanding += _money(row["debit_note_amount"])
+            unapplied_credits += _money(row["credit_note_amount"])
+        balances.append({
+            "orgid": int(row["orgid"]),
+            "branchid": int(row["branchid"]),
+            "customer_id": customer_id,
+            "invoice_outstanding": invoice_outstanding,
+            "unapplied_credits": unapplied_credits,
+            "total_outstanding": invoice_outstanding - unapplied_credits,
+        })
+    return balances
+
+
+# ----------------------------------------------------------
+# MAINTENANCE (after the writer's commit)
+# ----------------------------------------------------------
+ER_NO_SUCH_TABLE = 1146
+_table_missing = False
+
+
+def _lock_name(customer_id: int) -> str:
+    # GET_LOCK names are server-wide (max 64 chars): scope them to this finance DB
+    return f"customer_balance:{DB_NAME_FINANCE}:{customer_id}"[:64]
+
+
+async def refresh(customer_ids: Iterable[Optional[int]]):
+    """
+    Recomputes the balance rows of the customers a write touched. Call it
+    after the writer's db.commit(): it runs in its own session and never
+    raises, so a write never fails because of the read model; a failed or
+    skipped refresh is logged and left for the verifier to repair.
+    """
+    ids = sorted({int(c) for c in customer_ids if c})
+    if ids and CUSTOMER_BALANCE_ENABLED and not _table_missing:
+        await _rebuild(ids)
+
+
+async def _rebuild(ids: List[int]) -> bool:
+    """
+    Rewrites the rows of the given customers from source. Refreshes of a
+    customer are serialised with GET_LOCK (taken in customer id order, held
+    until our commit) and the source is read only once the locks are held.
+    Under REPEATABLE READ the snapshot then includes every writer whose
+    refresh ran before ours, and a writer committing later refreshes after
+    us, so the last refresh sees the latest documents. The source is read
+    with plain consistent reads: no row locks on AR, receipts or DN/CN,
+    which the .NET app writes too.
+    """
+    global _table_missing
+    async with SessionLocal() as db:
+        locked = []
+        try:
+            for customer_id in ids:
+                name = _lock_name(customer_id)
+                got = (await db.execute(
+                    text("SELECT GET_LOCK(:name, :timeout)"), {"name": name, "timeout": CUSTOMER_BALANCE_LOCK_TIMEOUT}
+                )).scalar()
+                if got != 1:
+                    logger.warning("Customer balance refresh skipped: lock for customer %s timed out", customer_id)
+                    return False
+                locked.append(name)
+            # GET_LOCK reads no table, so the snapshot starts with the source query below
+            await db.commit()
+
+            result = await db.execute(_ids_statement(build_balance_source_query("IN :ids")), {"ids": ids})
+            rows = _balance_rows(result.mappings().all())
+            await db.execute(
+                _ids_statement(f"DELETE FROM {DB_NAME_FINANCE}.{CUSTOMER_BALANCE_TABLE} WHERE customer_id IN :ids"),
+                {"ids": ids},
+            )
+            if rows:
+                await db.execute(text(f"""
+                    INSERT INTO {DB_NAME_FINANCE}.{CUSTOMER_BALANCE_TABLE}
+                        (orgid, branchid, customer_id, invoice_outstanding, unapplied_credits, total_outstanding, updated_at)
+                    VALUES (:orgid, :branchid, :customer_id, :invoice_outstanding, :unapplied_credits, :total_outstanding, NOW())
+                """), rows)
+            await db.commit()
+            return True
+        except Exception as e:
+            await db.rollback()
+            if _mysql_errno(e) == ER_NO_SUCH_TABLE:
+                # customer_balance_schema.sql not applied: stop trying until restart
+                _table_missing = True
+                logger.error("%s does not exist; customer balance refresh disabled until restart", CUSTOMER_BALANCE_TABLE)
+            else:
+                logger.exception("Customer balance refresh failed for customers %s: %s", ids, e)
+            return False
+        finally:
+            for name in reversed(locked):
+                try:
+                    await db.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
+                except Exception:
+                    break  # connection gone: MySQL released its locks with it
+
+
+def _mysql_errno(error: Exception) -> Optional[int]:
+    args = getattr(getattr(error, "orig", error), "args", ())
+    return args[0] if args and isinstance(args[0], int) else None
+
+
+# ----------------------------------------------------------
+# READS
+# ----------------------------------------------------------
+async def fetch(
+    db: AsyncSession,
+    org_id: int,
+    branch_id: int,
+    customer_id: Optional[int] = None,
+    include_settled: bool = False,
+) -> List[Dict[str, Any]]:
+    sql = f"""
+        SELECT orgid, branchid, customer_id, invoice_outstanding, unapplied_credits, total_outstanding, updated_at
+        FROM {DB_NAME_FINANCE}.{CUSTOMER_BALANCE_TABLE}
+        WHERE orgid = :org_id AND branchid = :branch_id
+    """
+    params: Dict[str, Any] = {"org_id": org_id, "branch_id": branch_id}
+    if customer_id:
+        sql += " AND customer_id = :cust_id"
+        params["cust_id"] = customer_id
+    if not include_settled:
+        # Same cut as the aging report: something owed or some credit unapplied
+        sql += " AND (ABS(total_outstanding) >= 0.005 OR unapplied_credits > 0)"
+    result = await db.execute(text(sql), params)
+    return [dict(row) for row in result.mappings().all()]
+
+
+# ----------------------------------------------------------
+# VERIFIER
+# ----------------------------------------------------------
+def _drift(stored: Optional[Dict[str, Any]], source: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if stored is None and source is None:
+        return None
+    if stored is None:
+        # A settled customer with no row is fine: reads treat it as zero
+        if all(abs(source[c]) < CUSTOMER_BALANCE_TOLERANCE for c in AMOUNT_COLUMNS):
+            return None
+        kind = "missing"
+    elif source is None:
+        if all(abs(_money(stored[c])) < CUSTOMER_BALANCE_TOLERANCE for c in AMOUNT_COLUMNS):
+            return None
+        kind = "orphaned"
+    else:
+        if all(abs(_money(stored[c]) - source[c]) < CUSTOMER_BALANCE_TOLERANCE for c in AMOUNT_COLUMNS):
+            return None
+        kind = "mismatch"
+    base = source or stored
+    return {
+        "kind": kind,
+        "orgid": int(base["orgid"]),
+        "branchid": int(base["branchid"]),
+        "customer_id": int(base["customer_id"]),
+        "stored": {c: _money(stored[c]) for c in AMOUNT_COLUMNS} if stored else None,
+        "source": {c: source[c] for c in AMOUNT_COLUMNS} if source else None,
+    }
+
+
+async def _customer_id_range(db: AsyncSession) -> Tuple[int, int]:
+    result = await db.execute(text(f"""
+        SELECT MIN(lo) as lo, MAX(hi) as hi FROM (
+            SELECT MIN(customer_id) as lo, MAX(customer_id) as hi FROM {DB_NAME_FINANCE}.tbl_accounts_receivable
+            UNION ALL
+            SELECT MIN(customer_id), MAX(customer_id) FROM {DB_NAME_FINANCE}.tbl_ar_receipt
+            UNION ALL
+            SELECT MIN(customer_id), MAX(customer_id) FROM {DB_NAME_FINANCE}.{CUSTOMER_BALANCE_TABLE}
+        ) ranges
+    """))
+    row = result.fetchone()
+    if row is None or row.lo is None:
+        return 0, -1
+    return int(row.lo), int(row.hi)
+
+
+async def verify(
+    chunk_size: int = CUSTOMER_BALANCE_VERIFY_CHUNK,
+    repair: bool = False,
+    max_drift_rows: int = 200,
+) -> Dict[str, Any]:
+    """
+    Recomputes every customer from source, chunk_size customer ids at a time,
+    and compares with the stored rows. Reports missing, orphaned and
+    mismatched rows; with repair=True each drifting chunk's customers are
+    rewritten through refresh().
+    """
+    chunk_size = max(1, chunk_size)
+    report: Dict[str, Any] = {
+        "chunks": 0,
+        "rows_checked": 0,
+        "drift_count": 0,
+        "by_kind": {"missing": 0, "orphaned": 0, "mismatch": 0},
+        "repaired_customers": 0,
+        "drift": [],
+    }
+    async with SessionLocal() as db:
+        lo, hi = await _customer_id_range(db)
+        range_sql = "BETWEEN :lo AND :hi"
+        source_sql = text(build_balance_source_query(range_sql))
+        stored_sql = text(f"""
+            SELECT orgid, branchid, customer_id, invoice_outstanding, unapplied_credits, total_outstanding
+            FROM {DB_NAME_FINANCE}.{CUSTOMER_BALANCE_TABLE}
+            WHERE customer_id {range_sql}
+        """)
+
+        for start in range(lo, hi + 1, chunk_size):
+            params = {"lo": start, "hi": start + chunk_size - 1}
+            source = {
+                (r["orgid"], r["branchid"], r["customer_id"]): r
+                for r in _balance_rows((await db.execute(source_sql, params)).mappings().all())
+            }
+            stored = {
+                (int(r["orgid"]), int(r["branchid"]), int(r["customer_id"])): r
+                for r in (await db.execute(stored_sql, params)).mappings().all()
+            }
+            # Each chunk reads a consistent snapshot; end it before the next one
+            await db.rollback()
+            report["chunks"] += 1
+            report["rows_checked"] += len(source.keys() | stored.keys())
+
+            drifted = set()
+            for key in sorted(source.keys() | stored.keys()):
+                entry = _drift(stored.get(key), source.get(key))
+                if entry is None:
+                    continue
+                drifted.add(key[2])
+                report["drift_count"] += 1
+                report["by_kind"][entry["kind"]] += 1
+                if len(report["drift"]) < max_drift_rows:
+                    report["drift"].append(entry)
+
+            if repair and drifted and await _rebuild(sorted(drifted)):
+                report["repaired_customers"] += len(drifted)
+
+    if report["drift_count"]:
+        logger.warning(
+            "Customer balance drift: %s rows (%s)%s",
+            report["drift_count"], report["by_kind"], ", repaired" if repair else "",
+        )
+    return report
@@ -0,0 +1,203 @@
+import re
+import threading
+from typing import Dict, Iterable, Set, Tuple
+
+from sqlalchemy import event
+
+from .cache import bus
+
+# ----------------------------------------------------------
+# WRITE DETECTION
+# ----------------------------------------------------------
+# INSERT / REPLACE write exactly one table; db-qualified and backquoted names are accepted
+_INSERT_RE = re.compile(
+    r"^\s*(?:INSERT|REPLACE)(?:\s+(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY|IGNORE))*\s+(?:INTO\s+)?([`\w.]+)",
+    re.IGNORECASE,
+)
+# UPDATE / DELETE may name several tables (JOINs, comma lists, DELETE t1, t2 FROM ... USING)
+_UPDATE_RE = re.compile(r"^\s*UPDATE(?:\s+(?:LOW_PRIORITY|IGNORE))*\s+(.*?)\bSET\b", re.IGNORECASE | re.DOTALL)
+_DELETE_RE = re.compile(r"^\s*DELETE(?:\s+(?:LOW_PRIORITY|QUICK|IGNORE))*\s+(.*)$", re.IGNORECASE | re.DOTALL)
+_MULTI_WRITE_RE = re.compile(r"^\s*(?:UPDATE|DELETE)\s", re.IGNORECASE)
+_CALL_RE = re.compile(r"^\s*CALL\s", re.IGNORECASE)
+
+_PARENS_RE = re.compile(r"\([^()]*\)")
+_JOIN_SPLIT_RE = re.compile(r",|\bSTRAIGHT_JOIN\b|\bJOIN\b", re.IGNORECASE)
+_DELETE_USING_RE = re.compile(r"\bUSING\b", re.IGNORECASE)
+_DELETE_FROM_RE = re.compile(r"^.*?\bFROM\b", re.IGNORECASE | re.DOTALL)
+_CLAUSE_END_RE = re.compile(r"\b(?:WHERE|ORDER\s+BY|LIMIT)\b", re.IGNORECASE)
+_IDENT_RE = re.compile(r"^[`\w.]+$")
+
+# Stored procedures can write anything: treat them as touching every table
+ALL_TABLES = "*"
+
+
+def _table_name(token: str) -> str:
+    return token.replace("`", "").split(".")[-1].lower()
+
+
+def _strip_parens(sql: str) -> str:
+    # ON conditions, subqueries and derived tables; a derived table cannot be
+    # the target of a write, and the tables inside it are only read
+    while True:
+        stripped = _PARENS_RE.sub(" ~ ", sql)
+        if stripped == sql:
+            return sql
+        sql = stripped
+
+
+def _referenced_tables(refs: str) -> Set[str]:
+    """Base tables in a table-reference list (parentheses already stripped)."""
+    tables = set()
+    for part in _JOIN_SPLIT_RE.split(refs):
+        words = part.split()
+        if words and _IDENT_RE.match(words[0]):
+            tables.add(_table_name(words[0]))
+    return tables
+
+
+def written_tables(statement: str) -> Set[str]:
+    """
+    Tables a statement may write (lower-case, unqualified). Multi-table
+    UPDATE / DELETE count every base table they reference, since the targets
+    can be aliases; CALL and anything unparseable count as ALL_TABLES.
+    Empty for reads.
+    """
+    if not statement:
+        return set()
+    match = _INSERT_RE.match(statement)
+    if match:
+        return {_table_name(match.group(1))}
+    if _CALL_RE.match(statement):
+        return {ALL_TABLES}
+    if not _MULTI_WRITE_RE.match(statement):
+        return set()
+    statement = _strip_parens(statement)
+    match = _UPDATE_RE.match(statement)
+    if match:
+        return _referenced_tables(match.group(1)) or {ALL_TABLES}
+    match = _DELETE_RE.match(statement)
+    if match:
+        rest = match.group(1)
+        using = _DELETE_USING_RE.search(rest)
+        refs = rest[using.end():] if using else _DELETE_FROM_RE.sub("", rest, count=1)
+        end_match = _CLAUSE_END_RE.search(refs)
+        if end_match:
+            refs = refs[:end_match.start()]
+        return _referenced_tables(refs) or {ALL_TABLES}
+    return {ALL_TABLES}
+
+
+# ----------------------------------------------------------
+# VERSION COUNTERS
+# ----------------------------------------------------------
+class DataVersions:
+    """
+    Per-table counters bumped after a transaction that wrote the table
+    commits. Readers key cached results on snapshot(tables): once a write
+    commits, the next reader sees a new key, so a result computed before the
+    commit is never served after it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0  # bumped by CALLs / bump_all()
+
+    def bump(self, *tables: str, broadcast: bool = True):
+        with self._lock:
+            for table in tables:
+                if table == ALL_TABLES:
+                    self._epoch += 1
+                else:
+                    key = table.lower()
+                    self._versions[key] = self._versions.get(key, 0) + 1
+        if broadcast and tables:
+            # Other workers bump their own counters, so their cached results for these tables go too
+            bus.publish(BUS_KIND, sorted(tables))
+
+    def bump_all(self):
+        self.bump(ALL_TABLES)
+
+    def snapshot(self, tables: Iterable[str]) -> Tuple:
+        with self._lock:
+            return (self._epoch,) + tuple(self._versions.get(t.lower(), 0) for t in tables)
+
+    def all_versions(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._versions, **{ALL_TABLES: self._epoch})
+
+
+data_versions = DataVersions()
+
+BUS_KIND = "data_versions"
+bus.on(BUS_KIND, lambda tables: data_versions.bump(*tables, broadcast=False))
+
+
+# ----------------------------------------------------------
+# PENDING WRITES PER CONNECTION
+# ----------------------------------------------------------
+def note_write(pending: Set[str], statement: str):
+    pending.update(written_tables(statement))
+
+
+def commit_writes(pending: Set[str]):
+    if pending:
+        data_versions.bump(*pending)
+        pending.clear()
+
+
+# ----------------------------------------------------------
+# SQLALCHEMY HOOKS
+# ----------------------------------------------------------
+_PENDING_KEY = "data_versions_pending"
+_COMMITTED_KEY = "data_versions_committed"
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    tables = written_tables(statement)
+    if tables:
+        conn.info.setdefault(_PENDING_KEY, set()).update(tables)
+
+
+def _commit(conn):
+    # The commit event fires before the DBAPI commit. Bump now and again once the
+    # connection is reused or checked in, so a reader that snapshotted in between
+    # cannot keep a pre-commit result under the new key.
+    pending = conn.info.get(_PENDING_KEY)
+    if pending:
+        conn.info.setdefault(_COMMITTED_KEY, set()).update(pending)
+        commit_writes(pending)
+
+
+def _settle(info):
+    committed = info.get(_COMMITTED_KEY)
+    if committed:
+        commit_writes(committed)
+
+
+def _begin(conn):
+    _settle(conn.info)
+
+
+def _rollback(conn):
+    pending = conn.info.get(_PENDING_KEY)
+    if pending:
+        pending.clear()
+
+
+def _checkin(dbapi_connection, connection_record):
+    _settle(connection_record.info)
+    # Uncommitted work is rolled back when the connection returns to the pool
+    pending = connection_record.info.get(_PENDING_KEY)
+    if pending:
+        pending.clear()
+
+
+def instrument_engine(engine):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "begin", _begin)
+        event.listen(sync_engine, "commit", _commit)
+        event.listen(sync_engine, "rollback", _rollback)
+        event.listen(sync_engine.pool, "checkin", _checkin)
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
+from .metrics import TimedAsyncQueuePool
 
 load_dotenv()
 
@@ -28,7 +29,10 @@ DATABASE_URL = (
     f"mysql+aiomysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
 )
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+# SQL echo goes through the 'sqlalchemy.engine' logger; keep it off in production
+DB_ECHO = os.getenv("DB_ECHO", "0").lower() in ("1", "true", "yes")
+
+engine = create_async_engine(DATABASE_URL, echo=DB_ECHO, poolclass=TimedAsyncQueuePool)
 SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from dotenv import load_dotenv
+
+from .data_versions import data_versions
+from .database import engine
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DB_NAME_USER = os.getenv('DB_NAME_USER', 'btggasify_live')
+DB_NAME_USER_NEW = os.getenv('DB_NAME_USER_NEW', 'btggasify_userpanel_live')
+DB_NAME_MASTER = os.getenv('DB_NAME_MASTER', 'btggasify_masterpanel_live')
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+# Writes through this API reload a dimension at once (data versions); this bounds
+# how long an edit made elsewhere (the .NET app) takes to show up
+DIMENSION_REFRESH_SECONDS = float(os.getenv("DIMENSION_REFRESH_SECONDS", "300"))
+# Optional last-modified column per table, e.g. "master_customer=LastModifiedDate".
+# With one, a timed refresh only fetches rows changed since the last load.
+DIMENSION_WATERMARKS = dict(
+    item.split("=", 1) for item in os.getenv("DIMENSION_WATERMARKS", "").replace(";", ",").split(",") if "=" in item
+)
+
+
+def _key(value: Any) -> Optional[int]:
+    """Ids arrive as int, Decimal or (deposit_bank_id) varchar; normalize to int."""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ----------------------------------------------------------
+# DIMENSION
+# ----------------------------------------------------------
+class Dimension:
+    """
+    An in-process id -> record map of a master table. get() reloads it when
+    a commit through this API touched the table (any worker: version bumps
+    are broadcast), or after DIMENSION_REFRESH_SECONDS. The timed refresh is
+    incremental when the table has a watermark column configured.
+    """
+
+    def __init__(self, name: str, database: str, table: str, key: str, columns: Tuple[str, ...]):
+        self.name = name
+        self.database = database
+        self.table = table
+        self.key = key
+        self.columns = columns
+        self.watermark = DIMENSION_WATERMARKS.get(table)
+        self._rows: Optional[Dict[int, Dict[str, Any]]] = None
+        self._version: Optional[Tuple] = None
+        self._loaded = 0.0
+        self._high_water = None
+        self._lock = asyncio.Lock()
+        self.full_loads = 0
+        self.incremental_loads = 0
+
+    def _fresh(self, version: Tuple) -> bool:
+        return (
+            self._rows is not None
+            and version == self._version
+            and time.monotonic() - self._loaded < DIMENSION_REFRESH_SECONDS
+        )
+
+    async def get(self) -> Dict[int, Dict[str, Any]]:
+        version = data_versions.snapshot((self.table,))
+        if self._fresh(version):
+            return self._rows
+        async with self._lock:
+            if self._fresh(version):
+                return self._rows
+            incremental = self._rows is not None and version == self._version and self.watermark and self._high_water is not None
+            try:
+                if incremental:
+                    await self._load_changed()
+                else:
+                    await self._load_all()
+            except Exception:
+                if self._rows is None:
+                    raise
+                # Serve the previous snapshot rather than failing the report
+                logger.exception("Refreshing dimension %s failed; keeping the loaded copy", self.name)
+            self._version = version
+            self._loaded = time.monotonic()
+        return self._rows
+
+    def _select(self) -> str:
+        columns = [self.key, *self.columns] + ([self.watermark] if self.watermark else [])
+        return f"SELECT {', '.join(columns)} FROM {self.database}.{self.table}"
+
+    async def _fetch(self, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        async with engine.connect() as conn:
+            result = await conn.execute(text(sql), params)
+            return [dict(row) for row in result.mappings().all()]
+
+    def _absorb(self, rows: Iterable[Dict[str, Any]], into: Dict[int, Dict[str, Any]]):
+        for row in rows:
+            key = _key(row.pop(self.key))
+            if key is None:
+                continue
+            if self.watermark:
+                mark = row.pop(self.watermark)
+                if mark is not None and (self._high_water is None or mark > self._high_water):
+                    self._high_water = mark
+            into[key] = row
+
+    async def _load_all(self):
+        rows = await self._fetch(self._select(), {})
+        fresh: Dict[int, Dict[str, Any]] = {}
+        self._high_water = None
+        self._absorb(rows, fresh)
+        self._rows = fresh
+        self.full_loads += 1
+
+    async def _load_changed(self):
+        # >= so rows stamped in the same instant as the last load are not missed
+        rows = await self._fetch(f"{self._select()} WHERE {self.watermark} >= :since", {"since": self._high_water})
+        updated = dict(self._rows)
+        self._absorb(rows, updated)
+        self._rows = updated
+        self.incremental_loads += 1
+
+    def invalidate(self):
+        self._version = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "table": f"{self.database}.{self.table}",
+            "rows": len(self._rows) if self._rows is not None else None,
+            "age_seconds": round(time.monotonic() - self._loaded, 1) if self._rows is not None else None,
+            "watermark": self.watermark,
+            "full_loads": self.full_loads,
+            "incremental_loads": self.incremental_loads,
+        }
+
+
+# ----------------------------------------------------------
+# DIMENSIONS
+# ----------------------------------------------------------
+# One source per entity: customer names come from the userpanel customer table everywhere
+customers = Dimension("customers", DB_NAME_USER_NEW, "master_customer", "Id", ("CustomerName", "SalesPersonId"))
+suppliers = Dimension("suppliers", DB_NAME_MASTER, "master_supplier", "SupplierId", ("SupplierName",))
+banks = Dimension("banks", DB_NAME_MASTER, "master_bank", "BankId", ("BankName", "CurrencyId"))
+currencies = Dimension("currencies", DB_NAME_USER, "master_currency", "CurrencyId", ("CurrencyCode", "ExchangeRate"))
+
+DIMENSIONS = {d.name: d for d in (customers, suppliers, banks, currencies)}
+
+
+async def load(*dims: Dimension) -> List[Dict[int, Dict[str, Any]]]:
+    """Current maps of several dimensions, refreshed concurrently where needed."""
+    return list(await asyncio.gather(*(d.get() for d in dims)))
+
+
+def attr(rows: Dict[int, Dict[str, Any]], key: Any, column: str, default: Any = None) -> Any:
+    """rows[key][column], or default when the id is unknown (a LEFT JOIN miss) or the value is NULL."""
+    record = rows.get(_key(key))
+    if record is None:
+        return default
+    value = record.get(column)
+    return default if value is None else value
@@ -0,0 +1,126 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from . import sync_db
+from .database import SessionLocal
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+# Most connections one request may hold at once for its fanned-out reads
+FANOUT_MAX_CONCURRENCY = int(os.getenv("FANOUT_MAX_CONCURRENCY", "5"))
+FANOUT_TIMEOUT = float(os.getenv("FANOUT_TIMEOUT", "60"))
+FANOUT_THREADS = int(os.getenv("FANOUT_THREADS", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=FANOUT_THREADS, thread_name_prefix="fanout")
+
+
+# ----------------------------------------------------------
+# ASYNC (engine sessions)
+# ----------------------------------------------------------
+async def gather_reads(
+    *queries: Callable[[AsyncSession], Awaitable[Any]],
+    limit: int = FANOUT_MAX_CONCURRENCY,
+    timeout: Optional[float] = FANOUT_TIMEOUT,
+) -> List[Any]:
+    """
+    Runs independent read queries concurrently, each on its own pooled session,
+    and returns their results in order. At most `limit` sessions are open at
+    once. If one query fails or the timeout expires, the rest are cancelled
+    and the error is raised.
+
+        opening, rows = await gather_reads(fetch_opening, fetch_rows)
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(query):
+        async with semaphore:
+            async with SessionLocal() as session:
+                return await query(session)
+
+    tasks = [asyncio.ensure_future(run(q)) for q in queries]
+    try:
+        return await asyncio.wait_for(asyncio.gather(*tasks), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"Fan-out of {len(queries)} queries exceeded {timeout}s")
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+# ----------------------------------------------------------
+# SYNC (pooled mysql.connector connections)
+# ----------------------------------------------------------
+def _run_on_connection(database: str, query: Callable[[Any], Any]):
+    conn = None
+    cursor = None
+    try:
+        conn = sync_db.get_connection(database)
+        cursor = conn.cursor(dictionary=True)
+        return query(cursor)
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
+
+
+def gather_reads_sync(
+    database: str,
+    *queries: Callable[[Any], Any],
+    limit: int = FANOUT_MAX_CONCURRENCY,
+    timeout: Optional[float] = FANOUT_TIMEOUT,
+) -> List[Any]:
+    """
+    gather_reads for sync endpoints: each query gets a dictionary cursor on
+    its own pooled connection to `database`, at most `limit` at a time.
+    `timeout` covers the whole fan-out, including waiting for a free slot.
+    The first failure is raised as soon as it happens; queries not yet
+    submitted are skipped and queued ones cancelled, while queries already
+    running finish in the background and return their connections to the pool.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    def remaining() -> Optional[float]:
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def raise_first_failure(finished):
+        for f in futures:
+            if f in finished and f.exception() is not None:
+                raise f.exception()
+
+    slots = threading.BoundedSemaphore(max(1, limit))
+    futures = []
+    try:
+        for query in queries:
+            if not slots.acquire(timeout=remaining()):
+                raise TimeoutError(f"Fan-out of {len(queries)} queries exceeded {timeout}s")
+            # A slot frees up when a query finishes, possibly by failing: stop submitting then
+            raise_first_failure({f for f in futures if f.done()})
+            # Copy the context so SQL still counts toward the request's metrics / profile
+            ctx = contextvars.copy_context()
+            future = _executor.submit(ctx.run, _run_on_connection, database, query)
+            future.add_done_callback(lambda _f: slots.release())
+            futures.append(future)
+
+        done, not_done = wait(futures, timeout=remaining(), return_when=FIRST_EXCEPTION)
+        raise_first_failure(done)
+        if not_done:
+            raise TimeoutError(f"Fan-out of {len(queries)} queries exceeded {timeout}s")
+        return [f.result() for f in futures]
+    except BaseException:
+        for f in futures:
+            f.cancel()
+        raise
@@ -0,0 +1,269 @@
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from .attachment_store import (
+    ATTACHMENT_STORE_DIR,
+    DOTNET_CONTENT_ROOT,
+    LEGACY_ATTACHMENT_STORE_DIR,
+    PROJECT_ROOT,
+    UPLOADED_FILES_MARKER,
+)
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+
+# Directories attachments may be served from; extra roots (e.g. the production
+# UploadedFiles directory) go in ATTACHMENT_ROOTS, separated by os.pathsep
+ATTACHMENT_ROOTS = [
+    os.path.realpath(p) for p in (
+        str(ATTACHMENT_STORE_DIR),
+        str(LEGACY_ATTACHMENT_STORE_DIR),
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads", "pettycash"),
+        os.path.join(DOTNET_CONTENT_ROOT, UPLOADED_FILES_MARKER),
+        *filter(None, os.getenv("ATTACHMENT_ROOTS", "").split(os.pathsep)),
+    )
+]
+
+PATH_INDEX_SIZE = int(os.getenv("ATTACHMENT_PATH_INDEX_SIZE", "4096"))
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Content-addressed blobs never change, everything else must be revalidated
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+# ----------------------------------------------------------
+# PATH INDEX
+# ----------------------------------------------------------
+class _PathIndex:
+    """Bounded LRU of requested path -> resolved local path. Misses are not cached."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            path = self._entries.get(key)
+            if path is not None:
+                self._entries.move_to_end(key)
+            return path
+
+    def put(self, key: str, path: str):
+        with self._lock:
+            self._entries[key] = path
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_path_index = _PathIndex(PATH_INDEX_SIZE)
+
+
+def _candidate_paths(file_path: str):
+    # 1. Exact path as stored in the DB / sent by the UI (production)
+    yield file_path
+
+    # 2. Relative to the project root or to the .NET content root
+    clean_path = file_path.lstrip("/\\")
+    yield os.path.join(PROJECT_ROOT, clean_path)
+    yield os.path.join(DOTNET_CONTENT_ROOT, clean_path)
+
+    # 3. Production path (/var/www/.../UploadedFiles/...) mapped onto the local checkout
+    if UPLOADED_FILES_MARKER in file_path:
+        relative_part = file_path.split(UPLOADED_FILES_MARKER, 1)[1].lstrip("/\\")
+        yield os.path.join(DOTNET_CONTENT_ROOT, UPLOADED_FILES_MARKER, relative_part)
+
+
+def resolve_attachment_path(file_path: str) -> Optional[str]:
+    """
+    Maps a stored attachment path onto a readable local file, remembering the
+    answer. Only files inside ATTACHMENT_ROOTS qualify, so `../` segments or a
+    project-relative path such as Python/.env resolve to None (404), never to
+    a file outside the attachment directories.
+    """
+    if not file_path:
+        return None
+
+    cached = _path_index.get(file_path)
+    if cached is not None:
+        if os.path.isfile(cached):
+            return cached
+        _path_index.discard(file_path)
+
+    for candidate in _candidate_paths(file_path):
+        if os.path.isfile(candidate) and is_under_attachment_root(candidate):
+            _path_index.put(file_path, candidate)
+            return candidate
+    return None
+
+
+def is_under_attachment_root(path: str) -> bool:
+    """True when path (symlinks resolved) lies inside one of ATTACHMENT_ROOTS."""
+    real = os.path.realpath(path)
+    for root in ATTACHMENT_ROOTS:
+        try:
+            if os.path.commonpath([real, root]) == root:
+                return True
+        except ValueError:  # different drives (Windows)
+            continue
+    return False
+
+
+# ----------------------------------------------------------
+# CONDITIONAL / RANGE HELPERS
+# ----------------------------------------------------------
+def _make_etag(stat_result) -> str:
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def etag_matches(header_value: str, etag: str) -> bool:
+    """If-None-Match check, shared with compression for precompressed report bodies."""
+    if not header_value:
+        return False
+    if header_value.strip() == "*":
+        return True
+    tags = [t.strip() for t in header_value.split(",")]
+    # Weak comparison (RFC 7232 2.3.2) is what If-None-Match uses
+    opaque = etag.removeprefix("W/")
+    return any(t.removeprefix("W/") == opaque for t in tags)
+
+
+def _not_modified_since(header_value: str, mtime: float) -> bool:
+    try:
+        since = parsedate_to_datetime(header_value)
+    except (TypeError, ValueError):
+        return False
+    return since is not None and int(mtime) <= since.timestamp()
+
+
+def _parse_range(header_value: str, size: int):
+    """Returns (start, end) inclusive for a single byte range, None to ignore, or 'invalid'."""
+    unit, _, spec = header_value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        # Multi-range responses are not worth the complexity here; send the whole file
+        return None
+
+    start_s, _, end_s = spec.strip().partition("-")
+    try:
+        if start_s == "":
+            # Suffix range: last N bytes
+            length = int(end_s)
+            if length <= 0:
+                return "invalid"
+            return max(size - length, 0), size - 1
+        start = int(start_s)
+        end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        return "invalid"
+    return start, min(end, size - 1)
+
+
+def _iter_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _content_disposition(filename: str, disposition: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+
+def _is_content_addressed(path: str) -> bool:
+    full = os.path.abspath(path)
+    for store in (ATTACHMENT_STORE_DIR, LEGACY_ATTACHMENT_STORE_DIR):
+        store = os.path.abspath(store)
+        try:
+            if os.path.commonpath([full, store]) == store:
+                return True
+        except ValueError:
+            pass
+    return False
+
+
+# ----------------------------------------------------------
+# RESPONSE
+# ----------------------------------------------------------
+def attachment_response(
+    request: Request,
+    path: str,
+    filename: Optional[str] = None,
+    media_type: str = "application/octet-stream",
+    cache_control: Optional[str] = None,
+    disposition: str = "attachment",
+) -> Response:
+    """
+    Serves a local file with ETag/Last-Modified validators, If-None-Match /
+    If-Modified-Since (304) and single HTTP byte ranges (206).
+    """
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    etag = _make_etag(stat_result)
+
+    if cache_control is None:
+        cache_control = IMMUTABLE_CACHE_CONTROL if _is_content_addressed(path) else REVALIDATE_CACHE_CONTROL
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": _content_disposition(filename or os.path.basename(path), disposition),
+    }
+
+    # 1. Conditional GET
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and _not_modified_since(if_modified_since, stat_result.st_mtime):
+            return Response(status_code=304, headers=headers)
+
+    # 2. Range request (ignored when If-Range no longer matches the file)
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header:
+        if_range = request.headers.get("if-range")
+        if if_range is None or if_range.strip() in (etag, headers["Last-Modified"]):
+            byte_range = _parse_range(range_header, size)
+
+    if byte_range == "invalid":
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is not None:
+        start, end = byte_range
+        length = end - start + 1
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(length)
+        return StreamingResponse(_iter_file(path, start, length), status_code=206, headers=headers, media_type=media_type)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(_iter_file(path, 0, size), status_code=200, headers=headers, media_type=media_type)
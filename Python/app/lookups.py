@@ -0,0 +1,132 @@
+import os
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_NAME_USER = os.getenv('DB_NAME_USER', 'btggasify_live')
+DB_NAME_USER_NEW = os.getenv('DB_NAME_USER_NEW', 'btggasify_userpanel_live')
+DB_NAME_MASTER = os.getenv('DB_NAME_MASTER', 'btggasify_masterpanel_live')
+
+
+# ----------------------------------------------------------
+# REGISTRY
+# ----------------------------------------------------------
+class Lookup:
+    """A dropdown / reference-data query: its fetcher and the tables it reads."""
+
+    __slots__ = ("name", "tables", "fetch")
+
+    def __init__(self, name: str, tables: Tuple[str, ...], fetch: Callable[[AsyncSession], Awaitable[Any]]):
+        self.name = name
+        self.tables = tables
+        self.fetch = fetch
+
+
+LOOKUPS: Dict[str, Lookup] = {}
+
+
+def lookup(name: str, *tables: str):
+    """Registers fetch(db) as the lookup `name`; tables drive cache invalidation."""
+    def register(fetch):
+        LOOKUPS[name] = Lookup(name, tables, fetch)
+        return fetch
+    return register
+
+
+def _rows(result):
+    return [dict(row) for row in result.mappings().all()]
+
+
+# ----------------------------------------------------------
+# LOOKUPS
+# ----------------------------------------------------------
+@lookup("suppliers", "master_supplier")
+async def fetch_suppliers(db: AsyncSession):
+    result = await db.execute(text(f"""
+        SELECT SupplierId, SupplierName
+        FROM {DB_NAME_MASTER}.master_supplier
+        WHERE IsActive = 1
+        ORDER BY SupplierName ASC
+    """))
+    return _rows(result)
+
+
+@lookup("sales_persons", "users", "master_customer")
+async def fetch_sales_persons(db: AsyncSession):
+    result = await db.execute(text(f"""
+        SELECT
+            Id as value,
+            CONCAT(FirstName, ' ', IFNULL(LastName, '')) as label
+        FROM {DB_NAME_USER}.users
+        WHERE IsActive = 1
+          AND (
+              Department = '9'
+              OR Id IN (
+                  SELECT DISTINCT SalesPersonId
+                  FROM {DB_NAME_USER_NEW}.master_customer
+                  WHERE SalesPersonId IS NOT NULL
+              )
+          )
+        ORDER BY FirstName ASC
+    """))
+    return _rows(result)
+
+
+@lookup("customer_defaults", "master_customer")
+async def fetch_customer_defaults(db: AsyncSession):
+    """customer id -> default sales person id."""
+    result = await db.execute(text(f"""
+        SELECT Id, SalesPersonId
+        FROM {DB_NAME_USER_NEW}.master_customer
+        WHERE IsActive = 1 AND SalesPersonId IS NOT NULL
+    """))
+    defaults = {}
+    for row in result.mappings().all():
+        sales_person_id = int(row['SalesPersonId']) if row['SalesPersonId'] else None
+        if sales_person_id is not None:
+            defaults[int(row['Id'])] = sales_person_id
+    return defaults
+
+
+@lookup("customers", "master_customer")
+async def fetch_customers(db: AsyncSession):
+    result = await db.execute(text(f"""
+        SELECT Id, CustomerName
+        FROM {DB_NAME_USER}.master_customer
+        WHERE IsActive = 1
+        ORDER BY CustomerName ASC
+    """))
+    return _rows(result)
+
+
+@lookup("banks", "master_bank")
+async def fetch_banks(db: AsyncSession):
+    result = await db.execute(text(f"SELECT BankId as id, BankName as name FROM {DB_NAME_MASTER}.master_bank WHERE IsActive = 1"))
+    return _rows(result)
+
+
+@lookup("currencies", "master_currency")
+async def fetch_currencies(db: AsyncSession):
+    result = await db.execute(text(f"SELECT * FROM {DB_NAME_USER}.master_currency"))
+    return _rows(result)
+
+
+@lookup("gas_items", "master_gascode")
+async def fetch_gas_items(db: AsyncSession):
+    result = await db.execute(text(f"""
+        SELECT Id, GasName
+        FROM {DB_NAME_USER_NEW}.master_gascode
+        WHERE IsActive = 1
+        ORDER BY GasName ASC
+    """))
+    return _rows(result)
+
+
+@lookup("item_filter", "master_gascode")
+async def fetch_item_filter(db: AsyncSession):
+    result = await db.execute(text(f"SELECT Id as value, GasName as label FROM {DB_NAME_USER_NEW}.master_gascode WHERE IsActive = 1 ORDER BY GasName"))
+    return _rows(result)
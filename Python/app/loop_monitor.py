@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from anyio import to_thread
+from fastapi import FastAPI
+from dotenv import load_dotenv
+
+from .metrics import METRIC_PREFIX, _Histogram, registry
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "1").lower() not in ("0", "false", "no")
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100"))
+LOOP_LAG_DUMP_MS = float(os.getenv("LOOP_LAG_DUMP_MS", "500"))
+LOOP_LAG_DUMP_COOLDOWN_S = float(os.getenv("LOOP_LAG_DUMP_COOLDOWN_S", "30"))
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+# ----------------------------------------------------------
+# MONITOR
+# ----------------------------------------------------------
+class LoopMonitor:
+    """
+    A heartbeat task measures how late the event loop wakes it up (lag) and
+    samples the AnyIO threadpool limiter that sync `def` endpoints run on.
+    A watchdog thread notices a heartbeat that is overdue while the loop is
+    still blocked and logs the loop thread's stack, which the heartbeat
+    itself could only report after the fact.
+    """
+
+    def __init__(self):
+        self.interval = LOOP_MONITOR_INTERVAL_MS / 1000
+        self.lag = _Histogram(LAG_BUCKETS)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.threadpool = {"in_use": 0, "total": 0, "waiting": 0}
+        self._last_beat = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._last_dump = 0.0
+        self._lock = threading.Lock()
+
+    # ---------------- heartbeat (event loop) ----------------
+    async def _heartbeat(self):
+        limiter = to_thread.current_default_thread_limiter()
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - expected)
+            stats = limiter.statistics()
+            with self._lock:
+                self._last_beat = now
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self.lag.observe(lag)
+                self.threadpool = {
+                    "in_use": stats.borrowed_tokens,
+                    "total": int(stats.total_tokens),
+                    "waiting": stats.tasks_waiting,
+                }
+
+    # ---------------- watchdog (own thread) ----------------
+    def _watch(self):
+        threshold = LOOP_LAG_DUMP_MS / 1000
+        in_stall = False
+        while not self._stopping.wait(self.interval):
+            overdue = time.perf_counter() - self._last_beat - self.interval
+            if overdue < threshold:
+                in_stall = False
+                continue
+            if in_stall:
+                continue  # one dump per stall
+            in_stall = True
+            with self._lock:
+                self.stalls += 1
+            if time.monotonic() - self._last_dump >= LOOP_LAG_DUMP_COOLDOWN_S:
+                self._last_dump = time.monotonic()
+                self._dump(overdue)
+
+    def _dump(self, overdue: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "<loop thread not found>"
+        logger.warning(
+            "Event loop blocked for %.0f ms; threadpool %s; longest in-flight %s\nLoop thread stack:\n%s",
+            overdue * 1000, self.threadpool, registry.longest_in_flight(limit=3), stack,
+        )
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stopping.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._watchdog = None
+
+    # ---------------- reporting ----------------
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "running": self._task is not None,
+                "interval_ms": LOOP_MONITOR_INTERVAL_MS,
+                "dump_threshold_ms": LOOP_LAG_DUMP_MS,
+                "lag_ms": round(self.last_lag * 1000, 2),
+                "max_lag_ms": round(self.max_lag * 1000, 2),
+                "avg_lag_ms": round(self.lag.total * 1000 / self.lag.count, 3) if self.lag.count else 0.0,
+                "stalls": self.stalls,
+                "threadpool": dict(self.threadpool),
+                "in_flight": registry.in_flight,
+                "longest_in_flight": registry.longest_in_flight(),
+            }
+
+    def render(self) -> List[str]:
+        p = METRIC_PREFIX
+        with self._lock:
+            lines = [
+                f"# HELP {p}_event_loop_lag_seconds Delay between a scheduled heartbeat and when the loop ran it.",
+                f"# TYPE {p}_event_loop_lag_seconds histogram",
+            ]
+            cumulative = 0
+            for bound, n in zip(self.lag.bounds, self.lag.counts):
+                cumulative += n
+                lines.append(f'{p}_event_loop_lag_seconds_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{p}_event_loop_lag_seconds_bucket{{le="+Inf"}} {self.lag.count}')
+            lines.append(f"{p}_event_loop_lag_seconds_sum {self.lag.total}")
+            lines.append(f"{p}_event_loop_lag_seconds_count {self.lag.count}")
+
+            gauges = (
+                ("event_loop_lag_max_seconds", "Largest heartbeat lag since start.", self.max_lag),
+                ("threadpool_threads_in_use", "AnyIO threadpool tokens borrowed by sync endpoints.", self.threadpool["in_use"]),
+                ("threadpool_threads_total", "AnyIO threadpool capacity.", self.threadpool["total"]),
+                ("threadpool_tasks_waiting", "Sync calls queued for a threadpool token.", self.threadpool["waiting"]),
+            )
+            for name, help_text, value in gauges:
+                lines.append(f"# HELP {p}_{name} {help_text}")
+                lines.append(f"# TYPE {p}_{name} gauge")
+                lines.append(f"{p}_{name} {value}")
+
+            lines.append(f"# HELP {p}_event_loop_stalls_total Times the loop was blocked longer than LOOP_LAG_DUMP_MS.")
+            lines.append(f"# TYPE {p}_event_loop_stalls_total counter")
+            lines.append(f"{p}_event_loop_stalls_total {self.stalls}")
+        return lines
+
+
+monitor = LoopMonitor()
+
+
+# ----------------------------------------------------------
+# WIRING
+# ----------------------------------------------------------
+def install(app: FastAPI):
+    """Runs the monitor for the lifetime of the app and adds its series to /metrics."""
+    registry.add_collector(monitor.render)
+    if not LOOP_MONITOR_ENABLED:
+        return
+
+    original_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app_):
+        monitor.start()
+        try:
+            async with original_lifespan(app_) as state:
+                yield state
+        finally:
+            await monitor.stop()
+
+    app.router.lifespan_context = lifespan
@@ -1,6 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from .logging_config import setup_logging
+
+# Queue-based logging (LOG_LEVEL, LOG_FORMAT=json|text); stdout writes happen off the event loop
+setup_logging()
+
 from .database import engine, Base
+from . import cache, compression, data_versions, loop_monitor, metrics, profiling, slow_query, statements
 
 # 1. IMPORT THE ROUTERS
 from .routers import finance, invoice_api, bankbook, procurement, claim_payment, cashbook, gas_master,journal
@@ -18,6 +24,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for large JSON responses (COMPRESSION_MIN_SIZE); inside metrics so sent bytes are wire bytes
+compression.install(app)
+
+# Opt-in per-request profiler (X-Profile: 1 + X-Admin-Token); added before metrics so metrics stays outermost
+profiling.install(app, engine)
+
+# Per-route latency / SQL / pool-wait metrics, exposed on /metrics
+metrics.install(app, engine)
+slow_query.instrument_engine(engine)
+# Per-table data versions bumped on commit; report cache / single-flight keys include them
+data_versions.instrument_engine(engine)
+# Cross-worker invalidation (CACHE_BACKEND=memory|redis); version bumps are broadcast to the other workers
+cache.install(app)
+
+# Statement worker processes are shut down with the app
+statements.install(app)
+
+# Event-loop lag / threadpool saturation monitor; logs the loop stack when it stalls (LOOP_LAG_DUMP_MS)
+loop_monitor.install(app)
+
 # 2. INCLUDE THE ROUTERS
 
 # Existing Finance Router
@@ -65,6 +91,13 @@ app.include_router(dn_cn.router)
 from .routers import journal
 app.include_router(journal.router)
 
+from .routers import admin
+app.include_router(admin.router)
+
+# One-call dropdown data per screen (/bootstrap/{screen})
+from .routers import bootstrap
+app.include_router(bootstrap.router)
+
 @app.get("/")
 def read_root():
     return {"message": "Finance API is running"}
\ No newline at end of file
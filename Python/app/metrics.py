@@ -0,0 +1,310 @@
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+METRICS_PATH = "/metrics"
+METRIC_PREFIX = "finance"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+UNMATCHED_ROUTE = "__unmatched__"
+REQUEST_ID_HEADER = b"x-request-id"
+
+access_logger = logging.getLogger("app.access")
+
+
+# ----------------------------------------------------------
+# PER-REQUEST STATS
+# ----------------------------------------------------------
+@dataclass
+class RequestStats:
+    request_id: str = ""
+    method: str = ""
+    path: str = ""
+    started: float = 0.0
+    queries: int = 0
+    db_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+    response_bytes: int = 0
+
+
+# Set by the middleware; SQL hooks add to whatever request is current.
+# Sync endpoints run in the threadpool with a copy of this context, so they see the same object.
+_current: ContextVar[Optional[RequestStats]] = ContextVar("finance_request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class _RouteMetrics:
+    __slots__ = ("latency", "queries_per_request", "queries", "db_seconds", "pool_wait_seconds", "response_bytes")
+
+    def __init__(self):
+        self.latency = _Histogram(LATENCY_BUCKETS)
+        self.queries_per_request = _Histogram(QUERY_COUNT_BUCKETS)
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.response_bytes = 0
+
+
+class MetricsRegistry:
+    """Aggregates per (method, route template, status) in memory."""
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str, str], _RouteMetrics] = {}
+        self._lock = threading.Lock()
+        self._active: Dict[int, RequestStats] = {}
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._active)
+
+    def begin(self, stats: RequestStats):
+        with self._lock:
+            self._active[id(stats)] = stats
+
+    def end(self, stats: RequestStats):
+        with self._lock:
+            self._active.pop(id(stats), None)
+
+    def longest_in_flight(self, limit: int = 5) -> List[Dict]:
+        """Oldest requests still being served, for stall diagnostics."""
+        now = time.perf_counter()
+        with self._lock:
+            active = sorted(self._active.values(), key=lambda s: s.started)[:limit]
+        return [
+            {
+                "request_id": s.request_id,
+                "method": s.method,
+                "path": s.path,
+                "running_ms": round((now - s.started) * 1000, 2),
+                "queries": s.queries,
+                "db_ms": round(s.db_seconds * 1000, 2),
+            }
+            for s in active
+        ]
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Extra exposition lines (already prefixed) appended on every scrape."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def record(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route, str(status))
+        with self._lock:
+            m = self._routes.get(key)
+            if m is None:
+                m = self._routes[key] = _RouteMetrics()
+            m.latency.observe(seconds)
+            m.queries_per_request.observe(stats.queries)
+            m.queries += stats.queries
+            m.db_seconds += stats.db_seconds
+            m.pool_wait_seconds += stats.pool_wait_seconds
+            m.response_bytes += stats.response_bytes
+
+    def snapshot(self):
+        with self._lock:
+            return [(key, m) for key, m in sorted(self._routes.items())]
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        p = METRIC_PREFIX
+        lines = []
+        rows = self.snapshot()
+
+        def labels(key, extra=""):
+            method, route, status = key
+            route = route.replace("\\", "\\\\").replace('"', '\\"')
+            base = f'method="{method}",route="{route}",status="{status}"'
+            return "{" + base + (("," + extra) if extra else "") + "}"
+
+        def histogram(name, help_text, attr):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} histogram")
+            for key, m in rows:
+                h = getattr(m, attr)
+                cumulative = 0
+                for bound, n in zip(h.bounds, h.counts):
+                    cumulative += n
+                    le = 'le="%s"' % bound
+                    lines.append(f"{p}_{name}_bucket{labels(key, le)} {cumulative}")
+                inf = 'le="+Inf"'
+                lines.append(f"{p}_{name}_bucket{labels(key, inf)} {h.count}")
+                lines.append(f"{p}_{name}_sum{labels(key)} {h.total}")
+                lines.append(f"{p}_{name}_count{labels(key)} {h.count}")
+
+        def counter(name, help_text, attr):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} counter")
+            for key, m in rows:
+                lines.append(f"{p}_{name}{labels(key)} {getattr(m, attr)}")
+
+        histogram("http_request_duration_seconds", "Request latency per route template.", "latency")
+        histogram("db_queries_per_request", "SQL statements executed per request.", "queries_per_request")
+        counter("db_queries_total", "SQL statements executed.", "queries")
+        counter("db_time_seconds_total", "Time spent executing SQL statements.", "db_seconds")
+        counter("db_pool_wait_seconds_total", "Time spent waiting for a pooled connection.", "pool_wait_seconds")
+        counter("http_response_bytes_total", "Response body bytes sent.", "response_bytes")
+
+        lines.append(f"# HELP {p}_http_requests_in_flight Requests currently being served.")
+        lines.append(f"# TYPE {p}_http_requests_in_flight gauge")
+        lines.append(f"{p}_http_requests_in_flight {self.in_flight}")
+
+        oldest = self.longest_in_flight(limit=1)
+        lines.append(f"# HELP {p}_http_request_oldest_in_flight_seconds Age of the longest-running in-flight request.")
+        lines.append(f"# TYPE {p}_http_request_oldest_in_flight_seconds gauge")
+        lines.append(f"{p}_http_request_oldest_in_flight_seconds {oldest[0]['running_ms'] / 1000 if oldest else 0}")
+
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+# ----------------------------------------------------------
+# ASGI MIDDLEWARE
+# ----------------------------------------------------------
+class MetricsMiddleware:
+    """Times each HTTP request and attributes SQL work to its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") == METRICS_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        # Honour an upstream request id (proxy / .NET gateway) so log lines can be correlated
+        request_id = dict(scope.get("headers") or []).get(REQUEST_ID_HEADER, b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        start = time.perf_counter()
+        stats = RequestStats(request_id=request_id, method=scope["method"], path=scope.get("path", ""), started=start)
+        token = _current.set(stats)
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            elif message["type"] == "http.response.body":
+                stats.response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        registry.begin(stats)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.end(stats)
+            _current.reset(token)
+            # The router stores the matched route in the scope; use its template so /verify/1 and /verify/2 share a series
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            elapsed = time.perf_counter() - start
+            registry.record(scope["method"], route_path, status_holder["status"], elapsed, stats)
+            access_logger.info(
+                "%s %s %s", scope["method"], scope.get("path", ""), status_holder["status"],
+                extra={
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "route": route_path,
+                    "status": status_holder["status"],
+                    "duration_ms": round(elapsed * 1000, 2),
+                    "queries": stats.queries,
+                },
+            )
+
+
+# ----------------------------------------------------------
+# SQLALCHEMY HOOKS
+# ----------------------------------------------------------
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                stats.pool_wait_seconds += time.perf_counter() - start
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute; drop their start time
+    conn = exception_context.connection
+    if conn is not None:
+        starts = conn.info.get("metrics_query_start")
+        if starts:
+            starts.pop()
+
+
+def instrument_engine(engine):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# ----------------------------------------------------------
+# WIRING
+# ----------------------------------------------------------
+def install(app: FastAPI, engine=None):
+    """Adds the middleware, the SQL hooks and the /metrics endpoint."""
+    app.add_middleware(MetricsMiddleware)
+    if engine is not None:
+        instrument_engine(engine)
+
+    @app.get(METRICS_PATH, include_in_schema=False)
+    def metrics_endpoint():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
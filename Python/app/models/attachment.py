@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from sqlalchemy.sql import func
+from ..database import Base
+
+
+class AttachmentBlob(Base):
+    """One row per distinct uploaded file, keyed by its SHA-256 content hash."""
+    __tablename__ = "tbl_attachment_blob"
+
+    attachment_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+
+    sha256 = Column(String(64), nullable=False, unique=True, index=True)
+    size_bytes = Column(BigInteger, nullable=False, default=0)
+    content_type = Column(String(100), nullable=True)
+
+    # Name the file had the first time it was uploaded (later duplicates keep their own name on the owning record)
+    original_name = Column(String(255), nullable=True)
+    storage_path = Column(String(500), nullable=False)
+
+    created_by = Column(Integer, nullable=True)
+    created_date = Column(DateTime(timezone=True), server_default=func.now())
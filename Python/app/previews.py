@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from .file_serving import is_under_attachment_root
+
+# Optional imaging libraries: thumbnails need Pillow, PDF first-page previews also need PyMuPDF
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - depends on deployment
+    Image = None
+    ImageOps = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # pragma: no cover - depends on deployment
+    fitz = None
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+PREVIEW_SIZES = (128, 256, 512)
+DEFAULT_PREVIEW_SIZE = 256
+PREVIEW_CACHE_DIR = Path(
+    os.getenv("PREVIEW_CACHE_DIR", str(Path(__file__).parent / "uploads" / "previews"))
+)
+PREVIEW_CACHE_MAX_BYTES = int(os.getenv("PREVIEW_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+PREVIEW_JPEG_QUALITY = 80
+
+# Previews are keyed by source mtime, so clients may keep them for a long time
+PREVIEW_CACHE_CONTROL = "private, max-age=2592000"
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp", ".tif", ".tiff"}
+PDF_EXTENSIONS = {".pdf"}
+
+# Previews written next to originals by earlier versions; never a preview source
+_LEGACY_PREVIEW_RE = re.compile(r"\.preview-\d+\.jpg$", re.IGNORECASE)
+
+
+# ----------------------------------------------------------
+# LRU DISK CACHE INDEX
+# ----------------------------------------------------------
+class _PreviewCache:
+    """
+    Tracks preview files and deletes the least recently used ones past the
+    byte budget. The first touch scans the cache directory, so files left by
+    earlier runs or other workers count toward the budget too.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # preview path -> size
+        self._lock = threading.Lock()
+        self._scanned = False
+
+    def _scan(self):
+        found = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, path, st.st_size))
+        # Oldest first: they are evicted first
+        for _mtime, path, size in sorted(found):
+            self._entries[path] = size
+            self.total_bytes += size
+        self._scanned = True
+
+    def touch(self, path: str, size: int):
+        evicted = []
+        with self._lock:
+            if not self._scanned:
+                self._scan()
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self.total_bytes -= old
+            self._entries[path] = size
+            self.total_bytes += size
+
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                victim, victim_size = self._entries.popitem(last=False)
+                self.total_bytes -= victim_size
+                evicted.append(victim)
+
+        for victim in evicted:
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+
+
+_cache = _PreviewCache(PREVIEW_CACHE_DIR, PREVIEW_CACHE_MAX_BYTES)
+_generation_locks = {}
+
+
+def _snap_size(size: int) -> int:
+    for allowed in PREVIEW_SIZES:
+        if size <= allowed:
+            return allowed
+    return PREVIEW_SIZES[-1]
+
+
+def preview_path_for(source_path: str, size: int) -> str:
+    # In the cache directory, keyed by a hash of the source path:
+    # <PREVIEW_CACHE_DIR>/<h[:2]>/<h>-256.jpg
+    digest = hashlib.sha256(os.path.realpath(source_path).encode("utf-8")).hexdigest()
+    return str(PREVIEW_CACHE_DIR / digest[:2] / f"{digest}-{size}.jpg")
+
+
+def _is_fresh(preview_path: str, source_path: str) -> bool:
+    try:
+        return os.stat(preview_path).st_mtime >= os.stat(source_path).st_mtime
+    except OSError:
+        return False
+
+
+def _render_preview(source_path: str, preview_path: str, size: int):
+    ext = Path(source_path).suffix.lower()
+
+    if ext in PDF_EXTENSIONS:
+        with fitz.open(source_path) as doc:
+            page = doc.load_page(0)
+            zoom = size / max(page.rect.width, 1)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    else:
+        with Image.open(source_path) as src:
+            img = ImageOps.exif_transpose(src)
+            img.thumbnail((size, size * 4))
+            img = img.convert("RGB")
+
+    os.makedirs(os.path.dirname(preview_path), exist_ok=True)
+    tmp_path = f"{preview_path}.tmp"
+    img.save(tmp_path, "JPEG", quality=PREVIEW_JPEG_QUALITY, optimize=True)
+    os.replace(tmp_path, preview_path)
+
+
+def is_under_preview_cache(path: str) -> bool:
+    real = os.path.realpath(path)
+    cache_root = os.path.realpath(PREVIEW_CACHE_DIR)
+    try:
+        return os.path.commonpath([real, cache_root]) == cache_root
+    except ValueError:  # different drives (Windows)
+        return False
+
+
+def _check_source(source_path: str):
+    # Only attachments can be previewed, and never a preview itself
+    if (
+        not is_under_attachment_root(source_path)
+        or is_under_preview_cache(source_path)
+        or _LEGACY_PREVIEW_RE.search(source_path)
+    ):
+        raise HTTPException(status_code=404, detail="File not found.")
+
+
+def _check_supported(source_path: str):
+    ext = Path(source_path).suffix.lower()
+    if Image is None:
+        raise HTTPException(status_code=415, detail="Previews are not available on this server")
+    if ext in PDF_EXTENSIONS and fitz is None:
+        raise HTTPException(status_code=415, detail="PDF previews are not available on this server")
+    if ext not in IMAGE_EXTENSIONS and ext not in PDF_EXTENSIONS:
+        raise HTTPException(status_code=415, detail=f"No preview available for '{ext}' files")
+
+
+# ----------------------------------------------------------
+# PUBLIC ENTRY POINT
+# ----------------------------------------------------------
+async def get_preview(source_path: str, size: int = DEFAULT_PREVIEW_SIZE) -> str:
+    """
+    Returns the path of a downscaled JPEG preview of source_path, generating it
+    in the threadpool on first request (or when the original changed).
+    """
+    _check_source(source_path)
+    _check_supported(source_path)
+    size = _snap_size(size)
+    preview_path = preview_path_for(source_path, size)
+
+    if not _is_fresh(preview_path, source_path):
+        # One generation per preview file; concurrent requests wait for it
+        lock = _generation_locks.setdefault(preview_path, asyncio.Lock())
+        try:
+            async with lock:
+                if not _is_fresh(preview_path, source_path):
+                    try:
+                        await run_in_threadpool(_render_preview, source_path, preview_path, size)
+                    except Exception as e:
+                        raise HTTPException(status_code=422, detail=f"Could not generate preview: {e}")
+        finally:
+            _generation_locks.pop(preview_path, None)
+
+    _cache.touch(preview_path, os.path.getsize(preview_path))
+    return preview_path
@@ -0,0 +1,312 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+
+from .auth import is_admin_token
+from .metrics import current_stats
+from .slow_query import normalize_statement
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(Path(__file__).parent / "uploads" / "profiles")))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "1"))
+PROFILE_MAX_SQL_EVENTS = 5000
+
+# Opt in with  X-Profile: 1  (or ?_profile=1) plus the admin token in X-Admin-Token.
+# The token is header-only so it never lands in access logs or the stored profile metadata.
+PROFILE_HEADER = b"x-profile"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+PROFILE_QUERY_FLAG = "_profile"
+
+
+# ----------------------------------------------------------
+# PROFILE STATE
+# ----------------------------------------------------------
+class RequestProfile:
+    """Stack samples and SQL events for one profiled request."""
+
+    def __init__(self, profile_id: str, loop_thread_id: int, task):
+        self.profile_id = profile_id
+        self.loop_thread_id = loop_thread_id
+        self.task = task
+        self.endpoint_code = None  # set once the router has matched the request
+        self.started = time.perf_counter()
+        self.stacks = Counter()
+        self.samples = 0
+        self.sql: List[Dict] = []
+        self._sql_lock = threading.Lock()
+
+    def add_sql(self, statement: str, elapsed: float, source: str):
+        with self._sql_lock:
+            if len(self.sql) >= PROFILE_MAX_SQL_EVENTS:
+                return
+            end = time.perf_counter()
+            self.sql.append({
+                "start_ms": round((end - elapsed - self.started) * 1000, 2),
+                "duration_ms": round(elapsed * 1000, 2),
+                "source": source,
+                "thread": threading.current_thread().name,
+                "statement": normalize_statement(statement)[:2000],
+            })
+
+
+_active: ContextVar[Optional[RequestProfile]] = ContextVar("finance_request_profile", default=None)
+_slots = threading.BoundedSemaphore(PROFILE_MAX_CONCURRENT)
+
+
+def record_sql(statement: str, elapsed: float, source: str):
+    """Called by the SQL hooks; no-op unless the current request is being profiled."""
+    profile = _active.get()
+    if profile is not None:
+        profile.add_sql(statement, elapsed, source)
+
+
+# ----------------------------------------------------------
+# SAMPLER
+# ----------------------------------------------------------
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _folded_stack(frame, root: str) -> Optional[str]:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(root)
+    labels.reverse()
+    return ";".join(labels)
+
+
+def _stack_contains(frame, code) -> bool:
+    while frame is not None:
+        if frame.f_code is code:
+            return True
+        frame = frame.f_back
+    return False
+
+
+class _Sampler(threading.Thread):
+    """
+    Periodically snapshots sys._current_frames(). Event-loop samples are only
+    kept while the profiled request's task is the one running; threadpool
+    samples are kept for workers currently inside the matched endpoint.
+    """
+
+    def __init__(self, profile: RequestProfile, loop, scope):
+        super().__init__(name=f"profiler-{profile.profile_id}", daemon=True)
+        self.profile = profile
+        self.loop = loop
+        self.scope = scope
+        self.interval = PROFILE_SAMPLE_INTERVAL_MS / 1000
+        self._done = threading.Event()
+
+    def run(self):
+        profile = self.profile
+        own_id = threading.get_ident()
+        while not self._done.wait(self.interval):
+            if profile.endpoint_code is None:
+                _bind_endpoint(profile, self.scope)
+            frames = sys._current_frames()
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                if thread_id == profile.loop_thread_id:
+                    if asyncio.current_task(self.loop) is not profile.task:
+                        # Request is suspended (DB I/O, threadpool, other tasks); keeps wall time visible
+                        profile.stacks["event-loop;(awaiting)"] += 1
+                        profile.samples += 1
+                        continue
+                    root = "event-loop"
+                elif profile.endpoint_code is not None and _stack_contains(frame, profile.endpoint_code):
+                    root = "threadpool"
+                else:
+                    continue
+                profile.stacks[_folded_stack(frame, root)] += 1
+                profile.samples += 1
+
+    def stop(self):
+        self._done.set()
+        self.join(timeout=1)
+
+
+# ----------------------------------------------------------
+# STORAGE
+# ----------------------------------------------------------
+def _prune():
+    files = sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for old in files[:max(0, len(files) - PROFILE_MAX_FILES)]:
+        for path in (old, old.with_suffix(".folded")):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def _save(profile: RequestProfile, meta: Dict):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    folded = "\n".join(f"{stack} {count}" for stack, count in profile.stacks.most_common())
+    (PROFILE_DIR / f"{profile.profile_id}.folded").write_text(folded + "\n")
+    meta = dict(meta, sample_interval_ms=PROFILE_SAMPLE_INTERVAL_MS, samples=profile.samples, sql=profile.sql)
+    (PROFILE_DIR / f"{profile.profile_id}.json").write_text(json.dumps(meta, default=str))
+    _prune()
+
+
+def list_profiles() -> List[Dict]:
+    out = []
+    if not PROFILE_DIR.is_dir():
+        return out
+    for path in sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
+        try:
+            meta = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        meta["sql_count"] = len(meta.pop("sql", []))
+        out.append(meta)
+    return out
+
+
+def profile_path(profile_id: str, suffix: str) -> Optional[Path]:
+    # Ids are generated here (hex + dash); anything else is not one of ours
+    if not profile_id or not all(c in "0123456789abcdef-" for c in profile_id):
+        return None
+    path = PROFILE_DIR / f"{profile_id}{suffix}"
+    return path if path.is_file() else None
+
+
+# ----------------------------------------------------------
+# ASGI MIDDLEWARE
+# ----------------------------------------------------------
+def _wants_profile(scope) -> bool:
+    headers = dict(scope.get("headers") or [])
+    query = parse_qs((scope.get("query_string") or b"").decode("latin-1"))
+    flag = headers.get(PROFILE_HEADER, b"").decode("latin-1") or (query.get(PROFILE_QUERY_FLAG) or [""])[0]
+    if flag not in ("1", "true", "yes"):
+        return False
+    return is_admin_token(headers.get(ADMIN_TOKEN_HEADER, b"").decode("latin-1"))
+
+
+class ProfilingMiddleware:
+    """Samples the call stacks of a single opted-in request and stores a folded profile."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not _slots.acquire(blocking=False):
+            # Keep the overhead bounded: one profiled request at a time by default
+            async def busy_send(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profile", b"busy")]
+                await send(message)
+            await self.app(scope, receive, busy_send)
+            return
+
+        loop = asyncio.get_running_loop()
+        profile = RequestProfile(
+            f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}",
+            threading.get_ident(),
+            asyncio.current_task(),
+        )
+        token = _active.set(profile)
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.profile_id.encode())]
+            await send(message)
+
+        sampler = _Sampler(profile, loop, scope)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            _active.reset(token)
+            _slots.release()
+            route = scope.get("route")
+            stats = current_stats()
+            meta = {
+                "profile_id": profile.profile_id,
+                "captured_at": datetime.now().isoformat(timespec="seconds"),
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "query": (scope.get("query_string") or b"").decode("latin-1"),
+                "route": getattr(route, "path", None),
+                "status": status_holder["status"],
+                "duration_ms": round((time.perf_counter() - profile.started) * 1000, 2),
+                "request_id": stats.request_id if stats is not None else None,
+            }
+            try:
+                await run_in_threadpool(_save, profile, meta)
+                logger.info("Saved request profile %s for %s", profile.profile_id, meta["path"])
+            except Exception as e:
+                logger.exception("Could not save request profile: %s", e)
+
+
+def _bind_endpoint(profile: RequestProfile, scope):
+    if profile.endpoint_code is None:
+        endpoint = getattr(scope.get("route"), "endpoint", None)
+        if endpoint is not None:
+            profile.endpoint_code = getattr(endpoint, "__code__", None)
+
+
+# ----------------------------------------------------------
+# SQLALCHEMY HOOKS
+# ----------------------------------------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("profile_query_start")
+    if starts and _active.get() is not None:
+        record_sql(statement, time.perf_counter() - starts.pop(), "engine")
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None:
+        starts = conn.info.get("profile_query_start")
+        if starts:
+            starts.pop()
+
+
+def install(app: FastAPI, engine=None):
+    app.add_middleware(ProfilingMiddleware)
+    if engine is not None:
+        sync_engine = getattr(engine, "sync_engine", engine)
+        if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+            event.listen(sync_engine, "handle_error", _handle_error)
@@ -0,0 +1,237 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from dotenv import load_dotenv
+
+from .cache import bus
+from .compression import PrecompressedBody, precompressed_response, precompressed_response_sync
+from .data_versions import data_versions
+from .metrics import METRIC_PREFIX, registry
+from .responses import dumps
+from .singleflight import normalize_params
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+REPORT_CACHE_ENABLED = os.getenv("REPORT_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+# Writes made outside the API (the .NET app, manual SQL) do not bump versions; bound their staleness
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "300"))
+
+
+# ----------------------------------------------------------
+# CACHE
+# ----------------------------------------------------------
+class _Entry:
+    __slots__ = ("payload", "created", "size")
+
+    def __init__(self, payload: PrecompressedBody):
+        self.payload = payload
+        self.created = time.monotonic()
+        self.size = payload.nbytes
+
+
+class _CacheStats:
+    __slots__ = ("hits", "misses", "evictions", "expired")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+
+class ReportCache:
+    """
+    Encoded report responses keyed by (name, params, data version), LRU by
+    bytes. Each entry keeps its compressed variants, so a hit skips the
+    query, the JSON encoding and the compression.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _CacheStats] = {}
+
+    def _stat(self, name: str) -> _CacheStats:
+        stat = self._stats.get(name)
+        if stat is None:
+            stat = self._stats[name] = _CacheStats()
+        return stat
+
+    @staticmethod
+    def key(name: str, params: Dict[str, Any], version: Hashable) -> Tuple:
+        return (name, normalize_params(params), version)
+
+    def get(self, key: Tuple) -> Optional[PrecompressedBody]:
+        name = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created > self.ttl:
+                self._drop(key)
+                self._stat(name).expired += 1
+                entry = None
+            if entry is None:
+                self._stat(name).misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stat(name).hits += 1
+            return entry.payload
+
+    def put(self, key: Tuple, payload: PrecompressedBody):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            entry = _Entry(payload)
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def account(self, key: Tuple):
+        """Re-measures an entry after a compressed variant was added to it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            size = entry.payload.nbytes
+            self._bytes += size - entry.size
+            entry.size = size
+            self._evict()
+
+    def _drop(self, key: Tuple):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self._stat(key[0]).evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # ---------------- reporting ----------------
+    def snapshot(self) -> Dict:
+        with self._lock:
+            reports = {}
+            for name, s in sorted(self._stats.items()):
+                lookups = s.hits + s.misses
+                reports[name] = {
+                    "hits": s.hits,
+                    "misses": s.misses,
+                    "hit_ratio": round(s.hits / lookups, 4) if lookups else None,
+                    "evictions": s.evictions,
+                    "expired": s.expired,
+                }
+            return {
+                "enabled": REPORT_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "reports": reports,
+            }
+
+    def render(self) -> List[str]:
+        p = METRIC_PREFIX
+        snap = self.snapshot()
+        lines = []
+        for metric, attr, help_text in (
+            ("report_cache_hits_total", "hits", "Report responses served from the cache."),
+            ("report_cache_misses_total", "misses", "Report lookups that had to run the query."),
+            ("report_cache_evictions_total", "evictions", "Entries evicted to stay within REPORT_CACHE_MAX_BYTES."),
+        ):
+            lines.append(f"# HELP {p}_{metric} {help_text}")
+            lines.append(f"# TYPE {p}_{metric} counter")
+            for name, s in snap["reports"].items():
+                lines.append(f'{p}_{metric}{{report="{name}"}} {s[attr]}')
+        lines.append(f"# HELP {p}_report_cache_bytes Bytes held by the report cache, compressed variants included.")
+        lines.append(f"# TYPE {p}_report_cache_bytes gauge")
+        lines.append(f"{p}_report_cache_bytes {snap['bytes']}")
+        lines.append(f"# HELP {p}_report_cache_entries Entries in the report cache.")
+        lines.append(f"# TYPE {p}_report_cache_entries gauge")
+        lines.append(f"{p}_report_cache_entries {snap['entries']}")
+        return lines
+
+
+report_cache = ReportCache(REPORT_CACHE_MAX_BYTES, REPORT_CACHE_TTL)
+registry.add_collector(report_cache.render)
+
+BUS_CLEAR = "report_cache_clear"
+bus.on(BUS_CLEAR, lambda _payload: report_cache.clear())
+
+
+def clear_all_workers():
+    """Clears this worker's report cache and tells the other workers to do the same."""
+    report_cache.clear()
+    bus.publish(BUS_CLEAR)
+
+
+# ----------------------------------------------------------
+# ENDPOINT HELPERS
+# ----------------------------------------------------------
+async def cached_report(
+    request: Request,
+    name: str,
+    params: Dict[str, Any],
+    tables: Iterable[str],
+    produce: Callable[[Hashable], Awaitable[Any]],
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Serves the cached response for (name, params, versions of tables), or
+    awaits produce(version) for the JSON content and caches it. Exceptions
+    from produce propagate and nothing is cached.
+    """
+    version = data_versions.snapshot(tables)
+    if not REPORT_CACHE_ENABLED:
+        return await precompressed_response(request, PrecompressedBody(dumps(await produce(version))), headers=headers)
+
+    key = report_cache.key(name, params, version)
+    payload = report_cache.get(key)
+    if payload is None:
+        payload = PrecompressedBody(dumps(await produce(version)))
+        report_cache.put(key, payload)
+    response = await precompressed_response(request, payload, headers=headers)
+    report_cache.account(key)
+    return response
+
+
+def cached_report_sync(
+    request: Request,
+    name: str,
+    params: Dict[str, Any],
+    tables: Iterable[str],
+    produce: Callable[[Hashable], Any],
+) -> Response:
+    """cached_report for sync endpoints running in the threadpool."""
+    version = data_versions.snapshot(tables)
+    if not REPORT_CACHE_ENABLED:
+        return precompressed_response_sync(request, PrecompressedBody(dumps(produce(version))))
+
+    key = report_cache.key(name, params, version)
+    payload = report_cache.get(key)
+    if payload is None:
+        payload = PrecompressedBody(dumps(produce(version)))
+        report_cache.put(key, payload)
+    response = precompressed_response_sync(request, payload)
+    report_cache.account(key)
+    return response
@@ -0,0 +1,57 @@
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on deployment
+    orjson = None
+
+
+# ----------------------------------------------------------
+# ENCODING
+# ----------------------------------------------------------
+def _default(obj: Any):
+    """Types the DB driver hands back that JSON has no native form for (same output as jsonable_encoder)."""
+    if isinstance(obj, Decimal):
+        # Whole numbers stay integers, like FastAPI's decimal encoder
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, timedelta):
+        return obj.total_seconds()  # MySQL TIME columns
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode("utf-8", errors="replace")
+    if isinstance(obj, UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+else:  # pragma: no cover - depends on deployment
+    def dumps(content: Any) -> bytes:
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# ----------------------------------------------------------
+# RESPONSE CLASS
+# ----------------------------------------------------------
+class FastJSONResponse(JSONResponse):
+    """
+    Serialises DB rows directly (orjson when installed) without going through
+    jsonable_encoder or a response_model. Only return trusted rows with it:
+    nothing is validated. Decimal/date/datetime cells need no pre-conversion.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,130 @@
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from ..auth import require_admin_token
+from .. import customer_balance
+from ..dimensions import DIMENSIONS
+from ..file_serving import attachment_response
+from ..loop_monitor import monitor
+from ..data_versions import data_versions
+from ..profiling import list_profiles, profile_path
+from ..cache import bus
+from ..report_cache import clear_all_workers, report_cache
+from ..slow_query import slow_log
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin_token)]
+)
+
+
+# --------------------------------------------------
+# SLOW QUERY LOG
+# --------------------------------------------------
+@router.get("/slow-queries")
+def get_slow_queries(limit: int = 100, min_ms: float = 0):
+    return {
+        "status": True,
+        "message": "Success",
+        "threshold_ms": slow_log.threshold_ms,
+        "data": slow_log.entries(limit=limit, min_ms=min_ms)
+    }
+
+
+@router.get("/slow-queries/summary")
+def get_slow_query_summary():
+    return {"status": True, "message": "Success", "data": slow_log.summary()}
+
+
+@router.get("/slow-queries/plans/{shape}")
+def get_slow_query_plan(shape: str):
+    plan = slow_log.plan(shape)
+    if not plan:
+        raise HTTPException(status_code=404, detail="No plan captured for this statement shape")
+    return {"status": True, "message": "Success", "data": plan}
+
+
+@router.delete("/slow-queries")
+def clear_slow_queries():
+    slow_log.clear()
+    return {"status": True, "message": "Slow query log cleared"}
+
+
+# --------------------------------------------------
+# REQUEST PROFILES
+# --------------------------------------------------
+@router.get("/profiles")
+def get_profiles():
+    return {"status": True, "message": "Success", "data": list_profiles()}
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    path = profile_path(profile_id, ".json")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {"status": True, "message": "Success", "data": json.loads(path.read_text())}
+
+
+@router.get("/profiles/{profile_id}/folded")
+def download_profile_stacks(profile_id: str, request: Request):
+    """Folded stacks for flamegraph.pl / speedscope."""
+    path = profile_path(profile_id, ".folded")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return attachment_response(request, str(path), filename=f"{profile_id}.folded", media_type="text/plain")
+
+
+# --------------------------------------------------
+# RUNTIME (event loop / threadpool)
+# --------------------------------------------------
+@router.get("/runtime")
+def get_runtime():
+    return {"status": True, "message": "Success", "data": monitor.snapshot()}
+
+
+# --------------------------------------------------
+# REPORT CACHE
+# --------------------------------------------------
+@router.get("/report-cache")
+def get_report_cache():
+    data = report_cache.snapshot()
+    data["data_versions"] = data_versions.all_versions()
+    data["invalidation_bus"] = bus.snapshot()
+    return {"status": True, "message": "Success", "data": data}
+
+
+@router.delete("/report-cache")
+def clear_report_cache():
+    clear_all_workers()
+    return {"status": True, "message": "Report cache cleared on all workers"}
+
+
+# --------------------------------------------------
+# DIMENSION CACHE
+# --------------------------------------------------
+@router.get("/dimensions")
+def get_dimensions():
+    return {"status": True, "message": "Success", "data": {name: d.snapshot() for name, d in DIMENSIONS.items()}}
+
+
+@router.delete("/dimensions")
+def reload_dimensions():
+    for d in DIMENSIONS.values():
+        d.invalidate()
+    return {"status": True, "message": "Dimensions will reload on next use"}
+
+
+# --------------------------------------------------
+# CUSTOMER BALANCE READ MODEL
+# --------------------------------------------------
+@router.post("/customer-balance/verify")
+async def verify_customer_balances(
+    repair: bool = False,
+    chunk_size: int = customer_balance.CUSTOMER_BALANCE_VERIFY_CHUNK,
+):
+    """Recomputes tbl_customer_balance from source and reports drift; repair=true rewrites drifting customers (also the initial backfill)."""
+    report = await customer_balance.verify(chunk_size=chunk_size, repair=repair)
+    return {"status": True, "message": "Success", "data": report}
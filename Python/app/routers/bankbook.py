@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession 
 from sqlalchemy import text, select, update
 from datetime import date
@@ -6,8 +8,15 @@ from typing import List, Optional
 from pydantic import BaseModel
 from .. import schemas
 from .. import crud 
+from .. import dimensions, lookups
 from ..database import get_db, DB_NAME_USER, DB_NAME_FINANCE, DB_NAME_MASTER, DB_NAME_OLD, DB_NAME_USER_NEW
 from ..models.finance import ARReceipt
+from ..columnar import FORMAT_ROWS, check_format, shape_rows
+from ..fanout import gather_reads
+from ..report_cache import cached_report
+from ..singleflight import report_flights
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/AR", 
@@ -89,115 +98,156 @@ async def get_daily_entries(db: AsyncSession = Depends(get_db)):
         return {"status": "error", "detail": str(e)}
 
 # --- UPDATED ENDPOINT: BANK BOOK REPORT ---
+# Tables the report reads; their data versions are part of the cache / single-flight key
+BANK_REPORT_TABLES = ("tbl_ar_receipt", "tbl_bank_opening_balance", "master_customer", "master_supplier", "master_bank", "master_currency")
+
+# Low-cardinality report columns, dictionary-encoded for ?format=columnar
+BANK_REPORT_DICTIONARY_COLUMNS = ("Account", "Party", "Currency", "TransactionType")
+
+async def _bank_book_rows(from_date: str, to_date: str, bank_id: int):
+    """
+    Opening balance plus receipts with a running balance. The two queries are
+    independent and run concurrently on their own connections, so coalesced
+    callers can share the call.
+    """
+    opening_sql = text(f"""
+        SELECT 
+            as_of_date as Date,
+            '-' as VoucherNo,
+            'OPENING BALANCE' as TransactionType,
+            '-' as Account,
+            '-' as Party,
+            'Brought Forward' as Description,
+            currency as Currency,
+            0.00 as CreditIn, 
+            opening_balance as DebitOut, 
+            opening_balance as NetAmount
+        FROM {DB_NAME_FINANCE}.tbl_bank_opening_balance
+        WHERE bank_id = :bank_id
+        LIMIT 1
+    """)
+
+    sql = text(f"""
+        SELECT 
+            COALESCE(r.receipt_date, r.created_date) as Date,
+            r.reference_no as VoucherNo,
+
+            CASE 
+                WHEN r.bank_amount < 0 THEN 'Payment' 
+                ELSE 'Receipt' 
+            END as TransactionType, 
+
+            -- Account / Party / Currency names come from the dimension cache
+            r.customer_id,
+
+            r.reference_no as Description,
+
+            CASE WHEN r.bank_amount >= 0 THEN r.bank_amount ELSE 0 END as DebitOut,
+            CASE WHEN r.bank_amount < 0 THEN ABS(r.bank_amount) ELSE 0 END as CreditIn,
+
+            r.bank_amount as NetAmount
+        FROM tbl_ar_receipt r
+        WHERE 
+            DATE(COALESCE(r.receipt_date, r.created_date)) BETWEEN :from_date AND :to_date
+            AND r.is_active = 1
+            AND r.is_submitted = 1
+            AND CAST(NULLIF(r.deposit_bank_id, '') AS UNSIGNED) = :bank_id
+
+        ORDER BY COALESCE(r.receipt_date, r.created_date) ASC, r.receipt_id ASC
+    """)
+
+    params = {
+        "from_date": from_date, 
+        "to_date": to_date, 
+        "bank_id": int(bank_id) 
+    }
+
+    async def fetch_opening(db):
+        if not bank_id:
+            return None
+        opening_result = await db.execute(opening_sql, {"bank_id": bank_id})
+        return opening_result.mappings().first()
+
+    async def fetch_transactions(db):
+        result = await db.execute(sql, params)
+        return result.mappings().all()
+
+    (opening_row, rows), (customer_names, supplier_names, bank_names, currency_codes) = await asyncio.gather(
+        gather_reads(fetch_opening, fetch_transactions),
+        dimensions.load(dimensions.customers, dimensions.suppliers, dimensions.banks, dimensions.currencies),
+    )
+
+    # Every row is for bank_id: one account name and currency for the whole report
+    account = dimensions.attr(bank_names, bank_id, "BankName")
+    currency = dimensions.attr(currency_codes, dimensions.attr(bank_names, bank_id, "CurrencyId"), "CurrencyCode", "IDR")
+
+    data = []
+    running_balance = 0.0
+
+    # 1. OPENING BALANCE
+    if opening_row:
+        op_item = dict(opening_row)
+        op_debit = float(op_item["DebitOut"] or 0)
+        running_balance = op_debit
+
+        op_item["CreditIn"] = 0.0
+        op_item["DebitOut"] = op_debit
+        op_item["Balance"] = running_balance
+        data.append(op_item)
+
+    # 2. TRANSACTIONS
+    for row in rows:
+        credit_val = float(row["CreditIn"] or 0) 
+        debit_val = float(row["DebitOut"] or 0)  
+
+        running_balance += (debit_val - credit_val)
+
+        # 🟢 FIX: Dynamic Party Name for Report (supplier for payments, customer for receipts)
+        customer_id = row["customer_id"]
+        is_payment = row["NetAmount"] is not None and row["NetAmount"] < 0
+        if is_payment and customer_id is not None and customer_id != 0:
+            party = dimensions.attr(supplier_names, customer_id, "SupplierName", "Unknown Supplier")
+        elif is_payment and customer_id == 0:
+            party = "Bank Charges"
+        else:
+            party = dimensions.attr(customer_names, customer_id, "CustomerName", "Unknown Customer")
+
+        data.append({
+            "Date": row["Date"],
+            "VoucherNo": row["VoucherNo"],
+            "TransactionType": row["TransactionType"],
+            "Account": account,
+            "Party": party,
+            "Description": row["Description"],
+            "Currency": currency,
+            "DebitOut": debit_val,
+            "CreditIn": credit_val,
+            "NetAmount": row["NetAmount"],
+            "Balance": running_balance,
+        })
+
+    return data
+
 @router.get("/get-report")
 async def get_bank_book_report(
+    request: Request,
     from_date: str,
     to_date: str,
     bank_id: int = 0,
-    db: AsyncSession = Depends(get_db)
+    response_format: str = Query(FORMAT_ROWS, alias="format")
 ):
+    response_format = check_format(response_format)
     try:
-        data = []
-        running_balance = 0.0
-
-        # 1. FETCH OPENING BALANCE
-        if bank_id and bank_id != 0:
-            opening_sql = text(f"""
-                SELECT 
-                    as_of_date as Date,
-                    '-' as VoucherNo,
-                    'OPENING BALANCE' as TransactionType,
-                    '-' as Account,
-                    '-' as Party,
-                    'Brought Forward' as Description,
-                    currency as Currency,
-                    0.00 as CreditIn, 
-                    opening_balance as DebitOut, 
-                    opening_balance as NetAmount
-                FROM {DB_NAME_FINANCE}.tbl_bank_opening_balance
-                WHERE bank_id = :bank_id
-                LIMIT 1
-            """)
-            opening_result = await db.execute(opening_sql, {"bank_id": bank_id})
-            opening_row = opening_result.mappings().first()
-
-            if opening_row:
-                op_item = dict(opening_row)
-                op_debit = float(op_item["DebitOut"] or 0)
-                running_balance = op_debit
-                
-                op_item["CreditIn"] = 0.0
-                op_item["DebitOut"] = op_debit
-                op_item["Balance"] = running_balance
-                data.append(op_item)
+        params = {"from_date": from_date, "to_date": to_date, "bank_id": bank_id}
 
-        # 2. FETCH TRANSACTIONS
-        sql = text(f"""
-            SELECT 
-                COALESCE(r.receipt_date, r.created_date) as Date,
-                r.reference_no as VoucherNo,
-                
-                CASE 
-                    WHEN r.bank_amount < 0 THEN 'Payment' 
-                    ELSE 'Receipt' 
-                END as TransactionType, 
-                
-                b.BankName as Account,
-                
-                -- 🟢 FIX: Dynamic Party Name for Report (Use s.SupplierName)
-                CASE 
-                    WHEN r.bank_amount < 0 AND r.customer_id != 0 THEN COALESCE(s.SupplierName, 'Unknown Supplier')
-                    WHEN r.bank_amount < 0 AND r.customer_id = 0 THEN 'Bank Charges'
-                    ELSE COALESCE(c.CustomerName, 'Unknown Customer') 
-                END as Party,
-                
-                r.reference_no as Description,
-                COALESCE(mc.CurrencyCode, 'IDR') as Currency, 
-                
-                CASE WHEN r.bank_amount >= 0 THEN r.bank_amount ELSE 0 END as DebitOut,
-                CASE WHEN r.bank_amount < 0 THEN ABS(r.bank_amount) ELSE 0 END as CreditIn,
-                
-                r.bank_amount as NetAmount
-            FROM tbl_ar_receipt r
-            LEFT JOIN {DB_NAME_USER}.master_customer c ON r.customer_id = c.Id
-            -- 🟢 FIX: Join on SupplierId
-            LEFT JOIN {DB_NAME_MASTER}.master_supplier s ON r.customer_id = s.SupplierId
-            LEFT JOIN {DB_NAME_MASTER}.master_bank b ON CAST(NULLIF(r.deposit_bank_id, '') AS UNSIGNED) = b.BankId
-            LEFT JOIN {DB_NAME_USER}.master_currency mc ON b.CurrencyId = mc.CurrencyId
-            WHERE 
-                DATE(COALESCE(r.receipt_date, r.created_date)) BETWEEN :from_date AND :to_date
-                AND r.is_active = 1
-                AND r.is_submitted = 1
-                AND CAST(NULLIF(r.deposit_bank_id, '') AS UNSIGNED) = :bank_id
-            
-            ORDER BY COALESCE(r.receipt_date, r.created_date) ASC, r.receipt_id ASC
-        """)
+        async def produce(version):
+            data = await report_flights.do("bank_book_report", params, _bank_book_rows, from_date, to_date, bank_id, version=version)
+            return {"status": "success", "data": shape_rows(data, response_format, BANK_REPORT_DICTIONARY_COLUMNS)}
 
-        params = {
-            "from_date": from_date, 
-            "to_date": to_date, 
-            "bank_id": int(bank_id) 
-        }
-
-        result = await db.execute(sql, params)
-        rows = result.mappings().all()
-        
-        for row in rows:
-            item = dict(row)
-            credit_val = float(item["CreditIn"] or 0) 
-            debit_val = float(item["DebitOut"] or 0)  
-            
-            running_balance += (debit_val - credit_val)
-            
-            item["CreditIn"] = credit_val
-            item["DebitOut"] = debit_val
-            item["Balance"] = running_balance
-            data.append(item)
-            
-        return {"status": "success", "data": data}
+        return await cached_report(request, "bank_book_report", dict(params, format=response_format), BANK_REPORT_TABLES, produce)
 
     except Exception as e:
-        print(f"Error fetching bank book report: {e}")
+        logger.exception("Error fetching bank book report: %s", e)
         return {"status": "error", "detail": str(e)}
 
 # --- 🟢 UPDATED ENDPOINT: GET SUPPLIER FILTER ---
@@ -205,14 +255,7 @@ async def get_bank_book_report(
 async def get_supplier_filter(db: AsyncSession = Depends(get_db)):
     try:
         # 🟢 FIX: Use SupplierId column & DB_NAME_MASTER
-        query = text(f"""
-            SELECT SupplierId, SupplierName 
-            FROM {DB_NAME_MASTER}.master_supplier 
-            WHERE IsActive = 1 
-            ORDER BY SupplierName ASC
-        """)
-        result = await db.execute(query)
-        data = result.mappings().all()
+        data = await lookups.fetch_suppliers(db)
         return {"status": "success", "data": data}
     except Exception as e:
         return {"status": "error", "detail": str(e)}
@@ -246,6 +289,18 @@ async def submit_receipt(receipt_id: int, db: AsyncSession = Depends(get_db)):
     await db.commit()
     return {"status": "success"}
 
+@router.put("/bulk-submit")
+async def bulk_submit_receipts(payload: schemas.BulkSubmitRequest, db: AsyncSession = Depends(get_db)):
+    try:
+        results = await crud.bulk_submit_receipts(db, payload.receipt_ids)
+    except Exception as e:
+        logger.exception("Bulk submit failed: %s", e)
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    submitted = sum(1 for r in results if r["code"] == crud.BULK_OK_SUBMITTED)
+    return {"status": "success", "message": f"Submitted {submitted} of {len(results)} receipts", "data": results}
+
 @router.get("/get-by-id")
 async def get_by_id(receipt_id: int, db: AsyncSession = Depends(get_db)):
     stmt = select(ARReceipt).where(ARReceipt.receipt_id == receipt_id)
@@ -267,7 +322,7 @@ async def create_receipt(payload: schemas.CreateARCommand, db: AsyncSession = De
             raise HTTPException(status_code=400, detail="Failed to create receipt")
 
     except Exception as e:
-        print(f"Create Error: {e}")
+        logger.exception("Create Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/update/{receipt_id}")
@@ -313,55 +368,21 @@ async def update_receipt(receipt_id: int, payload: CreateReceiptRequest, db: Asy
 @router.get("/get-sales-persons")
 async def get_sales_persons(db: AsyncSession = Depends(get_db)):
     try:
-        query = text(f"""
-            SELECT 
-                Id as value, 
-                CONCAT(FirstName, ' ', IFNULL(LastName, '')) as label 
-            FROM {DB_NAME_USER}.users 
-            WHERE IsActive = 1 
-              AND (
-                  Department = '9' 
-                  OR Id IN (
-                      SELECT DISTINCT SalesPersonId 
-                      FROM {DB_NAME_USER_NEW}.master_customer 
-                      WHERE SalesPersonId IS NOT NULL
-                  )
-              )
-            ORDER BY FirstName ASC
-        """)
-        
-        result = await db.execute(query)
-        sales_persons = result.mappings().all()
-        
+        sales_persons = await lookups.fetch_sales_persons(db)
         return {"status": "success", "data": sales_persons}
 
     except Exception as e:
-        print(f"Error fetching sales persons: {e}")
+        logger.exception("Error fetching sales persons: %s", e)
         return {"status": "error", "detail": str(e)}
 
 @router.get("/get-customer-defaults")
 async def get_customer_defaults(db: AsyncSession = Depends(get_db)):
     try:
-        query = text(f"""
-            SELECT Id, SalesPersonId 
-            FROM {DB_NAME_USER_NEW}.master_customer 
-            WHERE IsActive = 1 AND SalesPersonId IS NOT NULL
-        """)
-        
-        result = await db.execute(query)
-        rows = result.mappings().all()
-        
-        defaults = {}
-        for row in rows:
-            customer_id = int(row['Id'])
-            sales_person_id = int(row['SalesPersonId']) if row['SalesPersonId'] else None
-            if sales_person_id is not None:
-                defaults[customer_id] = sales_person_id
-        
+        defaults = await lookups.fetch_customer_defaults(db)
         return {"status": "success", "data": defaults}
 
     except Exception as e:
-        print(f"❌ Error fetching customer defaults: {e}")
+        logger.exception("Error fetching customer defaults: %s", e)
         return {"status": "error", "detail": str(e)}
 
 
@@ -407,5 +428,5 @@ async def sync_claim_to_ap(
 
     except Exception as e:
         await db.rollback()
-        print(f"❌ Sync Error: {e}")
+        logger.exception("Sync Error: %s", e)
         return {"status": "error", "detail": str(e)}
\ No newline at end of file
@@ -0,0 +1,57 @@
+import logging
+from typing import Dict, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+
+from ..fanout import gather_reads
+from ..lookups import LOOKUPS
+from ..report_cache import cached_report
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/bootstrap",
+    tags=["Bootstrap"]
+)
+
+# --------------------------------------------------
+# SCREENS: the lookups each screen loads on open
+# --------------------------------------------------
+SCREENS: Dict[str, Tuple[str, ...]] = {
+    "receipt-entry": ("suppliers", "sales_persons", "customer_defaults", "customers", "currencies", "banks"),
+    "bank-book": ("suppliers", "customers", "currencies", "banks"),
+    "invoice": ("gas_items", "item_filter", "customers", "sales_persons", "currencies"),
+    "sales-report": ("item_filter", "customers", "sales_persons"),
+    "dn-cn": ("customers", "currencies"),
+}
+
+# Browsers revalidate with If-None-Match on every open; unchanged data costs a 304
+BOOTSTRAP_CACHE_CONTROL = "private, no-cache"
+
+
+@router.get("/{screen}")
+async def get_bootstrap(screen: str, request: Request):
+    """Every dropdown a screen needs in one response, with one ETag over all of them."""
+    names = SCREENS.get(screen)
+    if names is None:
+        raise HTTPException(status_code=404, detail=f"Unknown screen '{screen}'. Known: {', '.join(sorted(SCREENS))}")
+
+    lookups = [LOOKUPS[name] for name in names]
+    tables = sorted({table for lk in lookups for table in lk.tables})
+
+    async def produce(version):
+        results = await gather_reads(*[lk.fetch for lk in lookups])
+        return {
+            "status": True,
+            "message": "Success",
+            "data": dict(zip(names, results))
+        }
+
+    try:
+        return await cached_report(
+            request, "bootstrap", {"screen": screen}, tables, produce,
+            headers={"Cache-Control": BOOTSTRAP_CACHE_CONTROL}
+        )
+    except Exception as e:
+        logger.exception("Error building bootstrap for %s: %s", screen, e)
+        raise HTTPException(status_code=500, detail=str(e))
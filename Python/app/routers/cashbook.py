@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession 
 from sqlalchemy import text, select, update
 from datetime import date
@@ -6,8 +7,15 @@ from typing import List, Optional
 from pydantic import BaseModel
 from .. import schemas
 from .. import crud 
-from ..database import get_db, DB_NAME_USER, DB_NAME_FINANCE, DB_NAME_MASTER, DB_NAME_OLD, DB_NAME_USER_NEW
+from .. import customer_balance
+from .. import dimensions
+from ..database import engine, get_db, DB_NAME_USER, DB_NAME_FINANCE, DB_NAME_MASTER, DB_NAME_OLD, DB_NAME_USER_NEW
 from ..models.finance import ARReceipt
+from ..columnar import FORMAT_ROWS, check_format, shape_rows
+from ..report_cache import cached_report
+from ..singleflight import report_flights
+
+logger = logging.getLogger(__name__)
 
 # Distinct prefix for Cash Book to avoid conflict with Bank Book
 router = APIRouter(
@@ -89,17 +97,15 @@ async def get_daily_cash_entries(db: AsyncSession = Depends(get_db)):
     except Exception as e:
         return {"status": "error", "detail": str(e)}
 
-@router.get("/get-report")
-async def get_cash_book_report(
-    from_date: str,
-    to_date: str,
-    bank_id: int = 0,
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    Cash Book Report. Uses cash_amount for CashIn/CashOut.
-    """
-    try:
+# Tables the report reads; their data versions are part of the cache / single-flight key
+CASH_REPORT_TABLES = ("tbl_ar_receipt", "master_customer", "master_supplier")
+
+# Low-cardinality report columns, dictionary-encoded for ?format=columnar
+CASH_REPORT_DICTIONARY_COLUMNS = ("Party", "Currency", "TransactionType")
+
+async def _cash_book_rows(from_date: str, to_date: str):
+    """Cash receipts/payments with a running balance. Uses its own connection so coalesced callers can share the call."""
+    async with engine.connect() as db:
         sql = f"""
             SELECT 
                 r.receipt_id,
@@ -111,11 +117,8 @@ async def get_cash_book_report(
                     ELSE 'Receipt' 
                 END as TransactionType, 
                 
-                -- Dynamic Party Name
-                CASE 
-                    WHEN r.cash_amount < 0 AND r.customer_id != 0 THEN COALESCE(s.SupplierName, 'Unknown Supplier')
-                    ELSE COALESCE(c.CustomerName, 'Unknown Customer') 
-                END as Party,
+                -- customer_id here; replaced by the name from the dimension cache
+                r.customer_id as Party,
                 
                 r.reference_no as Description,
                 'IDR' as Currency, 
@@ -126,8 +129,6 @@ async def get_cash_book_report(
                 r.cash_amount as NetAmount
                 
             FROM tbl_ar_receipt r
-            LEFT JOIN {DB_NAME_USER_NEW}.master_customer c ON r.customer_id = c.Id
-            LEFT JOIN {DB_NAME_MASTER}.master_supplier s ON r.customer_id = s.SupplierId
             
             WHERE DATE(COALESCE(r.receipt_date, r.created_date)) BETWEEN :from_date AND :to_date
               AND r.is_active = 1
@@ -141,25 +142,56 @@ async def get_cash_book_report(
         
         result = await db.execute(text(sql), params)
         rows = result.mappings().all()
+
+    customer_names, supplier_names = await dimensions.load(dimensions.customers, dimensions.suppliers)
+
+    data = []
+    running_balance = 0.0 
+    
+    for row in rows:
+        item = dict(row)
+        cash_in = float(item["CashIn"] or 0)
+        cash_out = float(item["CashOut"] or 0)
+        running_balance += (cash_in - cash_out)
+
+        # Dynamic Party Name: supplier for payments, customer for receipts
+        customer_id = item["Party"]
+        if item["NetAmount"] is not None and item["NetAmount"] < 0 and customer_id is not None and customer_id != 0:
+            item["Party"] = dimensions.attr(supplier_names, customer_id, "SupplierName", "Unknown Supplier")
+        else:
+            item["Party"] = dimensions.attr(customer_names, customer_id, "CustomerName", "Unknown Customer")
         
-        data = []
-        running_balance = 0.0 
+        item["CashIn"] = cash_in
+        item["CashOut"] = cash_out
+        item["Balance"] = running_balance
+        data.append(item)
         
-        for row in rows:
-            item = dict(row)
-            cash_in = float(item["CashIn"] or 0)
-            cash_out = float(item["CashOut"] or 0)
-            running_balance += (cash_in - cash_out)
-            
-            item["CashIn"] = cash_in
-            item["CashOut"] = cash_out
-            item["Balance"] = running_balance
-            data.append(item)
-            
-        return {"status": "success", "data": data}
+    return data
+
+@router.get("/get-report")
+async def get_cash_book_report(
+    request: Request,
+    from_date: str,
+    to_date: str,
+    bank_id: int = 0,
+    response_format: str = Query(FORMAT_ROWS, alias="format")
+):
+    """
+    Cash Book Report. Uses cash_amount for CashIn/CashOut.
+    """
+    response_format = check_format(response_format)
+    try:
+        # bank_id is accepted for parity with the bank book but does not filter cash rows
+        params = {"from_date": from_date, "to_date": to_date}
+
+        async def produce(version):
+            data = await report_flights.do("cash_book_report", params, _cash_book_rows, from_date, to_date, version=version)
+            return {"status": "success", "data": shape_rows(data, response_format, CASH_REPORT_DICTIONARY_COLUMNS)}
+
+        return await cached_report(request, "cash_book_report", dict(params, format=response_format), CASH_REPORT_TABLES, produce)
 
     except Exception as e:
-        print(f"Error fetching cash book report: {e}")
+        logger.exception("Error fetching cash book report: %s", e)
         return {"status": "error", "detail": str(e)}
 
 # ==========================================
@@ -212,6 +244,7 @@ async def create_cash_receipt(payload: CreateCashReceiptRequest, db: AsyncSessio
             created_records.append(db_receipt)
 
         await db.commit()
+        await customer_balance.refresh([r.customer_id for r in created_records])
         for record in created_records:
             await db.refresh(record)
             
@@ -222,7 +255,7 @@ async def create_cash_receipt(payload: CreateCashReceiptRequest, db: AsyncSessio
         }
     except Exception as e:
         await db.rollback()
-        print(f"Cash Create Error: {e}")
+        logger.exception("Cash Create Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/update/{receipt_id}")
@@ -239,6 +272,7 @@ async def update_cash_receipt(receipt_id: int, payload: CreateCashReceiptRequest
         if not entry:
             raise HTTPException(status_code=404, detail="Entry not found")
 
+        previous_customer_id = entry.customer_id
         entry.customer_id = data.customer_id
         entry.deposit_bank_id = "0"  # Cash entries have no bank
 
@@ -263,6 +297,7 @@ async def update_cash_receipt(receipt_id: int, payload: CreateCashReceiptRequest
             
         entry.updated_by = str(payload.userId)
         await db.commit()
+        await customer_balance.refresh([previous_customer_id, entry.customer_id])
         return {"status": "success"}
     except Exception as e:
         await db.rollback()
@@ -277,4 +312,16 @@ async def submit_cash_receipt(receipt_id: int, db: AsyncSession = Depends(get_db
     )
     await db.execute(stmt)
     await db.commit()
-    return {"status": "success"}
\ No newline at end of file
+    return {"status": "success"}
+
+@router.put("/bulk-submit")
+async def bulk_submit_cash_receipts(payload: schemas.BulkSubmitRequest, db: AsyncSession = Depends(get_db)):
+    try:
+        results = await crud.bulk_submit_receipts(db, payload.receipt_ids)
+    except Exception as e:
+        logger.exception("Bulk submit failed: %s", e)
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    submitted = sum(1 for r in results if r["code"] == crud.BULK_OK_SUBMITTED)
+    return {"status": "success", "message": f"Submitted {submitted} of {len(results)} receipts", "data": results}
\ No newline at end of file
@@ -1,6 +1,7 @@
+import logging
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import mysql.connector
+from .. import sync_db
 import os
 from datetime import datetime
 from dotenv import load_dotenv
@@ -8,6 +9,8 @@ from typing import List  # <--- Added for List[int]
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/api/claim",
     tags=["Claim Payment Discussion"]
@@ -39,13 +42,8 @@ class GenerateSPCRequest(BaseModel):
     CreatedDate: str
 
 def get_db_connection_sync():
-    return mysql.connector.connect(
-        host=os.getenv('DB_HOST'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        database=os.getenv('DB_NAME_FINANCE', 'btggasify_finance_live'),
-        port=int(os.getenv('DB_PORT', 3306))
-    )
+    # Pooled and traced (metrics + slow-query log); close() returns it to the pool
+    return sync_db.get_connection(os.getenv('DB_NAME_FINANCE', 'btggasify_finance_live'))
 
 # --- NEW FUNCTION: Generate SPC ---
 @router.post("/generate_spc")
@@ -102,7 +100,7 @@ def generate_spc(payload: GenerateSPCRequest):
         }
 
     except Exception as e:
-        print(f"Error generating SPC: {str(e)}")
+        logger.exception("Error generating SPC: %s", e)
         if conn: conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -170,7 +168,7 @@ def save_hod_discussion(req: HodDiscussionRequest):
         
         return {"status": True, "message": "Discussion sent to applicant", "data": new_comment, "is_delete_required": new_count == 3}
     except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cursor: cursor.close()
@@ -235,7 +233,7 @@ def save_applicant_reply(req: ApplicantReplyRequest):
         
         return {"status": True, "message": msg, "data": final_comment}
     except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cursor: cursor.close()
@@ -265,7 +263,7 @@ def get_history(claim_id: int):
             
         return {"status": True, "data": comment_data}
     except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cursor: cursor.close()
@@ -369,9 +367,7 @@ def save_hod_gm_discussion(req: DiscussionRequest):
         
         return {"status": True, "message": "Discussion saved", "data": new_comment, "is_delete_required": is_third_count}
     except Exception as e:
-        print(f"Error in save_hod_gm_discussion: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in save_hod_gm_discussion: %s", e)
         raise HTTPException(status_code=500, detail=f"Database Error: {str(e)}")
     finally:
         try:
@@ -405,7 +401,7 @@ def get_hod_gm_history(claim_id: int):
         
         return {"status": True, "data": comment_data}
     except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cursor: cursor.close()
@@ -479,9 +475,7 @@ def save_gm_director_discussion(req: DiscussionRequest):
         
         return {"status": True, "message": "Discussion saved", "data": new_comment, "is_delete_required": is_third_count}
     except Exception as e:
-        print(f"Error in save_gm_director_discussion: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in save_gm_director_discussion: %s", e)
         raise HTTPException(status_code=500, detail=f"Database Error: {str(e)}")
     finally:
         try:
@@ -507,7 +501,7 @@ def get_gm_director_history(claim_id: int):
         
         return {"status": True, "data": row[0] or ""}
     except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cursor: cursor.close()
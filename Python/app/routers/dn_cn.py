@@ -1,7 +1,9 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from ..database import get_db, engine
+from .. import customer_balance, lookups
 from ..models.dn_cn import CreditNotes, DebitNotes, CreditInvoice, DebitInvoice
 from pydantic import BaseModel
 from typing import Optional, List
@@ -10,6 +12,8 @@ import os
 from dotenv import load_dotenv
 
 load_dotenv()
+
+logger = logging.getLogger(__name__)
 DB_NAME_USER = os.getenv('DB_NAME_USER', 'btggasify_live')
 DB_NAME_FINANCE = os.getenv('DB_NAME_FINANCE', 'btggasify_finance_live')
 
@@ -81,8 +85,8 @@ async def create_credit_note(note: CreditNoteCreate, db: Session = Depends(get_d
         IsSubmitted=note.IsSubmitted 
     )
     db.add(new_cn)
-    await db.commit()
-    await db.refresh(new_cn)
+    # Flush for the id; the note, its invoice link and the customer balance commit together
+    await db.flush()
 
     # 2. Insert into credit_invoice if InvoiceNo (ID) is present
     # Note: CreditInvoice.InvoiceNo is String(50). If we have ID, do we put ID?
@@ -94,7 +98,10 @@ async def create_credit_note(note: CreditNoteCreate, db: Session = Depends(get_d
             InvoiceNo=str(note.InvoiceNo) 
         )
         db.add(new_inv)
-        await db.commit()
+
+    await db.commit()
+    await customer_balance.refresh([note.CustomerId])
+    await db.refresh(new_cn)
 
     return {"status": "success", "message": "Credit Note created successfully", "data": new_cn}
 
@@ -109,6 +116,7 @@ async def update_credit_note(note: CreditNoteUpdate, db: Session = Depends(get_d
     if not existing_cn:
         raise HTTPException(status_code=404, detail="Credit Note not found")
 
+    previous_customer_id = existing_cn.CustomerId
     existing_cn.CreditNoteNumber = note.CreditNoteNo
     existing_cn.TransactionDate = note.Date
     existing_cn.Amount = note.CreditAmount
@@ -117,8 +125,6 @@ async def update_credit_note(note: CreditNoteUpdate, db: Session = Depends(get_d
     existing_cn.InvoiceId = note.InvoiceNo
     existing_cn.CurrencyId = note.CurrencyId
     existing_cn.IsSubmitted = note.IsSubmitted
-    
-    await db.commit()
 
     # 2. Update credit_invoice
     if note.InvoiceNo:
@@ -134,7 +140,9 @@ async def update_credit_note(note: CreditNoteUpdate, db: Session = Depends(get_d
                 InvoiceNo=str(note.InvoiceNo)
             )
             db.add(new_inv)
-        await db.commit()
+
+    await db.commit()
+    await customer_balance.refresh([previous_customer_id, note.CustomerId])
 
     return {"status": "success", "message": "Credit Note updated successfully", "data": existing_cn}
 
@@ -154,8 +162,8 @@ async def create_debit_note(note: DebitNoteCreate, db: Session = Depends(get_db)
         IsSubmitted=note.IsSubmitted
     )
     db.add(new_dn)
-    await db.commit()
-    await db.refresh(new_dn)
+    # Flush for the id; the note, its invoice link and the customer balance commit together
+    await db.flush()
 
     # 2. Insert into debit_invoice
     if note.InvoiceNo:
@@ -164,7 +172,10 @@ async def create_debit_note(note: DebitNoteCreate, db: Session = Depends(get_db)
             InvoiceNo=str(note.InvoiceNo)
         )
         db.add(new_inv)
-        await db.commit()
+
+    await db.commit()
+    await customer_balance.refresh([note.CustomerId])
+    await db.refresh(new_dn)
 
     return {"status": "success", "message": "Debit Note created successfully", "data": new_dn}
 
@@ -180,6 +191,7 @@ async def update_debit_note(note: DebitNoteUpdate, db: Session = Depends(get_db)
     if not existing_dn:
         raise HTTPException(status_code=404, detail="Debit Note not found")
 
+    previous_customer_id = existing_dn.CustomerId
     existing_dn.DebitNoteNumber = note.DebitNoteNo
     existing_dn.TransactionDate = note.Date
     existing_dn.Amount = note.DebitAmount
@@ -188,8 +200,6 @@ async def update_debit_note(note: DebitNoteUpdate, db: Session = Depends(get_db)
     existing_dn.InvoiceId = note.InvoiceNo
     existing_dn.CurrencyId = note.CurrencyId
     existing_dn.IsSubmitted = note.IsSubmitted
-    
-    await db.commit()
 
     # 2. Update debit_invoice
     if note.InvoiceNo:
@@ -205,7 +215,9 @@ async def update_debit_note(note: DebitNoteUpdate, db: Session = Depends(get_db)
                 InvoiceNo=str(note.InvoiceNo)
             )
             db.add(new_inv)
-        await db.commit()
+
+    await db.commit()
+    await customer_balance.refresh([previous_customer_id, note.CustomerId])
 
     return {"status": "success", "message": "Debit Note updated successfully", "data": existing_dn}
 
@@ -214,18 +226,10 @@ async def update_debit_note(note: DebitNoteUpdate, db: Session = Depends(get_db)
 async def get_customers():
     try:
         async with engine.connect() as conn:
-            query = text(f"""
-                SELECT Id, CustomerName 
-                FROM {DB_NAME_USER}.master_customer 
-                WHERE IsActive = 1 
-                ORDER BY CustomerName ASC
-            """)
-            result = await conn.execute(query)
-            rows = result.fetchall()
-            return {"status": "success", "data": [dict(row._mapping) for row in rows]}
+            return {"status": "success", "data": await lookups.fetch_customers(conn)}
             
     except Exception as e:
-        print(f"Error fetching customers: {e}")
+        logger.exception("Error fetching customers: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # 6. Get All Credit Notes
@@ -245,7 +249,7 @@ async def get_all_credit_notes():
             rows = result.fetchall()
             return {"status": "success", "data": [dict(row._mapping) for row in rows]}
     except Exception as e:
-        print(f"Error fetching credit notes: {e}")
+        logger.exception("Error fetching credit notes: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # 7. Get All Debit Notes
@@ -265,7 +269,7 @@ async def get_all_debit_notes():
             rows = result.fetchall()
             return {"status": "success", "data": [dict(row._mapping) for row in rows]}
     except Exception as e:
-        print(f"Error fetching debit notes: {e}")
+        logger.exception("Error fetching debit notes: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # 8. Get Credit Note by ID
@@ -288,7 +292,7 @@ async def get_credit_note_by_id(id: int):
             else:
                  return {"status": "error", "message": "Credit Note not found"}
     except Exception as e:
-        print(f"Error fetching credit note: {e}")
+        logger.exception("Error fetching credit note: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # 9. Get Debit Note by ID
@@ -311,5 +315,5 @@ async def get_debit_note_by_id(id: int):
             else:
                  return {"status": "error", "message": "Debit Note not found"}
     except Exception as e:
-        print(f"Error fetching debit note: {e}")
+        logger.exception("Error fetching debit note: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,8 +1,11 @@
+import logging
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import FileResponse
 import os
 import platform
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/api/download_file",
     tags=["Download File"]
@@ -50,7 +53,7 @@ def download_file(file_path: str = Query(...), file_id: int = Query(0)):
                 relative_part
             )
             
-            print(f"DEBUG: Strict path failed. Trying local fallback: '{local_fallback_path}'")
+            logger.debug("Strict path failed. Trying local fallback: '%s'", local_fallback_path)
             
             if os.path.exists(local_fallback_path):
                 return FileResponse(
@@ -59,8 +62,8 @@ def download_file(file_path: str = Query(...), file_id: int = Query(0)):
                     media_type="application/octet-stream"
                 )
         except Exception as e:
-            print(f"DEBUG: Local fallback attempt failed: {e}")
+            logger.debug("Local fallback attempt failed: %s", e)
 
     # 3. If both fail, return 404 and log debug info
-    print(f"DEBUG: File not found at path: '{file_path}'")
+    logger.debug("File not found at path: '%s'", file_path)
     raise HTTPException(status_code=404, detail=f"File not found. Checked: {file_path}")
\ No newline at end of file
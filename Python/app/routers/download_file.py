@@ -1,7 +1,6 @@
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import FileResponse
-import os
-import platform
+from fastapi import APIRouter, HTTPException, Query, Request
+from ..file_serving import resolve_attachment_path, attachment_response
+from ..previews import get_preview, DEFAULT_PREVIEW_SIZE, PREVIEW_CACHE_CONTROL
 
 router = APIRouter(
     prefix="/api/download_file",
@@ -9,58 +8,27 @@ router = APIRouter(
 )
 
 @router.get("/download")
-def download_file(file_path: str = Query(...), file_id: int = Query(0)):
-    # 1. First, try ONLY strict absolute path (Production Mode)
-    # Per instructions: "In Python, always use the absolute file path exactly as sent by the UI."
-    if os.path.exists(file_path):
-        return FileResponse(
-            path=file_path,
-            filename=os.path.basename(file_path),
-            media_type="application/octet-stream"
-        )
-    
-    # 2. If strict path fails, check if we are in a Local/Windows environment and try to map it.
-    # This fixes the "File not found" error during local development on Windows
-    # when the DB sends Linux production paths (e.g., /var/www/...)
-    
-    # Define local mapping logic
-    # Production Path segment: .../UploadedFiles/...
-    # Local Path equivalent:   .../API/UserPanel/UserPanel/UploadedFiles/...
-    
-    search_marker = "UploadedFiles"
-    if search_marker in file_path:
-        try:
-            # Extract the part after (and including) UploadedFiles
-            # e.g /var/www/.../UploadedFiles/Dir/File.pdf -> UploadedFiles/Dir/File.pdf
-            relative_part = file_path.split(search_marker, 1)[1]
-            relative_part = relative_part.lstrip('/\\') # clean leading slashes
-            
-            # Construct local path relative to this project
-            # This logic assumes the python code is in [Project]/python/app/routers
-            # And the files are in [Project]/API/UserPanel/UserPanel/UploadedFiles
-            
-            # Calculate Project Root from current file: .../python/app/routers/download_file.py
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            # Go up 3 levels to get to [Project] root (d:\DOWNLOADS\BTG-GASIGY-COMBINED)
-            project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
-            
-            local_fallback_path = os.path.join(
-                project_root, 
-                "API", "UserPanel", "UserPanel", "UploadedFiles", 
-                relative_part
-            )
-            
-            print(f"DEBUG: Strict path failed. Trying local fallback: '{local_fallback_path}'")
-            
-            if os.path.exists(local_fallback_path):
-                return FileResponse(
-                    path=local_fallback_path,
-                    filename=os.path.basename(local_fallback_path),
-                    media_type="application/octet-stream"
-                )
-        except Exception as e:
-            print(f"DEBUG: Local fallback attempt failed: {e}")
+def download_file(request: Request, file_path: str = Query(...), file_id: int = Query(0)):
+    # The UI sends the absolute path stored in the DB. In production it is used as-is;
+    # locally (Windows/dev) the .../UploadedFiles/... part is mapped onto the checkout.
+    # Both cases are handled (and remembered) by resolve_attachment_path.
+    resolved_path = resolve_attachment_path(file_path)
+    if not resolved_path:
+        raise HTTPException(status_code=404, detail=f"File not found. Checked: {file_path}")
 
-    # 3. If both fail, return 404 and log debug info
-    print(f"DEBUG: File not found at path: '{file_path}'")
-    raise HTTPException(status_code=404, detail=f"File not found. Checked: {file_path}")
\ No newline at end of file
+    return attachment_response(request, resolved_path)
+
+@router.get("/preview")
+async def preview_file(request: Request, file_path: str = Query(...), size: int = DEFAULT_PREVIEW_SIZE):
+    # Small JPEG thumbnail (first page for PDFs) for attachment lists
+    resolved_path = resolve_attachment_path(file_path)
+    if not resolved_path:
+        raise HTTPException(status_code=404, detail="File not found.")
+
+    preview_path = await get_preview(resolved_path, size)
+    return attachment_response(
+        request, preview_path,
+        media_type="image/jpeg",
+        cache_control=PREVIEW_CACHE_CONTROL,
+        disposition="inline"
+    )
@@ -1,8 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+import heapq
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from .. import schemas, crud, database
+from .. import schemas, crud, customer_balance, database, dimensions, statements, sync_db
+from ..columnar import FORMAT_ROWS, check_format, shape_rows
+from ..fanout import gather_reads_sync
+from ..file_serving import attachment_response
+from ..report_cache import cached_report_sync
+from ..singleflight import report_flights
 from sqlalchemy import text
-import mysql.connector
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date
@@ -11,6 +17,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # --- UPDATED DEFAULTS TO LIVE DATABASES ---
 DB_NAME_FINANCE = os.getenv('DB_NAME_FINANCE', 'btggasify_finance_live')
 DB_NAME_USER = os.getenv('DB_NAME_USER', 'btggasify_live')
@@ -37,13 +45,8 @@ class ARBookRequest(BaseModel):
 # 2. DB HELPER (SYNC) FOR REPORTING
 # --------------------------------------------------
 def get_db_connection_sync():
-    return mysql.connector.connect(
-        host=os.getenv('DB_HOST'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        database=DB_NAME_FINANCE,
-        ssl_disabled=True 
-    )
+    # Pooled and traced (metrics + slow-query log); close() returns it to the pool
+    return sync_db.get_connection(DB_NAME_FINANCE)
 
 # --------------------------------------------------
 # 3. CALLING STORED PROCEDURE
@@ -51,7 +54,14 @@ def get_db_connection_sync():
 # --------------------------------------------------
 # SHARED AR BOOK QUERY BUILDER
 # --------------------------------------------------
-def build_ar_book_query(org_id, branch_id, customer_id, from_date, to_date):
+# The AR book is the one report that still joins master_customer instead of
+# enriching names from dimensions.customers: it is ordered by the collation
+# weight of the name (AR_BOOK_ORDER_BY), which only MySQL can compute so that
+# the UNION and the parallel merge agree, and the inner join leaves out
+# documents of customers missing from master_customer. Enriching it needs a
+# Python sort key matching the column collation first.
+def build_ar_book_branches(org_id, branch_id, customer_id, from_date, to_date):
+    """The five AR book sub-queries (invoices, receipts, DN, CN, unallocated receipts) and their params."""
     params = {"org_id": org_id, "branch_id": branch_id}
     
     # Base Filters
@@ -97,6 +107,7 @@ def build_ar_book_query(org_id, branch_id, customer_id, from_date, to_date):
             cur.CurrencyCode as currencycode, 
             ar.invoice_date as ledger_date, 
             c.CustomerName as customer_name, 
+            ar.customer_id, 
             ar.ar_no, 
             ar.invoice_no, 
             ar.inv_amount as invoice_amount, 
@@ -138,6 +149,7 @@ def build_ar_book_query(org_id, branch_id, customer_id, from_date, to_date):
             cur.CurrencyCode as currencycode, 
             r.receipt_date as ledger_date, 
             c.CustomerName as customer_name, 
+            ar.customer_id, 
             ar.ar_no, 
             ar.invoice_no, 
             0 as invoice_amount, 
@@ -168,6 +180,7 @@ def build_ar_book_query(org_id, branch_id, customer_id, from_date, to_date):
             cur.CurrencyCode as currencycode, 
             dn.TransactionDate as ledger_date, 
             c.CustomerName as customer_name, 
+            dn.CustomerId as customer_id, 
             dn.DebitNoteNumber as ar_no, 
             dn.DebitNoteNumber as invoice_no, 
             0 as invoice_amount, 
@@ -199,6 +212,7 @@ def build_ar_book_query(org_id, branch_id, customer_id, from_date, to_date):
             cur.CurrencyCode as currencycode, 
             cn.TransactionDate as ledger_date, 
             c.CustomerName as customer_name, 
+            cn.CustomerId as customer_id, 
             cn.CreditNoteNumber as ar_no, 
             cn.CreditNoteNumber as invoice_no, 
             0 as invoice_amount, 
@@ -229,6 +243,7 @@ def build_ar_book_query(org_id, branch_id, customer_id, from_date, to_date):
             IFNULL(cur.CurrencyCode, 'IDR') as currencycode, 
             r.receipt_date as ledger_date, 
             c.CustomerName as customer_name, 
+            r.customer_id, 
             IFNULL(r.reference_no, 'Unallocated') as ar_no, 
             IFNULL(r.reference_no, 'Unallocated') as invoice_no, 
             0 as invoice_amount, 
@@ -249,45 +264,161 @@ def build_ar_book_query(org_id, branch_id, customer_id, from_date, to_date):
         {cust_filter_r} {date_filter_r}
     """
 
-    full_query = f"{q_invoice} UNION ALL {q_receipt} UNION ALL {q_dn} UNION ALL {q_cn} UNION ALL {q_unalloc} ORDER BY customer_name, ledger_date, ar_no"
+    branches = [q_invoice, q_receipt, q_dn, q_cn, q_unalloc]
+    return [_ar_book_typed_branch(q, branch_no) for branch_no, q in enumerate(branches)], params
+
+def _ar_book_typed_branch(branch_sql, branch_no):
+    """
+    One AR book branch with a single type per column, so a branch fetched on
+    its own returns the same values UNION ALL would (DECIMAL amounts, DATE
+    ledger_date, text ids where one branch has text), plus the sort keys.
+    WEIGHT_STRING is the collation's sort key as bytes: ordering on it is the
+    collation order of customer_name / ar_no, and Python compares it the same
+    way, so the parallel merge and the UNION return the same order.
+    """
+    return f"""
+        SELECT
+            CAST(b.transaction_id AS SIGNED) as transaction_id,
+            CAST(b.invoice_amount_idr AS DECIMAL(18, 2)) as invoice_amount_idr,
+            b.currencycode,
+            DATE(b.ledger_date) as ledger_date,
+            b.customer_name,
+            CAST(b.customer_id AS SIGNED) as customer_id,
+            b.ar_no,
+            b.invoice_no,
+            CAST(b.invoice_amount AS DECIMAL(18, 2)) as invoice_amount,
+            b.receipt_no,
+            CAST(b.receipt_amount AS DECIMAL(18, 2)) as receipt_amount,
+            CAST(b.debit_note_amount AS DECIMAL(18, 2)) as debit_note_amount,
+            CAST(b.credit_note_amount AS DECIMAL(18, 2)) as credit_note_amount,
+            CAST(b.balance AS DECIMAL(18, 2)) as balance,
+            b.payment_mode,
+            b.remarks,
+            CAST(b.receipt_id AS SIGNED) as receipt_id,
+            CAST(b.deposit_bank_id AS CHAR) as deposit_bank_id,
+            CAST(b.real_invoice_id AS CHAR) as real_invoice_id,
+            IFNULL(WEIGHT_STRING(b.customer_name), '') as customer_name_key,
+            IFNULL(WEIGHT_STRING(b.ar_no), '') as ar_no_key,
+            {branch_no} as branch_no
+        FROM ({branch_sql}) b
+    """
+
+# Report order: customer name (collation order), customer_id to keep customers
+# that share a name apart, date, document number; branch and transaction id
+# make it total, so both fetch paths agree row for row. The same ORDER BY sorts
+# each branch on the parallel path and the UNION ALL on the serial one.
+AR_BOOK_ORDER_BY = "ORDER BY customer_name_key, customer_id, ledger_date, ar_no_key, branch_no, transaction_id"
+AR_BOOK_SORT_COLUMNS = ("customer_name_key", "ar_no_key", "branch_no")
+
+def build_ar_book_query(org_id, branch_id, customer_id, from_date, to_date):
+    branches, params = build_ar_book_branches(org_id, branch_id, customer_id, from_date, to_date)
+    full_query = " UNION ALL ".join(branches) + " " + AR_BOOK_ORDER_BY
     return full_query, params
 
-@router.post("/get_ar_book")
-def get_ar_book(request: ARBookRequest):
+# Run the AR book branches concurrently on separate pooled connections and merge
+# them in Python, instead of one serial UNION ALL plus a filesort. Off by default
+# until it has been compared against the UNION output on production data.
+AR_BOOK_PARALLEL = os.getenv("AR_BOOK_PARALLEL", "0").lower() in ("1", "true", "yes")
+
+def _ar_book_rows(cursor, query, params):
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    for row in rows:
+        if row.get('ledger_date'):
+            row['ledger_date'] = str(row['ledger_date'])
+    return rows
+
+def _ar_book_fetch(query, params):
     conn = None
     cursor = None
     try:
         conn = get_db_connection_sync()
         cursor = conn.cursor(dictionary=True)
+        return _ar_book_rows(cursor, query, params)
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
 
-        query, params = build_ar_book_query(
-            request.org_id, 
-            request.branch_id, 
-            request.customer_id, 
-            request.from_date, 
-            request.to_date
-        )
-        
-        cursor.execute(query, params)
-        result_rows = cursor.fetchall()
+def _ar_book_sort_key(row):
+    # AR_BOOK_ORDER_BY in Python: weight strings compare as bytes; ledger_date is ISO text
+    return (
+        bytes(row['customer_name_key'] or b''),
+        int(row['customer_id'] or 0),
+        row['ledger_date'] or '',
+        bytes(row['ar_no_key'] or b''),
+        row['branch_no'],
+        int(row['transaction_id'] or 0),
+    )
+
+def _without_sort_keys(rows):
+    for row in rows:
+        for column in AR_BOOK_SORT_COLUMNS:
+            row.pop(column, None)
+        yield row
+
+def iter_ar_book_parallel(org_id, branch_id, customer_id, from_date, to_date):
+    """AR book rows in report order: each branch sorted by MySQL, k-way merged here."""
+    branches, params = build_ar_book_branches(org_id, branch_id, customer_id, from_date, to_date)
+    streams = gather_reads_sync(
+        DB_NAME_FINANCE,
+        *[lambda cursor, q=q: _ar_book_rows(cursor, f"{q} {AR_BOOK_ORDER_BY}", params) for q in branches]
+    )
+    return _without_sort_keys(heapq.merge(*streams, key=_ar_book_sort_key))
+
+def fetch_ar_book(org_id, branch_id, customer_id, from_date, to_date):
+    """AR book rows with ledger_date as text."""
+    if AR_BOOK_PARALLEL:
+        return list(iter_ar_book_parallel(org_id, branch_id, customer_id, from_date, to_date))
+    query, params = build_ar_book_query(org_id, branch_id, customer_id, from_date, to_date)
+    return list(_without_sort_keys(_ar_book_fetch(query, params)))
+
+# Tables the AR book reads; their data versions are part of the cache / single-flight key
+AR_BOOK_TABLES = (
+    "tbl_accounts_receivable", "tbl_ar_receipt", "tbl_receipt_ag_ar",
+    "debit_notes", "credit_notes", "debit_invoice", "credit_invoice",
+    "master_customer", "master_currency",
+)
+
+def fetch_ar_book_shared(org_id, branch_id, customer_id, from_date, to_date, version=None):
+    """fetch_ar_book, coalesced with identical concurrent calls (rows are shared: read-only)."""
+    return report_flights.do_sync(
+        "ar_book",
+        {"org_id": org_id, "branch_id": branch_id, "customer_id": customer_id or 0, "from_date": from_date, "to_date": to_date},
+        fetch_ar_book, org_id, branch_id, customer_id, from_date, to_date,
+        version=version
+    )
 
-        for row in result_rows:
-            if row.get('ledger_date'):
-                row['ledger_date'] = str(row['ledger_date'])
+# Low-cardinality AR book columns, dictionary-encoded for ?format=columnar
+AR_BOOK_DICTIONARY_COLUMNS = ("customer_name", "currencycode", "payment_mode")
 
+def ar_book_response(http_request: Request, org_id, branch_id, customer_id, from_date, to_date, response_format):
+    """Cached AR book response; a commit touching AR_BOOK_TABLES changes the key."""
+    def produce(version):
+        result_rows = fetch_ar_book_shared(org_id, branch_id, customer_id, from_date, to_date, version=version)
         return {
-            "status": True, 
-            "message": "Success", 
-            "data": result_rows
+            "status": True,
+            "message": "Success",
+            "data": shape_rows(result_rows, response_format, AR_BOOK_DICTIONARY_COLUMNS)
         }
 
+    params = {
+        "org_id": org_id, "branch_id": branch_id, "customer_id": customer_id or 0,
+        "from_date": from_date, "to_date": to_date, "format": response_format,
+    }
+    return cached_report_sync(http_request, "ar_book", params, AR_BOOK_TABLES, produce)
+
+@router.post("/get_ar_book")
+def get_ar_book(request: ARBookRequest, http_request: Request, response_format: str = Query(FORMAT_ROWS, alias="format")):
+    response_format = check_format(response_format)
+    try:
+        return ar_book_response(
+            http_request, request.org_id, request.branch_id, request.customer_id,
+            request.from_date, request.to_date, response_format
+        )
+
     except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
 
 
 # --------------------------------------------------
@@ -295,46 +426,275 @@ def get_ar_book(request: ARBookRequest):
 # --------------------------------------------------
 @router.get("/getARBook")
 def get_ar_book_get(
+    http_request: Request,
     orgid: int = 1,
     branchid: int = 1,
     customer_id: int = 0,
     from_date: Optional[date] = None,
-    to_date: Optional[date] = None
+    to_date: Optional[date] = None,
+    response_format: str = Query(FORMAT_ROWS, alias="format")
 ):
-    conn = None
-    cursor = None
+    response_format = check_format(response_format)
     try:
-        conn = get_db_connection_sync()
-        cursor = conn.cursor(dictionary=True)
+        return ar_book_response(http_request, orgid, branchid, customer_id, from_date, to_date, response_format)
 
-        query, params = build_ar_book_query(
-            orgid, 
-            branchid, 
-            customer_id, 
-            from_date, 
-            to_date
-        )
-        
-        cursor.execute(query, params)
-        result_rows = cursor.fetchall()
+    except Exception as e:
+        logger.exception("Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --------------------------------------------------
+# 5. AR AGING (0-30 / 31-60 / 61-90 / 90+)
+# --------------------------------------------------
+def build_ar_aging_query(customer_id):
+    """
+    One grouped pass over the branch. Every open item becomes a row of
+    (customer_id, age_days, amount, is_credit); the outer GROUP BY buckets them.
+    Receipts, DNs and CNs are pre-aggregated in derived tables instead of the
+    per-row correlated subqueries used by the AR book. Customer names come
+    from the dimension cache, not a join.
+    """
+    cust_filter_ar = ""
+    cust_filter_dn = ""
+    cust_filter_cn = ""
+    cust_filter_r = ""
+    if customer_id and str(customer_id) != "0":
+        cust_filter_ar = " AND ar.customer_id = :cust_id"
+        cust_filter_dn = " AND dn.CustomerId = :cust_id"
+        cust_filter_cn = " AND cn.CustomerId = :cust_id"
+        cust_filter_r = " AND r.customer_id = :cust_id"
+
+    # Amounts are converted to the report currency via master_currency.ExchangeRate (rate to IDR)
+    to_report = "COALESCE(cur.ExchangeRate, 1) / :target_rate"
+
+    return f"""
+        SELECT
+            items.customer_id,
+            SUM(CASE WHEN items.is_credit = 0 AND items.age_days <= 30 THEN items.amount ELSE 0 END) as bucket_0_30,
+            SUM(CASE WHEN items.is_credit = 0 AND items.age_days BETWEEN 31 AND 60 THEN items.amount ELSE 0 END) as bucket_31_60,
+            SUM(CASE WHEN items.is_credit = 0 AND items.age_days BETWEEN 61 AND 90 THEN items.amount ELSE 0 END) as bucket_61_90,
+            SUM(CASE WHEN items.is_credit = 0 AND items.age_days > 90 THEN items.amount ELSE 0 END) as bucket_90_plus,
+            SUM(CASE WHEN items.is_credit = 1 THEN items.amount ELSE 0 END) as unapplied_credits,
+            SUM(CASE WHEN items.is_credit = 0 THEN items.amount ELSE -items.amount END) as total_outstanding
+        FROM (
+            -- 1. INVOICES: balance as of the date = amount - receipts allocated up to then + linked DN - linked CN
+            SELECT
+                ar.customer_id,
+                DATEDIFF(:as_of, ar.invoice_date) as age_days,
+                (ar.inv_amount - (ar.already_received - COALESCE(later.amount, 0))
+                    + COALESCE(dnl.amount, 0) - COALESCE(cnl.amount, 0)) * {to_report} as amount,
+                0 as is_credit
+            FROM {DB_NAME_FINANCE}.tbl_accounts_receivable ar
+            LEFT JOIN (
+                -- Allocations made after the as-of date are rolled back out of already_received
+                SELECT ra.ar_id, SUM(ra.payment_amount) as amount
+                FROM {DB_NAME_FINANCE}.tbl_receipt_ag_ar ra
+                WHERE ra.is_active = 1 AND ra.receipt_date > :as_of
+                GROUP BY ra.ar_id
+            ) later ON later.ar_id = ar.ar_id
+            LEFT JOIN (
+                SELECT TRIM(di.InvoiceNo) as invoice_no, SUM(dn.Amount) as amount
+                FROM {DB_NAME_FINANCE}.debit_invoice di
+                JOIN {DB_NAME_FINANCE}.Debit_Notes dn ON di.DebitNoteId = dn.DebitNoteId
+                WHERE dn.IsSubmitted = 1 AND dn.TransactionDate <= :as_of
+                GROUP BY TRIM(di.InvoiceNo)
+            ) dnl ON dnl.invoice_no = TRIM(ar.invoice_no)
+            LEFT JOIN (
+                SELECT TRIM(ci.InvoiceNo) as invoice_no, SUM(cn.Amount) as amount
+                FROM {DB_NAME_FINANCE}.credit_invoice ci
+                JOIN {DB_NAME_FINANCE}.Credit_Notes cn ON ci.CreditNoteId = cn.CreditNoteId
+                WHERE cn.IsSubmitted = 1 AND cn.TransactionDate <= :as_of
+                GROUP BY TRIM(ci.InvoiceNo)
+            ) cnl ON cnl.invoice_no = TRIM(ar.invoice_no)
+            LEFT JOIN {DB_NAME_OLD}.master_currency cur ON ar.currencyid = cur.CurrencyId
+            WHERE ar.is_active = 1 AND ar.orgid = :org_id AND ar.branchid = :branch_id
+              AND ar.invoice_date <= :as_of {cust_filter_ar}
+
+            UNION ALL
+
+            -- 2. DEBIT NOTES not linked to an invoice, aged from their own date
+            SELECT dn.CustomerId, DATEDIFF(:as_of, dn.TransactionDate), dn.Amount * {to_report}, 0
+            FROM {DB_NAME_FINANCE}.Debit_Notes dn
+            LEFT JOIN {DB_NAME_OLD}.master_currency cur ON dn.CurrencyId = cur.CurrencyId
+            WHERE dn.IsSubmitted = 1 AND dn.TransactionDate <= :as_of {cust_filter_dn}
+              AND NOT EXISTS (SELECT 1 FROM {DB_NAME_FINANCE}.debit_invoice di WHERE di.DebitNoteId = dn.DebitNoteId)
+
+            UNION ALL
+
+            -- 3. CREDIT NOTES not linked to an invoice (unapplied credit)
+            SELECT cn.CustomerId, DATEDIFF(:as_of, cn.TransactionDate), cn.Amount * {to_report}, 1
+            FROM {DB_NAME_FINANCE}.Credit_Notes cn
+            LEFT JOIN {DB_NAME_OLD}.master_currency cur ON cn.CurrencyId = cur.CurrencyId
+            WHERE cn.IsSubmitted = 1 AND cn.TransactionDate <= :as_of {cust_filter_cn}
+              AND NOT EXISTS (SELECT 1 FROM {DB_NAME_FINANCE}.credit_invoice ci WHERE ci.CreditNoteId = cn.CreditNoteId)
+
+            UNION ALL
+
+            -- 4. UNALLOCATED RECEIPTS (unapplied credit)
+            SELECT r.customer_id, DATEDIFF(:as_of, r.receipt_date), (r.cash_amount + r.bank_amount) * {to_report}, 1
+            FROM {DB_NAME_FINANCE}.tbl_ar_receipt r
+            LEFT JOIN {DB_NAME_OLD}.master_currency cur ON r.currencyid = cur.CurrencyId
+            WHERE r.is_active = 1 AND r.ar_id IS NULL AND r.orgid = :org_id AND r.branchid = :branch_id
+              AND r.receipt_date <= :as_of {cust_filter_r}
+        ) items
+        GROUP BY items.customer_id
+        HAVING ABS(SUM(CASE WHEN items.is_credit = 0 THEN items.amount ELSE -items.amount END)) >= 0.005
+            OR SUM(CASE WHEN items.is_credit = 1 THEN items.amount ELSE 0 END) > 0
+    """
+
+@router.get("/aging")
+async def get_ar_aging(
+    orgid: int = 1,
+    branchid: int = 1,
+    as_of_date: Optional[date] = None,
+    customer_id: int = 0,
+    currency_id: Optional[int] = None,
+    db: AsyncSession = Depends(database.get_db)
+):
+    """
+    Customer AR aging in 0-30 / 31-60 / 61-90 / 90+ day buckets as of a date
+    (default today), converted to currency_id (default IDR).
+    """
+    try:
+        as_of = as_of_date or date.today()
+
+        # Report currency: amounts are stored with a rate to IDR, so divide by the target rate
+        target_rate = 1.0
+        currency_code = "IDR"
+        if currency_id:
+            cur_res = await db.execute(
+                text(f"SELECT CurrencyCode, COALESCE(ExchangeRate, 1) as ExchangeRate FROM {DB_NAME_OLD}.master_currency WHERE CurrencyId = :cid"),
+                {"cid": currency_id}
+            )
+            cur_row = cur_res.mappings().first()
+            if not cur_row:
+                raise HTTPException(status_code=400, detail=f"Unknown currency_id {currency_id}")
+            target_rate = float(cur_row["ExchangeRate"]) or 1.0
+            currency_code = cur_row["CurrencyCode"]
+
+        params = {
+            "org_id": orgid,
+            "branch_id": branchid,
+            "as_of": as_of,
+            "target_rate": target_rate,
+        }
+        if customer_id and str(customer_id) != "0":
+            params["cust_id"] = customer_id
+
+        result = await db.execute(text(build_ar_aging_query(customer_id)), params)
+        customers = await dimensions.customers.get()
+
+        bucket_keys = ("bucket_0_30", "bucket_31_60", "bucket_61_90", "bucket_90_plus", "unapplied_credits", "total_outstanding")
+        totals = {k: 0.0 for k in bucket_keys}
+        rows = []
+        for row in result.mappings().all():
+            item = {
+                "customer_id": row["customer_id"],
+                "customer_name": dimensions.attr(customers, row["customer_id"], "CustomerName", "Unknown"),
+            }
+            for k in bucket_keys:
+                item[k] = round(float(row[k] or 0), 2)
+                totals[k] += item[k]
+            rows.append(item)
+        rows.sort(key=lambda item: item["customer_name"].casefold())
+
+        return {
+            "status": True,
+            "message": "Success",
+            "as_of_date": str(as_of),
+            "currency": currency_code,
+            "data": rows,
+            "totals": {k: round(v, 2) for k, v in totals.items()}
+        }
 
-        for row in result_rows:
-            if row.get('ledger_date'):
-                row['ledger_date'] = str(row['ledger_date'])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error building AR aging: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --------------------------------------------------
+# 5b. CUSTOMER BALANCES (materialized)
+# --------------------------------------------------
+@router.get("/customer-balances")
+async def get_customer_balances(
+    orgid: int = 1,
+    branchid: int = 1,
+    customer_id: int = 0,
+    include_settled: bool = False,
+    db: AsyncSession = Depends(database.get_db)
+):
+    """
+    Current balance per customer (IDR) from tbl_customer_balance: one row per
+    customer, no scan of the AR documents. Aging buckets still come from /aging,
+    since they depend on the as-of date.
+    """
+    try:
+        rows = await customer_balance.fetch(db, orgid, branchid, customer_id or None, include_settled)
+        customers = await dimensions.customers.get()
+
+        totals = {k: 0.0 for k in customer_balance.AMOUNT_COLUMNS}
+        data = []
+        for row in rows:
+            item = dict(row)
+            item["customer_name"] = dimensions.attr(customers, row["customer_id"], "CustomerName", "Unknown")
+            for k in customer_balance.AMOUNT_COLUMNS:
+                item[k] = round(float(item[k] or 0), 2)
+                totals[k] += item[k]
+            data.append(item)
+        data.sort(key=lambda item: item["customer_name"])
 
         return {
-            "status": True, 
-            "message": "Success", 
-            "data": result_rows
+            "status": True,
+            "message": "Success",
+            "currency": "IDR",
+            "data": data,
+            "totals": {k: round(v, 2) for k, v in totals.items()}
         }
 
     except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Error reading customer balances: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+
+# --------------------------------------------------
+# 6. BATCH CUSTOMER STATEMENTS
+# --------------------------------------------------
+class StatementBatchRequest(BaseModel):
+    org_id: int
+    branch_id: int
+    from_date: Optional[date] = None
+    to_date: Optional[date] = None
+    formats: List[str] = ["pdf"]
+
+def _fetch_branch_ar_book(org_id, branch_id, from_date, to_date):
+    """Whole-branch AR book in one query (customer_id=0), ordered by customer."""
+    return fetch_ar_book(org_id, branch_id, 0, from_date, to_date)
+
+@router.post("/statements/generate")
+async def generate_statements(request: StatementBatchRequest):
+    job = statements.create_job(request.org_id, request.branch_id, request.from_date, request.to_date, request.formats)
+    statements.start_job(
+        job,
+        lambda: _fetch_branch_ar_book(request.org_id, request.branch_id, request.from_date, request.to_date)
+    )
+    return {"status": True, "message": "Statement generation started", "data": job.to_dict()}
+
+@router.get("/statements/jobs/{job_id}")
+def get_statement_job(job_id: str):
+    job = statements.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Statement job not found")
+    return {"status": True, "message": "Success", "data": job.to_dict()}
+
+@router.get("/statements/jobs/{job_id}/files/{file_name}")
+def download_statement(job_id: str, file_name: str, request: Request):
+    job = statements.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Statement job not found")
+    path = statements.statement_file_path(job, file_name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Statement file not found")
+    media_type = "application/pdf" if path.suffix == ".pdf" else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return attachment_response(request, str(path), filename=file_name, media_type=media_type)
 
 # --------------------------------------------------
 # CREATE AR RECEIPT
@@ -352,7 +712,7 @@ async def create_ar_receipt(
             "data": new_receipts
         }
     except Exception as e:
-        print(f"Error creating AR receipt: {e}")
+        logger.exception("Error creating AR receipt: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -376,20 +736,25 @@ async def get_pending_list(
             query_params["user_id"] = user_id
 
         query = text(f"""
-            SELECT 
-                r.*, 
-                COALESCE(mc.CurrencyCode, 'IDR') as CurrencyCode,
-                c.CustomerName
+            SELECT r.*
             FROM tbl_ar_receipt r
-            LEFT JOIN {DB_NAME_USER_NEW}.master_customer c ON r.customer_id = c.Id
-            LEFT JOIN {DB_NAME_MASTER}.master_bank b ON r.deposit_bank_id = b.BankId
-            LEFT JOIN {DB_NAME_USER}.master_currency mc ON b.CurrencyId = mc.CurrencyId
             {where_clause}
             ORDER BY r.receipt_id DESC
         """)
         
         result = await db.execute(query, query_params)
-        results = result.mappings().all()
+        customers, banks, currencies = await dimensions.load(
+            dimensions.customers, dimensions.banks, dimensions.currencies
+        )
+
+        # Currency of the deposit bank and customer name from the dimension cache
+        results = []
+        for row in result.mappings().all():
+            item = dict(row)
+            bank_currency = dimensions.attr(banks, item["deposit_bank_id"], "CurrencyId")
+            item["CurrencyCode"] = dimensions.attr(currencies, bank_currency, "CurrencyCode", "IDR")
+            item["CustomerName"] = dimensions.attr(customers, item["customer_id"], "CustomerName")
+            results.append(item)
         
         return {
             "status": "success",
@@ -397,7 +762,7 @@ async def get_pending_list(
             "data": results
         }
     except Exception as e:
-        print(f"Error fetching pending list: {e}")
+        logger.exception("Error fetching pending list: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -430,6 +795,26 @@ async def verify_receipt(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.put("/bulk-verify")
+async def bulk_verify_receipts(
+    payload: schemas.BulkVerifyRequest,
+    db: AsyncSession = Depends(database.get_db)
+):
+    """Verifies a list of receipts (each with its allocations) in one transaction; data has a code per receipt."""
+    try:
+        results = await crud.bulk_verify_receipts(db, payload.items)
+    except Exception as e:
+        logger.exception("Bulk verify failed: %s", e)
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    verified = sum(1 for r in results if r["code"] == crud.BULK_OK_VERIFIED)
+    return {
+        "status": "success",
+        "message": f"Verified {verified} of {len(results)} receipts.",
+        "data": results
+    }
+
 # --------------------------------------------------
 # SAVE DRAFT
 # --------------------------------------------------
@@ -451,7 +836,7 @@ async def save_draft(
             "data": saved_record
         }
     except Exception as e:
-        print(f"Error saving draft: {e}")
+        logger.exception("Error saving draft: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # --------------------------------------------------
@@ -480,7 +865,7 @@ async def get_outstanding_invoices(customer_id: int, db: AsyncSession = Depends(
         return {"status": "success", "data": invoices}
 
     except Exception as e:
-        print(f"Error fetching outstanding invoices: {e}")
+        logger.exception("Error fetching outstanding invoices: %s", e)
         return {"status": "error", "detail": str(e)}
 
 # --------------------------------------------------
@@ -533,6 +918,25 @@ async def post_invoice_endpoint(
     return {"status": "success", "message": "Invoice posted to AR Book successfully"}
 
 
+@router.post("/post-invoices")
+async def post_invoices_endpoint(
+    payload: schemas.PostInvoicesToARRequest,
+    db: AsyncSession = Depends(database.get_db)
+):
+    """Posts many invoices to the AR book in one transaction; data has an outcome per invoice id."""
+    outcomes = await crud.post_invoices_to_ar(db, payload)
+
+    if outcomes is None:
+        raise HTTPException(status_code=500, detail="Failed to post Invoices to AR Book.")
+
+    posted = sum(1 for o in outcomes if o["code"] != crud.BULK_NOT_FOUND)
+    return {
+        "status": "success",
+        "message": f"Posted {posted} of {len(outcomes)} invoices to AR Book.",
+        "data": outcomes
+    }
+
+
 # --------------------------------------------------
 # CREATE BOOK ENTRIES FROM CLAIM PAYMENTS
 # --------------------------------------------------
@@ -615,5 +1019,5 @@ async def create_book_entries_from_claim(
 
     except Exception as e:
         await db.rollback()
-        print(f"❌ Create from claim error: {e}")
+        logger.exception("Create from claim error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,3 +1,4 @@
+import logging
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Optional
@@ -8,6 +9,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DB_NAME_USER_NEW = os.getenv('DB_NAME_USER_NEW', 'btggasify_userpanel_live')
 
 router = APIRouter()
@@ -83,7 +86,7 @@ async def get_all_gas_listing(gasName: str = "", volume: str = "", pressure: str
             return {"status": True, "data": [dict(row._mapping) for row in rows]}
 
     except Exception as e:
-        print(f"Error fetching gas listing: {e}")
+        logger.exception("Error fetching gas listing: %s", e)
         return {"status": False, "message": str(e), "data": []}
 
 @router.get("/GetByID")
@@ -136,7 +139,7 @@ async def create_gas(payload: GasCodeRequest):
             return {"status": True, "message": "Saved Successfully"}
             
         except Exception as e:
-            print(f"Error creating gas: {e}")
+            logger.exception("Error creating gas: %s", e)
             return {"status": False, "message": f"Saving MasterGas failed: {str(e)}"}
 
 @router.put("/Update")
@@ -190,7 +193,7 @@ async def update_gas(payload: GasCodeRequest):
 
 @router.put("/ToogleActiveStatus")
 async def toggle_active_status(payload: ToggleStatusRequest):
-    print(f"Toggle Request: {payload}")
+    logger.debug("Toggle Request: %s", payload)
     async with engine.begin() as conn:
         try:
             sql = text(f"""
@@ -203,7 +206,7 @@ async def toggle_active_status(payload: ToggleStatusRequest):
             active_val = 1 if payload.isActive else 0
             
             result = await conn.execute(sql, {"active": active_val, "id": payload.id})
-            print(f"Toggle Result: rows={result.rowcount}")
+            logger.debug("Toggle Result: rows=%s", result.rowcount)
             
             if result.rowcount == 0:
                  return {"status": False, "message": "Toggle failed: Record not found"}
@@ -211,7 +214,7 @@ async def toggle_active_status(payload: ToggleStatusRequest):
             return {"status": True, "message": "Toogle status MasterGas success"}
             
         except Exception as e:
-            print(f"Toggle Error: {e}")
+            logger.exception("Toggle Error: %s", e)
             return {"status": False, "message": f"Toggle failed: {str(e)}"}
 
 @router.get("/GetAllGasTypes")
@@ -1,14 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
+import logging
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from pydantic import BaseModel
 from typing import List, Optional
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from ..database import engine 
+from .. import dimensions, lookups
+from ..columnar import FORMAT_ROWS, check_format, shape_rows
+from ..fanout import gather_reads
+from ..report_cache import cached_report
+from ..responses import FastJSONResponse
+from ..singleflight import report_flights
 import os
 from dotenv import load_dotenv
 
 # --- FORCE LOAD ENV VARIABLES ---
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Explicitly load names to ensure we don't use stale defaults from imports
 DB_NAME_USER = os.getenv('DB_NAME_USER', 'btggasify_live')
 DB_NAME_USER_NEW = os.getenv('DB_NAME_USER_NEW', 'btggasify_userpanel_live')
@@ -239,7 +248,7 @@ async def create_invoice(payload: CreateInvoiceRequest):
         except HTTPException as he:
             raise he
         except Exception as e:
-            print(f"Error creating invoice: {e}")
+            logger.exception("Error creating invoice: %s", e)
             raise HTTPException(status_code=500, detail=str(e))
 
 # --- Update Invoice ---
@@ -336,7 +345,7 @@ async def update_invoice(payload: UpdateInvoiceRequest):
         except HTTPException as he:
             raise he
         except Exception as e:
-            print(f"Error updating invoice: {e}")
+            logger.exception("Error updating invoice: %s", e)
             raise HTTPException(status_code=500, detail=str(e))
 
 # --- Get All Invoices ---
@@ -383,97 +392,101 @@ async def get_all_invoices(filter_data: InvoiceFilter):
             })
             
             rows = result.fetchall()
-            return [dict(row._mapping) for row in rows]
+            # Rows already match InvoiceListItem; returning a response skips per-row validation
+            return FastJSONResponse([dict(row._mapping) for row in rows])
 
     except Exception as e:
-        print(f"Error fetching invoices: {str(e)}")
+        logger.exception("Error fetching invoices: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/GetInvoiceDetails", response_model=InvoiceFullDetail)
 async def get_invoice_details(invoiceid: str):
     try:
-        async with engine.connect() as conn:
-            # 1. Fetch Headers
-            # 🟢 FIX: Added 'AND h.isactive = 1' to prevent fetching duplicates/history
-            header_query = text(f"""
-                SELECT 
-                    h.id AS RealHeaderId, 
-                    h.salesinvoicenbr AS InvoiceNbr,
-                    COALESCE(DATE_FORMAT(h.Salesinvoicesdate, '%Y-%m-%d'), '') AS Salesinvoicesdate,
-                    h.customerid,
-                    COALESCE(c.CustomerName, 'Unknown') AS CustomerName,
-                    COALESCE(h.TotalAmount, 0) AS TotalAmount,
-                    COALESCE(h.CalculatedPrice, h.TotalAmount, 0) AS CalculatedPrice,
-                    CASE WHEN h.IsSubmitted = 1 THEN 'Posted' ELSE 'Saved' END AS Status
-                FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_header h
-                LEFT JOIN {DB_NAME_USER_NEW}.master_customer c ON h.customerid = c.Id
-                WHERE (h.salesinvoicenbr = :input_val OR h.id = :input_val)
-                  AND h.isactive = 1 
-            """)
-            
-            result = await conn.execute(header_query, {"input_val": invoiceid})
-            headers = result.fetchall()
-            
-            if not headers:
-                raise HTTPException(status_code=404, detail=f"Invoice '{invoiceid}' not found")
-
-            # ... (Rest of the function remains exactly the same)
-            primary_header = headers[0]
-            
-            aggregated_total_amount = 0.0
-            aggregated_calc_price = 0.0
-            all_header_ids = []
-
-            for h in headers:
-                aggregated_total_amount += float(h.TotalAmount)
-                aggregated_calc_price += float(h.CalculatedPrice)
-                all_header_ids.append(h.RealHeaderId)
+        # 1. Headers
+        # 🟢 FIX: Added 'AND h.isactive = 1' to prevent fetching duplicates/history
+        header_query = text(f"""
+            SELECT 
+                h.id AS RealHeaderId, 
+                h.salesinvoicenbr AS InvoiceNbr,
+                COALESCE(DATE_FORMAT(h.Salesinvoicesdate, '%Y-%m-%d'), '') AS Salesinvoicesdate,
+                h.customerid,
+                COALESCE(c.CustomerName, 'Unknown') AS CustomerName,
+                COALESCE(h.TotalAmount, 0) AS TotalAmount,
+                COALESCE(h.CalculatedPrice, h.TotalAmount, 0) AS CalculatedPrice,
+                CASE WHEN h.IsSubmitted = 1 THEN 'Posted' ELSE 'Saved' END AS Status
+            FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_header h
+            LEFT JOIN {DB_NAME_USER_NEW}.master_customer c ON h.customerid = c.Id
+            WHERE (h.salesinvoicenbr = :input_val OR h.id = :input_val)
+              AND h.isactive = 1 
+        """)
 
-            header_dict = dict(primary_header._mapping)
-            header_dict["InvoiceId"] = header_dict.pop("RealHeaderId") 
-            header_dict["TotalAmount"] = aggregated_total_amount
-            header_dict["CalculatedPrice"] = aggregated_calc_price
+        # 2. Details of those same headers; selecting them by the header filter
+        # (not the fetched ids) lets both queries run at once
+        detail_query = text(f"""
+            SELECT 
+                d.id AS Id,
+                COALESCE(d.gascodeid, 0) AS gascodeid,
+                COALESCE(g.GasName, 'Item') AS GasName,
+                COALESCE(d.PickedQty, 0) AS PickedQty,
+                COALESCE(d.UnitPrice, 0) AS UnitPrice,
+                COALESCE(d.TotalPrice, 0) AS TotalPrice,
+                COALESCE(d.Currencyid, 1) AS Currencyid,
+                COALESCE(d.ExchangeRate, 1) AS ExchangeRate, 
+                COALESCE(d.DOnumber, '') AS DOnumber,
+                COALESCE(d.PONumber, '') AS PONumber,
+                COALESCE(d.uomid, 0) AS uomid
+            FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_details d
+            LEFT JOIN {DB_NAME_USER_NEW}.master_gascode g ON d.gascodeid = g.Id
+            WHERE d.salesinvoicesheaderid IN (
+                SELECT h.id FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_header h
+                WHERE (h.salesinvoicenbr = :input_val OR h.id = :input_val)
+                  AND h.isactive = 1
+            )
+        """)
 
-            if all_header_ids:
-                detail_query = text(f"""
-                    SELECT 
-                        d.id AS Id,
-                        COALESCE(d.gascodeid, 0) AS gascodeid,
-                        COALESCE(g.GasName, 'Item') AS GasName,
-                        COALESCE(d.PickedQty, 0) AS PickedQty,
-                        COALESCE(d.UnitPrice, 0) AS UnitPrice,
-                        COALESCE(d.TotalPrice, 0) AS TotalPrice,
-                        COALESCE(d.Currencyid, 1) AS Currencyid,
-                        COALESCE(d.ExchangeRate, 1) AS ExchangeRate, 
-                        COALESCE(d.DOnumber, '') AS DOnumber,
-                        COALESCE(d.PONumber, '') AS PONumber,
-                        COALESCE(d.uomid, 0) AS uomid
-                    FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_details d
-                    LEFT JOIN {DB_NAME_USER_NEW}.master_gascode g ON d.gascodeid = g.Id
-                    WHERE d.salesinvoicesheaderid IN :hids
-                """)
-                
-                details_result = await conn.execute(detail_query, {"hids": tuple(all_header_ids)})
-                details_rows = details_result.fetchall()
-            else:
-                details_rows = []
-
-            items_list = []
-            for row in details_rows:
-                row_dict = dict(row._mapping)
-                row_dict["PickedQty"] = float(row_dict["PickedQty"])
-                row_dict["UnitPrice"] = float(row_dict["UnitPrice"])
-                row_dict["TotalPrice"] = float(row_dict["TotalPrice"])
-                row_dict["ExchangeRate"] = float(row_dict["ExchangeRate"])
-                items_list.append(row_dict)
-            
-            header_dict["Items"] = items_list
-            return header_dict
+        async def fetch_headers(db):
+            result = await db.execute(header_query, {"input_val": invoiceid})
+            return result.fetchall()
+
+        async def fetch_details(db):
+            result = await db.execute(detail_query, {"input_val": invoiceid})
+            return result.fetchall()
+
+        headers, details_rows = await gather_reads(fetch_headers, fetch_details)
+        
+        if not headers:
+            raise HTTPException(status_code=404, detail=f"Invoice '{invoiceid}' not found")
+
+        primary_header = headers[0]
+        
+        aggregated_total_amount = 0.0
+        aggregated_calc_price = 0.0
+
+        for h in headers:
+            aggregated_total_amount += float(h.TotalAmount)
+            aggregated_calc_price += float(h.CalculatedPrice)
+
+        header_dict = dict(primary_header._mapping)
+        header_dict["InvoiceId"] = header_dict.pop("RealHeaderId") 
+        header_dict["TotalAmount"] = aggregated_total_amount
+        header_dict["CalculatedPrice"] = aggregated_calc_price
+
+        items_list = []
+        for row in details_rows:
+            row_dict = dict(row._mapping)
+            row_dict["PickedQty"] = float(row_dict["PickedQty"])
+            row_dict["UnitPrice"] = float(row_dict["UnitPrice"])
+            row_dict["TotalPrice"] = float(row_dict["TotalPrice"])
+            row_dict["ExchangeRate"] = float(row_dict["ExchangeRate"])
+            items_list.append(row_dict)
+        
+        header_dict["Items"] = items_list
+        return header_dict
 
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"Error fetching invoice {invoiceid}: {e}")
+        logger.exception("Error fetching invoice %s: %s", invoiceid, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Get Available DOs ---
@@ -506,7 +519,7 @@ async def get_available_dos(filter_data: DOFilter):
             return {"status": True, "data": [dict(row._mapping) for row in rows]}
 
     except Exception as e:
-        print(f"Error fetching DOs: {e}")
+        logger.exception("Error fetching DOs: %s", e)
         return {"status": False, "message": str(e), "data": []}
 
 # --- Create Invoice From DO ---
@@ -618,7 +631,7 @@ async def create_invoice_from_do(payload: ConvertDORequest):
         except HTTPException as he:
             raise he
         except Exception as e:
-            print(f"Error converting DO: {e}")
+            logger.exception("Error converting DO: %s", e)
             raise HTTPException(status_code=500, detail=str(e))
 
 # --- Get Gas Items ---
@@ -626,71 +639,120 @@ async def create_invoice_from_do(payload: ConvertDORequest):
 async def get_gas_items():
     try:
         async with engine.connect() as conn:
-            query = text(f"""
-                SELECT Id, GasName 
-                FROM {DB_NAME_USER_NEW}.master_gascode 
-                WHERE IsActive = 1 
-                ORDER BY GasName ASC
-            """)
-            result = await conn.execute(query)
-            rows = result.fetchall()
-            return {"status": True, "data": [dict(row._mapping) for row in rows]}
+            return {"status": True, "data": await lookups.fetch_gas_items(conn)}
 
     except Exception as e:
-        print(f"Error fetching gas items: {e}")
+        logger.exception("Error fetching gas items: %s", e)
         return {"status": False, "message": str(e), "data": []}
 
 # --- Get Sales Details (Reports) ---
+# Tables the sales report reads; their data versions are part of the cache / single-flight key
+SALES_TABLES = ("tbl_salesinvoices_header", "tbl_salesinvoices_details", "master_customer", "master_gascode", "master_currency")
+
+# Low-cardinality sales report columns, dictionary-encoded for ?format=columnar
+SALES_DICTIONARY_COLUMNS = ("CustomerName", "InvoiceCurrency", "ItemName", "Salesinvoicesdate")
+
+def enrich_sales_rows(rows, customers, currencies):
+    """
+    Sales report rows with CustomerName, InvoiceCurrency and ConvertedTotal
+    from the dimension maps, in report order: customer name, then the SQL
+    order (date, invoice number).
+    """
+    enriched = []
+    for row in rows:
+        name = dimensions.attr(customers, row["customerid"], "CustomerName")
+        rate = dimensions.attr(currencies, row["Currencyid"], "ExchangeRate", 1)
+        total = row["OriginalTotal"]
+        enriched.append({
+            "DetailId": row["DetailId"],
+            "Salesinvoicesdate": row["Salesinvoicesdate"],
+            "CustomerName": "Unknown" if name is None else name.strip(),
+            "InvoiceCurrency": dimensions.attr(currencies, row["Currencyid"], "CurrencyCode"),
+            "InvoiceNo": row["InvoiceNo"],
+            "DONumber": row["DONumber"],
+            "ItemName": row["ItemName"],
+            "Qty": row["Qty"],
+            "UnitPrice": row["UnitPrice"],
+            "OriginalTotal": total,
+            "ConvertedTotal": None if total is None else total * rate,
+        })
+    enriched.sort(key=lambda row: row["CustomerName"].casefold())
+    return enriched
+
 @router.post("/GetSalesDetails", response_model=List[SalesReportItem])
-async def get_sales_details(filter_data: InvoiceFilter):
+async def get_sales_details(filter_data: InvoiceFilter, request: Request, response_format: str = Query(FORMAT_ROWS, alias="format")):
+    response_format = check_format(response_format)
     try:
-        sql = text(f"""
-        SELECT 
-            d.id as DetailId,
-            DATE_FORMAT(h.Salesinvoicesdate, '%Y-%m-%d') AS Salesinvoicesdate,
-            COALESCE(TRIM(c.CustomerName), 'Unknown') AS CustomerName,
-            mc.CurrencyCode as InvoiceCurrency,
-            h.salesinvoicenbr as InvoiceNo,
-            COALESCE(d.DOnumber, '') AS DONumber,
-            COALESCE(g.GasName, 'Item') as ItemName,
-            d.PickedQty as Qty,
-            d.UnitPrice,
-            d.TotalPrice as OriginalTotal, 
-            (d.TotalPrice * COALESCE(mc.ExchangeRate, 1)) as ConvertedTotal
-        FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_header h
-        JOIN {DB_NAME_USER_NEW}.tbl_salesinvoices_details d ON h.id = d.salesinvoicesheaderid
-        LEFT JOIN {DB_NAME_USER_NEW}.master_customer c ON h.customerid = c.Id
-        LEFT JOIN {DB_NAME_USER_NEW}.master_gascode g ON d.gascodeid = g.Id
-        LEFT JOIN {DB_NAME_USER}.master_currency mc ON d.Currencyid = mc.CurrencyId
-        WHERE DATE(h.Salesinvoicesdate) BETWEEN :from_date AND :to_date 
-          AND h.isactive = 1 
-          AND (:cust_id = 0 OR h.customerid = :cust_id)
-          AND (:item_id = 0 OR d.gascodeid = :item_id)
-          AND (:sp_id = 0 OR c.SalesPersonId = :sp_id) 
-        ORDER BY COALESCE(TRIM(c.CustomerName), 'Unknown') ASC, h.Salesinvoicesdate ASC, h.salesinvoicenbr ASC
-        """)
+        params = {
+            "from_date": filter_data.FromDate,
+            "to_date": filter_data.ToDate,
+            "cust_id": filter_data.customerid,
+            "item_id": filter_data.ItemId,
+            "sp_id": filter_data.SalesPersonId 
+        }
+
+        async def fetch_rows():
+            customers, currencies = await dimensions.load(dimensions.customers, dimensions.currencies)
+
+            # Customer and currency come from the dimension cache; a sales person
+            # filter becomes the list of that sales person's customers
+            sp_filter = ""
+            query_params = dict(params)
+            if filter_data.SalesPersonId:
+                query_params["sp_customers"] = [
+                    customer_id for customer_id, row in customers.items()
+                    if row.get("SalesPersonId") == filter_data.SalesPersonId
+                ]
+                if not query_params["sp_customers"]:
+                    return []
+                sp_filter = "AND h.customerid IN :sp_customers"
+
+            sql = text(f"""
+            SELECT 
+                d.id as DetailId,
+                DATE_FORMAT(h.Salesinvoicesdate, '%Y-%m-%d') AS Salesinvoicesdate,
+                h.customerid,
+                d.Currencyid,
+                h.salesinvoicenbr as InvoiceNo,
+                COALESCE(d.DOnumber, '') AS DONumber,
+                COALESCE(g.GasName, 'Item') as ItemName,
+                d.PickedQty as Qty,
+                d.UnitPrice,
+                d.TotalPrice as OriginalTotal
+            FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_header h
+            JOIN {DB_NAME_USER_NEW}.tbl_salesinvoices_details d ON h.id = d.salesinvoicesheaderid
+            LEFT JOIN {DB_NAME_USER_NEW}.master_gascode g ON d.gascodeid = g.Id
+            WHERE DATE(h.Salesinvoicesdate) BETWEEN :from_date AND :to_date 
+              AND h.isactive = 1 
+              AND (:cust_id = 0 OR h.customerid = :cust_id)
+              AND (:item_id = 0 OR d.gascodeid = :item_id)
+              {sp_filter}
+            ORDER BY h.Salesinvoicesdate ASC, h.salesinvoicenbr ASC
+            """)
+            if sp_filter:
+                sql = sql.bindparams(bindparam("sp_customers", expanding=True))
 
-        async with engine.connect() as conn:
-            result = await conn.execute(sql, {
-                "from_date": filter_data.FromDate,
-                "to_date": filter_data.ToDate,
-                "cust_id": filter_data.customerid,
-                "item_id": filter_data.ItemId,
-                "sp_id": filter_data.SalesPersonId 
-            })
-            rows = result.fetchall()
-            return [dict(row._mapping) for row in rows]
+            async with engine.connect() as conn:
+                result = await conn.execute(sql, query_params)
+                rows = [dict(row._mapping) for row in result.fetchall()]
+            return enrich_sales_rows(rows, customers, currencies)
+
+        async def produce(version):
+            # Identical concurrent requests share one execution
+            rows = await report_flights.do("sales_details", params, fetch_rows, version=version)
+            return shape_rows(rows, response_format, SALES_DICTIONARY_COLUMNS)
+
+        # Rows already match SalesReportItem; returning a response skips per-row validation
+        return await cached_report(request, "sales_details", dict(params, format=response_format), SALES_TABLES, produce)
 
     except Exception as e:
-        print(f"Error fetching sales details: {str(e)}")
+        logger.exception("Error fetching sales details: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/GetItemFilter")
 async def get_item_filter():
     try:
-        sql = text(f"SELECT Id as value, GasName as label FROM {DB_NAME_USER_NEW}.master_gascode WHERE IsActive = 1 ORDER BY GasName")
         async with engine.connect() as conn:
-            result = await conn.execute(sql)
-            return [dict(row._mapping) for row in result.fetchall()]
+            return await lookups.fetch_item_filter(conn)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
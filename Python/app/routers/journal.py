@@ -1,3 +1,4 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from .. import database
@@ -6,6 +7,8 @@ from sqlalchemy import text
 import os
 from datetime import date
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/journal",
     tags=["Journal Ct"]
@@ -44,7 +47,7 @@ async def get_party_list(
         }
 
     except Exception as e:
-        print(f"Error fetching party list: {e}")
+        logger.exception("Error fetching party list: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/get-gl-codes")
@@ -59,7 +62,7 @@ async def get_gl_codes(db: AsyncSession = Depends(database.get_db)):
             "data": rows
         }
     except Exception as e:
-        print(f"Error fetching GL Codes: {e}")
+        logger.exception("Error fetching GL Codes: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/save-journal")
@@ -150,5 +153,5 @@ async def save_journal(
 
     except Exception as e:
         await db.rollback()
-        print(f"Error saving journal: {e}")
+        logger.exception("Error saving journal: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,3 +1,4 @@
+import logging
 import os
 import base64
 import hashlib
@@ -16,6 +17,7 @@ from dotenv import load_dotenv
 import uuid
 
 from .. import database
+from ..fanout import gather_reads
 # Models mapping to AspNet tables
 from ..models.users_refresh import AspNetUsers
 from ..models.roles import AspNetRoles
@@ -24,6 +26,8 @@ from ..models.user import User
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # =========================================================
 # CONFIGURATION
 # =========================================================
@@ -139,7 +143,7 @@ def verify_aspnet_password(hashed_password_b64: str, provided_password: str) ->
             return False
 
     except Exception as e:
-        print(f"Password verification error: {e}")
+        logger.warning("Password verification error: %s", e)
         return False
 
 def hash_aspnet_password(password: str) -> str:
@@ -192,7 +196,7 @@ def get_principal_from_expired_token(token: str):
 
 @router.post("/login")
 async def login(model: LoginModel, db: AsyncSession = Depends(database.get_db)):
-    print(f"Login Attempt: {model.Username}")
+    logger.info("Login Attempt: %s", model.Username)
 
     # 1. Find User
     stmt = select(AspNetUsers).where(
@@ -209,7 +213,7 @@ async def login(model: LoginModel, db: AsyncSession = Depends(database.get_db)):
         user = result.scalars().first()
 
     if not user:
-        print("User not found in DB")
+        logger.info("User not found in DB")
         return {
             "data": {
                 "token": "",
@@ -223,20 +227,20 @@ async def login(model: LoginModel, db: AsyncSession = Depends(database.get_db)):
             "statusCode": 0
         }
 
-    print(f"User found: {user.UserName}, Checking password...")
+    logger.debug("User found: %s, Checking password...", user.UserName)
     
     # 2. Check Password
     password_valid = False
     if user.PasswordHash:
         password_valid = verify_aspnet_password(user.PasswordHash, model.Password)
     else:
-        print("User has no PasswordHash")
+        logger.warning("User has no PasswordHash")
 
     # 2.1 Fallback: Check 'users' table if AspNetUsers password failed
     # User mentioned that 'users' table has plaintext password
     if not password_valid:
         if user.userid:
-             print(f"Primary hash check failed. Checking fallback 'users' table for user ID: {user.userid}")
+             logger.debug("Primary hash check failed. Checking fallback 'users' table for user ID: %s", user.userid)
              stmt_legacy = select(User).where(User.Id == user.userid)
              result_legacy = await db.execute(stmt_legacy)
              legacy_user = result_legacy.scalars().first()
@@ -244,17 +248,17 @@ async def login(model: LoginModel, db: AsyncSession = Depends(database.get_db)):
              if legacy_user:
                  # Check plaintext password
                  if legacy_user.Password == model.Password:
-                     print("Fallback login successful via 'users' table (Plaintext match)")
+                     logger.info("Fallback login successful via 'users' table (Plaintext match)")
                      password_valid = True
                  else:
-                     print("Fallback 'users' table password mismatch")
+                     logger.info("Fallback 'users' table password mismatch")
              else:
-                 print("No corresponding user found in 'users' table")
+                 logger.debug("No corresponding user found in 'users' table")
         else:
-             print("No 'userid' link to 'users' table")
+             logger.debug("No 'userid' link to 'users' table")
 
     if not password_valid:
-        print("Password verification failed")
+        logger.info("Password verification failed")
         return {
             "data": {
                 "token": "",
@@ -270,7 +274,7 @@ async def login(model: LoginModel, db: AsyncSession = Depends(database.get_db)):
 
     # Check IsActive
     if hasattr(user, 'IsActive') and user.IsActive is False:
-         print("User account is inactive")
+         logger.info("User account is inactive")
          return {
             "data": {
                 "token": "",
@@ -283,13 +287,22 @@ async def login(model: LoginModel, db: AsyncSession = Depends(database.get_db)):
             "status": False
         }
 
-    # 3. Get Roles
+    # 3. Get Roles and Department (independent lookups, run concurrently)
     roles_stmt = select(AspNetRoles.Name)\
         .join(AspNetUserRoles, AspNetUserRoles.RoleId == AspNetRoles.Id)\
         .where(AspNetUserRoles.UserId == user.Id)
-    
-    roles_result = await db.execute(roles_stmt)
-    user_roles = roles_result.scalars().all()
+
+    async def fetch_roles(session):
+        roles_result = await session.execute(roles_stmt)
+        return roles_result.scalars().all()
+
+    async def fetch_department(session):
+        if not user.userid:
+            return None
+        result_user = await session.execute(select(User.DepartmentId, User.Department).where(User.Id == user.userid))
+        return result_user.first()
+
+    user_roles, department_row = await gather_reads(fetch_roles, fetch_department)
 
     # 4. Build Claims
     auth_claims = {
@@ -321,18 +334,14 @@ async def login(model: LoginModel, db: AsyncSession = Depends(database.get_db)):
     if "SuperAdmin" in user_roles:
         super_is_admin = 1
     
-    # 7. Get Department Info from users table
+    # 7. Department Info from users table (fetched with the roles)
     department_id = None
     department_name = None
-    if user.userid:
-        stmt_user = select(User).where(User.Id == user.userid)
-        result_user = await db.execute(stmt_user)
-        user_record = result_user.scalars().first()
-        if user_record:
-            department_id = user_record.DepartmentId
-            department_name = user_record.Department
+    if department_row:
+        department_id = department_row.DepartmentId
+        department_name = department_row.Department
     
-    print("Login Success")
+    logger.info("Login Success")
     return {
         "data": {
             "token": token,
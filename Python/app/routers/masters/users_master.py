@@ -1,3 +1,4 @@
+import logging
 from fastapi import APIRouter, Depends, Query, HTTPException, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -16,6 +17,8 @@ import hashlib
 import base64
 import struct
 
+logger = logging.getLogger(__name__)
+
 # Helper: Password Hashing (Matches login.py V3 Logic)
 def hash_aspnet_password(password: str) -> str:
     # V3 Hash
@@ -154,7 +157,7 @@ async def create_user(
             result_name = await db.execute(stmt_name)
             existing_user = result_name.scalars().first()
             if existing_user:
-                print(f"User found by Name: {existing_user.UserName} (ID: {existing_user.Id}). Switching to Update.")
+                logger.info("User found by Name: %s (ID: %s). Switching to Update.", existing_user.UserName, existing_user.Id)
 
         # 2. UPDATE SCENARIO
         if existing_user:
@@ -357,7 +360,7 @@ async def create_user(
             )
 
     except Exception as e:
-        print(f"Error in create_user: {str(e)}")
+        logger.exception("Error in create_user: %s", e)
         await db.rollback()
         return ResponseModel(
             Message=f"Error: {str(e)}",
@@ -416,7 +419,7 @@ async def update_password(
         )
 
     except Exception as e:
-        print(f"Error in update_password: {str(e)}")
+        logger.exception("Error in update_password: %s", e)
         await db.rollback()
         return ResponseModel(
             Message=f"Error: {str(e)}",
@@ -467,7 +470,7 @@ async def get_all_users(
         )
 
     except Exception as e:
-        print(f"Error in get_all_users: {str(e)}")
+        logger.exception("Error in get_all_users: %s", e)
         return ResponseModel(
             Message=f"Error: {str(e)}",
             Status=False,
@@ -501,7 +504,7 @@ async def get_user_by_id(
         )
 
     except Exception as e:
-        print(f"Error in get_user_by_id: {str(e)}")
+        logger.exception("Error in get_user_by_id: %s", e)
         return ResponseModel(
             Message=f"Error: {str(e)}",
             Status=False,
@@ -517,7 +520,7 @@ async def update_status(
     current_user: UserModel = Depends(auth.get_current_user)
 ):
     try:
-        print(f"UpdateStatus: UserID={command.UserId}, NewStatus={command.IsActive}")
+        logger.debug("UpdateStatus: UserID=%s, NewStatus=%s", command.UserId, command.IsActive)
         
         # 1. Check if user exists
         result = await db.execute(select(UserModel).where(UserModel.Id == command.UserId))
@@ -559,10 +562,10 @@ async def update_status(
         )
         
         result_ident = await db.execute(stmt_update_identity)
-        print(f"UpdateStatus: AspNetUsers rows affected: {result_ident.rowcount}")
+        logger.debug("UpdateStatus: AspNetUsers rows affected: %s", result_ident.rowcount)
 
         await db.commit()
-        print("UpdateStatus: Commit successful")
+        logger.debug("UpdateStatus: Commit successful")
 
         return ResponseModel(
             Data=command.UserId,
@@ -572,7 +575,7 @@ async def update_status(
         )
         
     except Exception as e:
-        print(f"Error in update_status: {str(e)}")
+        logger.exception("Error in update_status: %s", e)
         await db.rollback()
         return ResponseModel(
             Message=f"Error: {str(e)}",
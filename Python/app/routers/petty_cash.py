@@ -1,21 +1,22 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
-from fastapi.responses import FileResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Any
 from sqlalchemy import select, func, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db, DB_NAME_MASTER, DB_NAME_USER
 from ..models.petty_cash import TblPettyCash as PettyCash
+from ..attachment_store import store_upload
+from ..file_serving import resolve_attachment_path, attachment_response
+from ..previews import get_preview, DEFAULT_PREVIEW_SIZE, PREVIEW_CACHE_CONTROL
+from ..responses import FastJSONResponse
 from datetime import date, datetime
 import os
-import shutil
 from pathlib import Path
 
-router = APIRouter(prefix="/pettycash", tags=["PettyCash"])
+logger = logging.getLogger(__name__)
 
-# Directory to store uploaded files
-UPLOAD_DIR = Path(__file__).parent.parent / "uploads" / "pettycash"
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+router = APIRouter(prefix="/pettycash", tags=["PettyCash"])
 
 
 def row_to_dict(row, lowercase_keys=False):
@@ -130,14 +131,14 @@ async def create_pettycash(
             if "Header" in data and "header" not in data: data["header"] = data.pop("Header")
             if "Payload" in data and "payload" not in data: data["payload"] = data.pop("Payload")
             
-            print(f"DEBUG create_pettycash incoming JSON: {data}")
+            logger.debug("create_pettycash incoming JSON: %s", data)
 
             parsed = CreatePettyCashCommand.model_validate(data) if hasattr(CreatePettyCashCommand, "model_validate") else CreatePettyCashCommand.parse_obj(data)
             jh = parsed.header
             
-            print(f"DEBUG create_pettycash parsed header (jh): {jh}")
-            print(f"DEBUG create_pettycash jh.category_id: {jh.category_id}")
-            print(f"DEBUG create_pettycash parsed category from JSON: {data.get('header', {}).get('category_id')}")
+            logger.debug("create_pettycash parsed header (jh): %s", jh)
+            logger.debug("create_pettycash jh.category_id: %s", jh.category_id)
+            logger.debug("create_pettycash parsed category from JSON: %s", data.get('header', {}).get('category_id'))
             header.VoucherNo = jh.VoucherNo or header.VoucherNo
             header.ExpDate = jh.ExpDate or header.ExpDate
             header.category_id = jh.category_id or header.category_id
@@ -179,16 +180,18 @@ async def create_pettycash(
     max_id = q_max.scalar() or 0
     pc_no = f"PC{str(max_id + 1).zfill(6)}"
 
-    # 4. Handle file upload
+    # 4. Handle file upload (streamed + content-addressed, see app/attachment_store.py)
     file_path = None
     file_name = None
+    attachment_id = None
     if file:
         try:
-            file_name = file.filename
-            file_path = UPLOAD_DIR / file_name
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            file_path = str(file_path)
+            stored = await store_upload(db, file)
+            file_name = stored.original_name
+            file_path = stored.path
+            attachment_id = stored.attachment_id
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"File upload failed: {str(e)}")
     
@@ -218,7 +221,7 @@ async def create_pettycash(
     await db.flush()
     await db.commit()
     await db.refresh(new)
-    return {"status": True, "data": row_to_dict(new)}
+    return {"status": True, "data": row_to_dict(new), "attachment_id": attachment_id}
 
 
 @router.put("/update")
@@ -313,14 +316,15 @@ async def update_pettycash(
         amt_idr = float(header.Amount) * rate
 
     # 3. Handle file upload
+    attachment_id = None
     if file:
         try:
-            file_name = file.filename
-            file_path = UPLOAD_DIR / file_name
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            obj.ExpenseFileName = file_name
-            obj.ExpenseFilePath = str(file_path)
+            stored = await store_upload(db, file)
+            obj.ExpenseFileName = stored.original_name
+            obj.ExpenseFilePath = stored.path
+            attachment_id = stored.attachment_id
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"File upload failed: {str(e)}")
     
@@ -366,7 +370,7 @@ async def update_pettycash(
     
     await db.commit()
     await db.refresh(obj)
-    return {"status": True, "data": row_to_dict(obj)}
+    return {"status": True, "data": row_to_dict(obj), "attachment_id": attachment_id}
 
 
 @router.get("/get-by-id")
@@ -424,8 +428,8 @@ async def get_list(
     q = await db.execute(text(query_str), params)
     items = q.fetchall()
     
-    # helper row_to_dict handles the mapping
-    return {"status": True, "data": [row_to_dict(it) for it in items]}
+    # Decimal/date cells are encoded by the response class; no per-cell conversion needed
+    return FastJSONResponse({"status": True, "data": [dict(it._mapping) for it in items]})
 
 
 @router.get("/test-connection")
@@ -451,9 +455,7 @@ async def get_master_expense_categories(orgid: int = 1, branchid: int = 1, db: A
         rows = [row_to_dict(row, lowercase_keys=True) for row in result.fetchall()]
         return {"status": True, "data": rows}
     except Exception as e:
-        import traceback
-        tb = traceback.format_exc()
-        print(f"ERROR in master-expense-categories: {tb}")
+        logger.exception("Error in master-expense-categories: %s", e)
         return {"status": False, "message": str(e)}
 
 
@@ -471,14 +473,12 @@ async def get_master_expense_types(orgid: int = 1, branchid: int = 1, category_i
         rows = [row_to_dict(row, lowercase_keys=True) for row in result.fetchall()]
         return {"status": True, "data": rows}
     except Exception as e:
-        import traceback
-        tb = traceback.format_exc()
-        print(f"ERROR in master-expense-types: {tb}")
+        logger.exception("Error in master-expense-types: %s", e)
         return {"status": False, "message": str(e)}
 
 
 @router.get("/download/{pettycash_id}")
-async def download_file(pettycash_id: int, db: AsyncSession = Depends(get_db)):
+async def download_file(pettycash_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """Download the file attached to a petty cash record."""
     q = await db.execute(select(PettyCash).where(PettyCash.PettyCashId == pettycash_id))
     obj = q.scalars().first()
@@ -488,14 +488,32 @@ async def download_file(pettycash_id: int, db: AsyncSession = Depends(get_db)):
     if not obj.ExpenseFilePath:
         raise HTTPException(status_code=404, detail="No file attached to this record")
     
-    file_path = Path(obj.ExpenseFilePath)
-    if not file_path.exists():
+    resolved_path = resolve_attachment_path(obj.ExpenseFilePath)
+    if not resolved_path:
         raise HTTPException(status_code=404, detail="File not found on server")
     
-    return FileResponse(
-        path=file_path,
-        filename=obj.ExpenseFileName or "download",
-        media_type="application/octet-stream"
+    return attachment_response(request, resolved_path, filename=obj.ExpenseFileName or "download")
+
+
+@router.get("/preview/{pettycash_id}")
+async def preview_file(pettycash_id: int, request: Request, size: int = DEFAULT_PREVIEW_SIZE, db: AsyncSession = Depends(get_db)):
+    """Downscaled JPEG preview of the attached receipt (first page for PDFs), for list views."""
+    q = await db.execute(select(PettyCash).where(PettyCash.PettyCashId == pettycash_id))
+    obj = q.scalars().first()
+    if not obj or not obj.ExpenseFilePath:
+        raise HTTPException(status_code=404, detail="No file attached to this record")
+
+    resolved_path = resolve_attachment_path(obj.ExpenseFilePath)
+    if not resolved_path:
+        raise HTTPException(status_code=404, detail="File not found on server")
+
+    preview_path = await get_preview(resolved_path, size)
+    return attachment_response(
+        request, preview_path,
+        filename=f"{pettycash_id}-preview.jpg",
+        media_type="image/jpeg",
+        cache_control=PREVIEW_CACHE_CONTROL,
+        disposition="inline"
     )
 
 
@@ -518,9 +536,7 @@ async def get_master_currency(orgid: int = 1, branchid: int = 1, db: AsyncSessio
         rows = [row_to_dict(row, lowercase_keys=False) for row in result.fetchall()]
         return {"status": True, "data": rows}
     except Exception as e:
-        import traceback
-        tb = traceback.format_exc()
-        print(f"ERROR in master-currency: {tb}")
+        logger.exception("Error in master-currency: %s", e)
         return {"status": False, "message": str(e)}
 
 
@@ -548,7 +564,8 @@ async def get_image_path(pettycashid: int, branchid: Optional[int] = 1, orgid: O
             "PettyCashId": obj.PettyCashId,
             "ExpenseFileName": obj.ExpenseFileName,
             "ExpenseFilePath": obj.ExpenseFilePath,
-            "ExistsOnServer": file_path.exists()  # Helper boolean
+            "ExistsOnServer": file_path.exists(),  # Helper boolean
+            "PreviewUrl": f"/pettycash/preview/{obj.PettyCashId}"
         }
         
         return {"status": True, "data": data}
@@ -1,7 +1,9 @@
+import logging
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import Optional
 import mysql.connector
+from .. import sync_db
 import re
 from datetime import datetime
 import os
@@ -9,6 +11,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/procurement",
     tags=["Procurement"]
@@ -27,17 +31,12 @@ class SavePRReplyRequest(BaseModel):
     sender: str
 
 def get_db_connection_sync():
-    return mysql.connector.connect(
-        host=os.getenv('DB_HOST'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        database=os.getenv('DB_NAME_PURCHASE'),
-        ssl_disabled=True
-    )
+    # Pooled and traced (metrics + slow-query log); close() returns it to the pool
+    return sync_db.get_connection(os.getenv('DB_NAME_PURCHASE', 'btggasify_purchase_live'))
 
 @router.post("/save_pr_reply")
 async def save_pr_reply(req: SavePRReplyRequest):
-    print("Received data:", req.dict())
+    logger.debug("Received data: %s", req.dict())
 
     pr_id = req.pr_id
     reply = req.reply.strip()
@@ -91,7 +90,7 @@ async def save_pr_reply(req: SavePRReplyRequest):
             pass 
 
         conn.commit()
-        print(f"PR {pr_id} updated: pr_comment updated, IsSubmitted={is_submitted}, pr_gm_isdiscussed={is_gm_discussed}")
+        logger.info("PR %s updated: pr_comment updated, IsSubmitted=%s, pr_gm_isdiscussed=%s", pr_id, is_submitted, is_gm_discussed)
         return {
             "success": True,
             "message": "Reply saved",
@@ -102,13 +101,13 @@ async def save_pr_reply(req: SavePRReplyRequest):
         }
 
     except mysql.connector.Error as e:
-        print("MYSQL ERROR >>>", repr(e))
+        logger.exception("MySQL error: %r", e)
         if conn:
             conn.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
     except Exception as e:
-        print("GENERIC ERROR >>>", repr(e))
+        logger.exception("Unexpected error: %r", e)
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
 
     finally:
@@ -176,13 +175,13 @@ async def save_director_discussion(req: SaveDirectorDiscussionRequest):
         }
 
     except mysql.connector.Error as e:
-        print("MYSQL ERROR >>>", repr(e))
+        logger.exception("MySQL error: %r", e)
         if conn:
             conn.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
     except Exception as e:
-        print("GENERIC ERROR >>>", repr(e))
+        logger.exception("Unexpected error: %r", e)
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
 
     finally:
@@ -271,11 +270,11 @@ async def get_remarks_history(prid: int):
                     "pr_comment": cumulative_comment
                 })
         
-        print(f"Remarks history for PR {prid}:", history)
+        logger.debug("Remarks history for PR %s: %s", prid, history)
         return history  # Return array directly, not wrapped in status
 
     except Exception as e:
-        print("ERROR converting remarks:", e)
+        logger.exception("Error converting remarks: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cursor:
@@ -1,28 +1,35 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
+import logging
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Any
-import mysql.connector
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from .. import sync_db
 import os
-import shutil
 from datetime import datetime
 from dotenv import load_dotenv
 
+from ..database import get_db
+from ..attachment_store import store_upload, content_root_path
+from ..fanout import gather_reads_sync
+from ..file_serving import resolve_attachment_path, attachment_response
+from ..previews import get_preview, DEFAULT_PREVIEW_SIZE, PREVIEW_CACHE_CONTROL
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/api/procurement_memo",
     tags=["Procurement Memo"]
 )
 
+DB_NAME_PURCHASE = os.getenv('DB_NAME_PURCHASE', 'btggasify_purchase_live')
+
 def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv('DB_HOST'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        database=os.getenv('DB_NAME_PURCHASE'),
-        port=int(os.getenv('DB_PORT', 3306)),
-        ssl_disabled=True
-    )
+    # Pooled and traced (metrics + slow-query log); close() returns it to the pool
+    return sync_db.get_connection(DB_NAME_PURCHASE)
 
 # --- Pydantic Models (Matching C# DTOs inferred from Repository) ---
 
@@ -97,7 +104,7 @@ def get_all(requesterid: int = 0, BranchId: int = 1, OrgId: int = 1, pmnumber: s
             
         return {"status": True, "data": results, "message": "Success"}
     except Exception as e:
-        print(f"Error in get_all: {e}")
+        logger.exception("Error in get_all: %s", e)
         return {"status": False, "message": str(e), "data": []}
     finally:
         if cursor: cursor.close()
@@ -121,27 +128,57 @@ def get_purchase_memo_seq_no(BranchId: int = 1, orgid: int = 1):
             
         return {"Status": True, "Message": "Success", "Data": data}
     except Exception as e:
-        print(f"Error in GetPurchaseMemoSeqNo: {e}")
+        logger.exception("Error in GetPurchaseMemoSeqNo: %s", e)
         return {"Status": False, "Message": str(e), "Data": None}
     finally:
         if cursor: cursor.close()
         if conn: conn.close()
 
+# Line details straight from the table: ItemGroup, Department and UOM may be missing from the procedure's set
+GET_BY_ID_DETAIL_SQL = """
+    SELECT 
+        d.Memo_dtl_ID, 
+        d.Memo_ID, 
+        d.ItemId, 
+        d.DepartmentId, 
+        d.UOMId, 
+        d.Qty, 
+        d.AvailStk, 
+        d.DeliveryDate, 
+        d.Remarks, 
+        d.itemGroupId, 
+        d.CreatedBy, 
+        d.CreatedDate, 
+        d.IsActive,
+        i.itemname,
+        ig.groupname,
+        dep.departmentname,
+        uom.UOM
+    FROM tbl_purchasememo_detail d
+    LEFT JOIN btggasify_masterpanel_live.master_item i ON d.ItemId = i.itemid
+    LEFT JOIN btggasify_masterpanel_live.master_itemgroup ig ON d.itemGroupId = ig.groupid
+    LEFT JOIN btggasify_live.master_department dep ON d.DepartmentId = dep.departmentid
+    LEFT JOIN btggasify_live.master_uom uom ON d.UOMId = uom.Id
+    WHERE d.Memo_ID = %s AND d.IsActive = 1
+"""
+
 @router.get("/GetById")
 def get_by_id(pmid: int, OrgId: int = 1):
-    conn = None
-    cursor = None
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+    def fetch_proc(cursor):
         # @opt=3 for GetById
         args = (3, pmid, 0, OrgId, 0, "", 0)
         cursor.callproc('proc_purchasememo', args)
         
         # Read multiple result sets: Header, Details, Attachments
-        result_sets = []
-        for result in cursor.stored_results():
-            result_sets.append(result.fetchall())
+        return [result.fetchall() for result in cursor.stored_results()]
+
+    def fetch_details(cursor):
+        cursor.execute(GET_BY_ID_DETAIL_SQL, (pmid,))
+        return cursor.fetchall()
+
+    try:
+        # The procedure and the detail query are independent: run them on two connections at once
+        result_sets, table_details = gather_reads_sync(DB_NAME_PURCHASE, fetch_proc, fetch_details)
             
         header = {}
         details = []
@@ -154,37 +191,9 @@ def get_by_id(pmid: int, OrgId: int = 1):
         if len(result_sets) > 2:
             attachments = result_sets[2]
         
-        # Fetch details directly from table to ensure all fields are populated
-        # (ItemGroup, Department, UOM may be missing from stored procedure)
+        # Prefer the fully populated table rows whenever the procedure returned details
         if details:
-            detail_sql = """
-                SELECT 
-                    d.Memo_dtl_ID, 
-                    d.Memo_ID, 
-                    d.ItemId, 
-                    d.DepartmentId, 
-                    d.UOMId, 
-                    d.Qty, 
-                    d.AvailStk, 
-                    d.DeliveryDate, 
-                    d.Remarks, 
-                    d.itemGroupId, 
-                    d.CreatedBy, 
-                    d.CreatedDate, 
-                    d.IsActive,
-                    i.itemname,
-                    ig.groupname,
-                    dep.departmentname,
-                    uom.UOM
-                FROM tbl_purchasememo_detail d
-                LEFT JOIN btggasify_masterpanel_live.master_item i ON d.ItemId = i.itemid
-                LEFT JOIN btggasify_masterpanel_live.master_itemgroup ig ON d.itemGroupId = ig.groupid
-                LEFT JOIN btggasify_live.master_department dep ON d.DepartmentId = dep.departmentid
-                LEFT JOIN btggasify_live.master_uom uom ON d.UOMId = uom.Id
-                WHERE d.Memo_ID = %s AND d.IsActive = 1
-            """
-            cursor.execute(detail_sql, (pmid,))
-            details = cursor.fetchall()
+            details = table_details
             
         model_list = {
             "header": header,
@@ -195,11 +204,8 @@ def get_by_id(pmid: int, OrgId: int = 1):
         return {"Status": True, "Message": "Success", "Data": model_list}
         
     except Exception as e:
-        print(f"Error in GetById: {e}")
+        logger.exception("Error in GetById: %s", e)
         return {"Status": False, "Message": str(e), "Data": None}
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
 
 @router.post("/Create")
 def create_purchase_memo(command: CreateUpdateMemoCommand):
@@ -265,7 +271,7 @@ def create_purchase_memo(command: CreateUpdateMemoCommand):
         
     except Exception as e:
         if conn: conn.rollback()
-        print(f"Error in Create: {e}")
+        logger.exception("Error in Create: %s", e)
         return {"Status": False, "Message": "Something went wrong: " + str(e), "Data": None}
     finally:
         if cursor: cursor.close()
@@ -334,7 +340,7 @@ def update_purchase_memo(command: CreateUpdateMemoCommand):
         
     except Exception as e:
         if conn: conn.rollback()
-        print(f"Error in Update: {e}")
+        logger.exception("Error in Update: %s", e)
         return {"Status": False, "Message": "Something went wrong: " + str(e), "Data": None}
     finally:
         if cursor: cursor.close()
@@ -357,126 +363,123 @@ def delete_memo(command: DeleteMemoCommand):
         
     except Exception as e:
         if conn: conn.rollback()
-        print(f"Error in Delete: {e}")
+        logger.exception("Error in Delete: %s", e)
         return {"Status": False, "Message": str(e), "Data": 0}
     finally:
         if cursor: cursor.close()
         if conn: conn.close()
 
+def _insert_memo_attachments(memoid: int, user_id: int, stored_files: list):
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        sql = """
+            INSERT INTO tbl_purchasememo_Attachment 
+            (Memo_ID, AttachmentName, AttachmentPath, CreatedBy, CreatedDate, CreatedIP, IsActive)
+            VALUES (%s, %s, %s, %s, NOW(), '', 1)
+        """
+        cursor.executemany(sql, [(memoid, f.original_name, content_root_path(f.path), user_id) for f in stored_files])
+        conn.commit()
+    except Exception:
+        if conn: conn.rollback()
+        raise
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
+
 @router.post("/upload-doc")
-def upload_document(
+async def upload_document(
     file: List[UploadFile] = File(...),
     memoid: int = Form(...),
     BranchId: int = Form(...),
-    UserId: int = Form(...)
+    UserId: int = Form(...),
+    db: AsyncSession = Depends(get_db)
 ):
-    conn = None
-    cursor = None
     try:
         if not file:
             raise HTTPException(status_code=400, detail="No file uploaded")
-        
-        # Determine strict project root
-        current_dir = os.path.dirname(os.path.abspath(__file__)) # routers/
-        app_dir = os.path.dirname(current_dir) # app/
-        python_root = os.path.dirname(app_dir) # Python/
-        project_root = os.path.dirname(python_root) # BTG-GASIGY-COMBINED/
-        
-        upload_base_dir = os.path.join(
-            project_root, 
-            "API", "UserPanel", "UserPanel", "UploadedFiles", "ProcurementMemo", str(memoid)
-        )
-        
-        if not os.path.exists(upload_base_dir):
-            os.makedirs(upload_base_dir)
-            
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        inserted_items = []
 
+        # Files are streamed into the shared content-addressed store (app/attachment_store.py);
+        # the memo attachment row keeps the display name and points at the blob by its
+        # content-root-relative path, which the .NET download-file endpoint also reads.
+        stored_files = []
         for f in file:
-            filename = f.filename
-            file_path = os.path.join(upload_base_dir, filename)
-            
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(f.file, buffer)
-            
-            # DB Insert
-            sql = """
-                INSERT INTO tbl_purchasememo_Attachment 
-                (Memo_ID, AttachmentName, AttachmentPath, CreatedBy, CreatedDate, CreatedIP, IsActive)
-                VALUES (%s, %s, %s, %s, NOW(), '', 1)
-            """
-            cursor.execute(sql, (memoid, filename, file_path, UserId))
-            inserted_items.append(filename)
-            
-        conn.commit()
-        
-        return {"Status": True, "Message": "Success", "Data": inserted_items}
-        
+            stored_files.append(await store_upload(db, f, user_id=UserId))
+
+        # Register the blobs before the memo rows that point at them
+        await db.commit()
+        # mysql.connector is blocking, keep it off the event loop
+        await run_in_threadpool(_insert_memo_attachments, memoid, UserId, stored_files)
+
+        return {
+            "Status": True,
+            "Message": "Success",
+            "Data": [f.original_name for f in stored_files],
+            "AttachmentIds": [f.attachment_id for f in stored_files]
+        }
+
+    except HTTPException as he:
+        await db.rollback()
+        return JSONResponse(
+            status_code=he.status_code,
+            content={"Status": False, "Message": "Upload failed: " + str(he.detail), "Data": None},
+        )
     except Exception as e:
-        if conn: conn.rollback()
-        print(f"Error in upload_document: {e}")
-        return {"Status": False, "Message": "Upload failed: " + str(e), "Data": None}
+        await db.rollback()
+        logger.exception("Error in upload_document: %s", e)
+        return JSONResponse(
+            status_code=500,
+            content={"Status": False, "Message": "Upload failed due to server error.", "Data": None},
+        )
+
+def _memo_attachment_name(file_path: str, memo_id: int) -> Optional[str]:
+    """Display name of a memo attachment (the front end passes the Memo_ID as file_id)."""
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        sql = "SELECT AttachmentName FROM tbl_purchasememo_Attachment WHERE AttachmentPath = %s AND IsActive = 1"
+        params = [file_path]
+        if memo_id:
+            sql += " AND Memo_ID = %s"
+            params.append(memo_id)
+        cursor.execute(sql + " ORDER BY Memo_ID DESC LIMIT 1", params)
+        row = cursor.fetchone()
+        return row["AttachmentName"] if row and row["AttachmentName"] else None
+    except Exception as e:
+        # The file is still served, under its stored name
+        logger.warning("Attachment name lookup failed for %s: %s", file_path, e)
+        return None
     finally:
         if cursor: cursor.close()
         if conn: conn.close()
 
-from fastapi.responses import FileResponse
-
 @router.get("/download-file")
-def download_file(file_path: str = Query(...), file_id: int = Query(0)):
-    # Replicating logic mainly from the .NET code but adapted for Python/FastAPI
-    # and local development environment mapping.
-    
-    # 1. Determine local project root (same as in upload-doc)
-    current_dir = os.path.dirname(os.path.abspath(__file__)) # routers/
-    app_dir = os.path.dirname(current_dir) # app/
-    python_root = os.path.dirname(app_dir) # Python/
-    project_root = os.path.dirname(python_root) # BTG-GASIGY-COMBINED/
-    
-    # Clean up file path
-    clean_path = file_path.lstrip('/\\')
-    
-    # 2. Try to find the file
-    # Possibility A: It is an absolute path (Linux style from DB)
-    if os.path.exists(file_path):
-        return FileResponse(
-            path=file_path,
-            filename=os.path.basename(file_path),
-            media_type="application/octet-stream"
-        )
-        
-    # Possibility B: It is relative to the "ContentRootPath" (which in .NET is the project root usually)
-    # We try mapping it to our established upload structure: API/UserPanel/UserPanel/UploadedFiles/...
-    # But often the path in DB is just "UploadedFiles/ProcurementMemo/..." or absolute.
-    
-    # Strategy: 
-    # Try joining project_root + clean_path
-    # Try joining project_root + "API/UserPanel/UserPanel" + clean_path (Standard .NET structure)
-    
-    potential_paths = [
-        os.path.join(project_root, clean_path),
-        os.path.join(project_root, "API", "UserPanel", "UserPanel", clean_path)
-    ]
-    
-    # If the path in DB is like "/var/www/.../UploadedFiles/...", try to extract relative part
-    if "UploadedFiles" in file_path:
-        try:
-             # Extract everything after "UploadedFiles"
-             relative_part = file_path.split("UploadedFiles", 1)[1]
-             relative_part = "UploadedFiles" + relative_part
-             potential_paths.append(os.path.join(project_root, "API", "UserPanel", "UserPanel", relative_part.lstrip('/\\')))
-        except:
-            pass
-
-    for p in potential_paths:
-        if os.path.exists(p):
-             return FileResponse(
-                path=p,
-                filename=os.path.basename(p),
-                media_type="application/octet-stream"
-            )
-
-    raise HTTPException(status_code=404, detail="File not found.")
\ No newline at end of file
+def download_file(request: Request, file_path: str = Query(...), file_id: int = Query(0)):
+    # Paths in the DB are absolute (Linux production) or relative to the .NET
+    # content root; resolve_attachment_path tries both and caches the result.
+    resolved_path = resolve_attachment_path(file_path)
+    if not resolved_path:
+        raise HTTPException(status_code=404, detail="File not found.")
+
+    # Stored files are named by content hash; download under the uploaded name
+    return attachment_response(request, resolved_path, filename=_memo_attachment_name(file_path, file_id))
+
+@router.get("/preview-file")
+async def preview_file(request: Request, file_path: str = Query(...), size: int = DEFAULT_PREVIEW_SIZE):
+    # Small JPEG thumbnail (first page for PDFs) for attachment lists
+    resolved_path = resolve_attachment_path(file_path)
+    if not resolved_path:
+        raise HTTPException(status_code=404, detail="File not found.")
+
+    preview_path = await get_preview(resolved_path, size)
+    return attachment_response(
+        request, preview_path,
+        media_type="image/jpeg",
+        cache_control=PREVIEW_CACHE_CONTROL,
+        disposition="inline"
+    )
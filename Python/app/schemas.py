@@ -56,6 +56,15 @@ class VerifyCustomerUpdate(BaseModel):
     reply_message: Optional[str] = None
     user_id: Optional[int] = None
 
+class BulkVerifyItem(VerifyCustomerUpdate):
+    receipt_id: int
+
+class BulkVerifyRequest(BaseModel):
+    items: List[BulkVerifyItem]
+
+class BulkSubmitRequest(BaseModel):
+    receipt_ids: List[int]
+
 class SaveDraftRequest(BaseModel):
     customer_id: int
     bank_charges: float
@@ -76,4 +85,10 @@ class PostInvoiceToARRequest(BaseModel):
     orgId: int
     branchId: int
     userId: int
-    invoiceId: int
\ No newline at end of file
+    invoiceId: int
+
+class PostInvoicesToARRequest(BaseModel):
+    orgId: int
+    branchId: int
+    userId: int
+    invoiceIds: List[int]
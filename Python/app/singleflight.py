@@ -0,0 +1,164 @@
+import asyncio
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .metrics import METRIC_PREFIX, registry
+
+
+# ----------------------------------------------------------
+# KEYS
+# ----------------------------------------------------------
+def _normalize(value: Any) -> Hashable:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value.normalize())
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return normalize_params(value)
+    return value
+
+
+def normalize_params(params: Dict[str, Any]) -> Tuple:
+    """Order-independent, hashable form of request parameters."""
+    return tuple(sorted((k, _normalize(v)) for k, v in params.items()))
+
+
+# ----------------------------------------------------------
+# IN-FLIGHT CALLS
+# ----------------------------------------------------------
+class _SyncCall:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class _FlightStats:
+    __slots__ = ("executions", "coalesced", "errors")
+
+    def __init__(self):
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for a key is running,
+    later callers with the same key wait for it and get the same result (or
+    exception) instead of running the query again. Nothing is kept once the
+    call finishes. Results are shared between callers, so treat them as
+    read-only.
+
+    The key is (name, normalized params, version). Callers pass the data
+    version of the tables they read so a request arriving after a write never
+    joins a query that started before it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_calls: Dict[Tuple, _SyncCall] = {}
+        self._async_calls: Dict[Tuple, asyncio.Task] = {}
+        self._stats: Dict[str, _FlightStats] = {}
+
+    def _stat(self, name: str) -> _FlightStats:
+        stat = self._stats.get(name)
+        if stat is None:
+            stat = self._stats[name] = _FlightStats()
+        return stat
+
+    # ---------------- sync (threadpool endpoints) ----------------
+    def do_sync(self, name: str, params: Dict[str, Any], fn: Callable[..., Any], *args, version: Hashable = None):
+        key = (name, normalize_params(params), version)
+        with self._lock:
+            call = self._sync_calls.get(key)
+            if call is None:
+                call = self._sync_calls[key] = _SyncCall()
+                self._stat(name).executions += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._stat(name).coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stat(name).errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._sync_calls.pop(key, None)
+            call.done.set()
+
+    # ---------------- async (event-loop endpoints) ----------------
+    async def do(self, name: str, params: Dict[str, Any], fn: Callable[..., Awaitable[Any]], *args, version: Hashable = None):
+        key = (name, normalize_params(params), version)
+        with self._lock:
+            task = self._async_calls.get(key)
+            if task is None:
+                # Own task: one caller disconnecting must not cancel the query the others are waiting on
+                task = asyncio.ensure_future(fn(*args))
+                self._async_calls[key] = task
+                self._stat(name).executions += 1
+                task.add_done_callback(lambda t, key=key, name=name: self._finish(key, name, t))
+            else:
+                self._stat(name).coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, name: str, task: asyncio.Task):
+        with self._lock:
+            if self._async_calls.get(key) is task:
+                del self._async_calls[key]
+            if not task.cancelled() and task.exception() is not None:
+                self._stats[name].errors += 1
+
+    # ---------------- reporting ----------------
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                name: {"executions": s.executions, "coalesced": s.coalesced, "errors": s.errors}
+                for name, s in sorted(self._stats.items())
+            }
+
+    def render(self) -> List[str]:
+        p = METRIC_PREFIX
+        stats = self.snapshot()
+        with self._lock:
+            in_flight = len(self._sync_calls) + len(self._async_calls)
+        lines = []
+        for metric, attr, help_text in (
+            ("singleflight_executions_total", "executions", "Report queries actually executed."),
+            ("singleflight_coalesced_total", "coalesced", "Calls that shared an identical in-flight query."),
+            ("singleflight_errors_total", "errors", "Shared executions that raised."),
+        ):
+            lines.append(f"# HELP {p}_{metric} {help_text}")
+            lines.append(f"# TYPE {p}_{metric} counter")
+            for name, s in stats.items():
+                lines.append(f'{p}_{metric}{{key="{name}"}} {s[attr]}')
+        lines.append(f"# HELP {p}_singleflight_in_flight Distinct report queries currently running.")
+        lines.append(f"# TYPE {p}_singleflight_in_flight gauge")
+        lines.append(f"{p}_singleflight_in_flight {in_flight}")
+        return lines
+
+
+report_flights = SingleFlight()
+registry.add_collector(report_flights.render)
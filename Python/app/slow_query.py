@@ -0,0 +1,210 @@
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from dotenv import load_dotenv
+
+from .metrics import current_stats
+
+load_dotenv()
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", "500"))
+SLOW_QUERY_MAX_PLANS = int(os.getenv("SLOW_QUERY_MAX_PLANS", "500"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") not in ("0", "false", "False")
+STATEMENT_DISPLAY_LIMIT = 8000
+
+# EXPLAIN never executes these; INSERT/CALL/DDL plans are not worth capturing
+EXPLAINABLE = ("select", "with", "update", "delete")
+
+
+# ----------------------------------------------------------
+# NORMALIZATION / REDACTION
+# ----------------------------------------------------------
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """Statement text with literals replaced by ? so it is safe to keep and groups by shape."""
+    s = _STRING_LITERAL.sub("?", statement)
+    s = _NUMBER_LITERAL.sub("?", s)
+    s = s.replace("%s", "?")
+    s = re.sub(r"%\(\w+\)s|:\w+", "?", s)
+    s = _IN_LIST.sub("(?...)", s)
+    return _WHITESPACE.sub(" ", s).strip()
+
+
+def statement_shape(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def _redact_value(value) -> str:
+    if value is None:
+        return "<null>"
+    return f"<{type(value).__name__}>"
+
+
+def redact_params(parameters):
+    """Keeps parameter names and types only, never the values."""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {k: _redact_value(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            # executemany: report the batch size and the first row's shape
+            return {"rows": len(parameters), "first": redact_params(parameters[0])}
+        return [_redact_value(v) for v in parameters]
+    return _redact_value(parameters)
+
+
+# ----------------------------------------------------------
+# RECORDER
+# ----------------------------------------------------------
+class SlowQueryLog:
+    """Ring buffer of slow statements plus one EXPLAIN plan per statement shape."""
+
+    def __init__(self, threshold_ms: float, buffer_size: int, max_plans: int):
+        self.threshold_ms = threshold_ms
+        self._entries = deque(maxlen=buffer_size)
+        self._plans = OrderedDict()  # shape -> {"status", "plan", "statement", "captured_at"}
+        self._max_plans = max_plans
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # One background worker; EXPLAIN must never compete with request threads
+        self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+
+    def record(self, statement: str, parameters, duration_s: float, source: str, database: Optional[str] = None):
+        duration_ms = duration_s * 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        normalized = normalize_statement(statement)
+        shape = statement_shape(normalized)
+        stats = current_stats()
+        entry = {
+            "id": next(self._ids),
+            "at": datetime.now().isoformat(timespec="milliseconds"),
+            "duration_ms": round(duration_ms, 2),
+            "shape": shape,
+            "source": source,
+            "path": stats.path if stats is not None else None,
+            "statement": normalized[:STATEMENT_DISPLAY_LIMIT],
+            "params": redact_params(parameters),
+        }
+
+        schedule_explain = False
+        with self._lock:
+            self._entries.append(entry)
+            if SLOW_QUERY_EXPLAIN and shape not in self._plans and normalized.lower().startswith(EXPLAINABLE):
+                self._plans[shape] = {"status": "pending", "plan": None, "statement": entry["statement"], "captured_at": None}
+                while len(self._plans) > self._max_plans:
+                    self._plans.popitem(last=False)
+                schedule_explain = True
+
+        if schedule_explain:
+            # The raw statement and parameters only live until the EXPLAIN has run
+            self._explainer.submit(self._explain, shape, statement, parameters, database)
+
+    def _explain(self, shape: str, statement: str, parameters, database: Optional[str]):
+        from . import sync_db  # sync_db traces through this module
+
+        conn = None
+        cursor = None
+        try:
+            conn = sync_db.get_connection(database, traced=False)
+            cursor = conn.cursor()
+            cursor.execute(f"EXPLAIN FORMAT=JSON {statement}", parameters or None)
+            row = cursor.fetchone()
+            plan = json.loads(row[0]) if row and row[0] else None
+            result = {"status": "captured", "plan": plan}
+        except Exception as e:
+            result = {"status": "failed", "plan": None, "error": str(e)}
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+
+        with self._lock:
+            if shape in self._plans:
+                self._plans[shape].update(result, captured_at=datetime.now().isoformat(timespec="seconds"))
+
+    def entries(self, limit: int = 100, min_ms: float = 0) -> List[Dict]:
+        with self._lock:
+            items = [e for e in reversed(self._entries) if e["duration_ms"] >= min_ms][:limit]
+            return [dict(e, plan_status=self._plans.get(e["shape"], {}).get("status")) for e in items]
+
+    def plan(self, shape: str) -> Optional[Dict]:
+        with self._lock:
+            p = self._plans.get(shape)
+            return dict(p, shape=shape) if p else None
+
+    def summary(self) -> List[Dict]:
+        """Per shape: how often it was slow, worst and average duration."""
+        with self._lock:
+            entries = list(self._entries)
+            plans = {k: v.get("status") for k, v in self._plans.items()}
+        by_shape = {}
+        for e in entries:
+            s = by_shape.setdefault(e["shape"], {"shape": e["shape"], "statement": e["statement"][:300], "count": 0, "max_ms": 0.0, "total_ms": 0.0})
+            s["count"] += 1
+            s["max_ms"] = max(s["max_ms"], e["duration_ms"])
+            s["total_ms"] += e["duration_ms"]
+        out = []
+        for s in by_shape.values():
+            s["avg_ms"] = round(s.pop("total_ms") / s["count"], 2)
+            s["plan_status"] = plans.get(s["shape"])
+            out.append(s)
+        return sorted(out, key=lambda s: s["max_ms"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
+
+
+slow_log = SlowQueryLog(SLOW_QUERY_MS, SLOW_QUERY_BUFFER, SLOW_QUERY_MAX_PLANS)
+
+
+# ----------------------------------------------------------
+# SQLALCHEMY HOOKS
+# ----------------------------------------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slowlog_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("slowlog_query_start")
+    if not starts:
+        return
+    slow_log.record(statement, parameters, time.perf_counter() - starts.pop(), source="engine")
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None:
+        starts = conn.info.get("slowlog_query_start")
+        if starts:
+            starts.pop()
+
+
+def instrument_engine(engine):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
@@ -0,0 +1,350 @@
+import logging
+import asyncio
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+
+# Optional renderers: XLSX needs openpyxl, PDF needs reportlab
+try:
+    import openpyxl
+    from openpyxl.styles import Font
+except ImportError:  # pragma: no cover - depends on deployment
+    openpyxl = None
+    Font = None
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+except ImportError:  # pragma: no cover - depends on deployment
+    SimpleDocTemplate = None
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+STATEMENT_OUTPUT_DIR = Path(
+    os.getenv("STATEMENT_OUTPUT_DIR", str(Path(__file__).parent / "uploads" / "statements"))
+)
+STATEMENT_WORKERS = int(os.getenv("STATEMENT_WORKERS", str(min(4, os.cpu_count() or 1))))
+STATEMENT_JOB_HISTORY = 50
+
+SUPPORTED_FORMATS = ("xlsx", "pdf")
+COLUMNS = [
+    ("ledger_date", "Date"),
+    ("ar_no", "AR No"),
+    ("invoice_no", "Invoice No"),
+    ("receipt_no", "Receipt No"),
+    ("payment_mode", "Type"),
+    ("currencycode", "Currency"),
+    ("invoice_amount", "Invoice"),
+    ("debit_note_amount", "Debit Note"),
+    ("credit_note_amount", "Credit Note"),
+    ("receipt_amount", "Receipt"),
+    ("running_balance", "Balance"),
+]
+AMOUNT_KEYS = {"invoice_amount", "debit_note_amount", "credit_note_amount", "receipt_amount", "running_balance"}
+
+
+@dataclass
+class StatementJob:
+    job_id: str
+    org_id: int
+    branch_id: int
+    from_date: Optional[str]
+    to_date: Optional[str]
+    formats: List[str]
+    status: str = "queued"  # queued -> fetching -> rendering -> completed / failed
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    files: List[str] = field(default_factory=list)
+    errors: List[Dict] = field(default_factory=list)
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec="seconds"))
+    finished_at: Optional[str] = None
+
+    @property
+    def output_dir(self) -> Path:
+        return STATEMENT_OUTPUT_DIR / self.job_id
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "org_id": self.org_id,
+            "branch_id": self.branch_id,
+            "from_date": self.from_date,
+            "to_date": self.to_date,
+            "formats": self.formats,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "progress": round(self.done * 100 / self.total, 1) if self.total else (100.0 if self.status == "completed" else 0.0),
+            "files": self.files,
+            "errors": self.errors,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+_pool = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # Created on first use so importing the app does not fork workers
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=STATEMENT_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def install(app: FastAPI):
+    """Shuts the statement worker processes down when the app stops."""
+    original_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app_):
+        try:
+            async with original_lifespan(app_) as state:
+                yield state
+        finally:
+            shutdown_pool()
+
+    app.router.lifespan_context = lifespan
+
+
+# ----------------------------------------------------------
+# RENDERING (runs in worker processes; arguments must be picklable)
+# ----------------------------------------------------------
+def _safe_filename(name: str) -> str:
+    cleaned = re.sub(r"[^A-Za-z0-9._-]+", "_", name or "Unknown").strip("_")
+    return cleaned[:80] or "Unknown"
+
+
+def _num(value) -> float:
+    if value is None:
+        return 0.0
+    return float(value)
+
+
+def _with_running_balance(rows: List[Dict]) -> List[Dict]:
+    balance = 0.0
+    out = []
+    for row in rows:
+        balance += (
+            _num(row.get("invoice_amount"))
+            + _num(row.get("debit_note_amount"))
+            - _num(row.get("credit_note_amount"))
+            - _num(row.get("receipt_amount"))
+        )
+        item = dict(row)
+        item["running_balance"] = round(balance, 2)
+        out.append(item)
+    return out
+
+
+def _render_xlsx(path: Path, customer_name: str, period: str, rows: List[Dict]):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Statement"
+    ws.append([f"Statement of Account - {customer_name}"])
+    ws["A1"].font = Font(bold=True, size=13)
+    ws.append([period])
+    ws.append([])
+    ws.append([label for _, label in COLUMNS])
+    for cell in ws[4]:
+        cell.font = Font(bold=True)
+
+    for row in rows:
+        ws.append([
+            _num(row.get(key)) if key in AMOUNT_KEYS else (str(row.get(key)) if row.get(key) is not None else "")
+            for key, _ in COLUMNS
+        ])
+    for col in ws.columns:
+        ws.column_dimensions[col[0].column_letter].width = 16
+    wb.save(path)
+
+
+def _render_pdf(path: Path, customer_name: str, period: str, rows: List[Dict]):
+    styles = getSampleStyleSheet()
+    doc = SimpleDocTemplate(str(path), pagesize=landscape(A4), leftMargin=24, rightMargin=24, topMargin=24, bottomMargin=24)
+    data = [[label for _, label in COLUMNS]]
+    for row in rows:
+        data.append([
+            f"{_num(row.get(key)):,.2f}" if key in AMOUNT_KEYS else str(row.get(key) or "")
+            for key, _ in COLUMNS
+        ])
+    table = Table(data, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("FONTSIZE", (0, 0), (-1, -1), 7),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("ALIGN", (6, 1), (-1, -1), "RIGHT"),
+    ]))
+    doc.build([
+        Paragraph(f"Statement of Account - {customer_name}", styles["Title"]),
+        Paragraph(period, styles["Normal"]),
+        Spacer(1, 12),
+        table,
+    ])
+
+
+def render_customer_statement(output_dir: str, base: str, customer_name: str, period: str, rows: List[Dict], formats: List[str]) -> List[str]:
+    """Writes one statement file per format for a customer and returns the file names."""
+    rows = _with_running_balance(rows)
+    written = []
+    for fmt in formats:
+        path = Path(output_dir) / f"{base}.{fmt}"
+        tmp_path = path.with_suffix(f".{fmt}.tmp")
+        if fmt == "xlsx":
+            _render_xlsx(tmp_path, customer_name, period, rows)
+        else:
+            _render_pdf(tmp_path, customer_name, period, rows)
+        os.replace(tmp_path, path)
+        written.append(path.name)
+    return written
+
+
+# ----------------------------------------------------------
+# JOBS
+# ----------------------------------------------------------
+def check_formats(formats: List[str]) -> List[str]:
+    formats = [f.lower() for f in formats] or ["pdf"]
+    for fmt in formats:
+        if fmt not in SUPPORTED_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported statement format '{fmt}'")
+        if fmt == "xlsx" and openpyxl is None:
+            raise HTTPException(status_code=415, detail="XLSX statements are not available on this server")
+        if fmt == "pdf" and SimpleDocTemplate is None:
+            raise HTTPException(status_code=415, detail="PDF statements are not available on this server")
+    return list(dict.fromkeys(formats))
+
+
+def create_job(org_id: int, branch_id: int, from_date, to_date, formats: List[str]) -> StatementJob:
+    job = StatementJob(
+        job_id=uuid.uuid4().hex,
+        org_id=org_id,
+        branch_id=branch_id,
+        from_date=str(from_date) if from_date else None,
+        to_date=str(to_date) if to_date else None,
+        formats=check_formats(formats),
+    )
+    with _jobs_lock:
+        _jobs[job.job_id] = job
+        while len(_jobs) > STATEMENT_JOB_HISTORY:
+            _jobs.popitem(last=False)
+    return job
+
+
+def get_job(job_id: str) -> Optional[StatementJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def _partition_by_customer(rows: List[Dict]):
+    """(customer_id, customer_name, rows) per customer, in first-seen order; rows keep the AR book order."""
+    customers: Dict = {}
+    for row in rows:
+        key = row.get("customer_id")
+        entry = customers.get(key)
+        if entry is None:
+            entry = customers[key] = (key, row.get("customer_name") or "Unknown", [])
+        entry[2].append(row)
+    return list(customers.values())
+
+
+async def run_job(job: StatementJob, fetch_rows: Callable[[], List[Dict]]):
+    """
+    Fetches the branch AR book once (fetch_rows runs in the threadpool), then
+    renders every customer's statement on the process pool.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        job.status = "fetching"
+        rows = await run_in_threadpool(fetch_rows)
+
+        customers = _partition_by_customer(rows)
+        job.total = len(customers)
+        job.status = "rendering"
+        job.output_dir.mkdir(parents=True, exist_ok=True)
+        period = f"Period: {job.from_date or 'Beginning'} to {job.to_date or 'Today'}"
+
+        pool = _get_pool()
+
+        used_names = set()
+
+        def file_base(name):
+            base = candidate = _safe_filename(name)
+            n = 2
+            while candidate.lower() in used_names:
+                candidate = f"{base}_{n}"
+                n += 1
+            used_names.add(candidate.lower())
+            return candidate
+
+        async def render_one(customer_id, name, cust_rows):
+            try:
+                files = await loop.run_in_executor(
+                    pool, render_customer_statement, str(job.output_dir), file_base(name), name, period, cust_rows, job.formats
+                )
+                job.files.extend(files)
+            except Exception as e:
+                job.failed += 1
+                job.errors.append({"customer_id": customer_id, "customer_name": name, "error": str(e)})
+            finally:
+                job.done += 1
+
+        # The pool bounds the parallelism; progress is updated as each customer finishes
+        await asyncio.gather(*(render_one(*customer) for customer in customers))
+
+        job.files.sort()
+        job.status = "completed"
+    except Exception as e:
+        logger.exception("Error generating statements for job %s: %s", job.job_id, e)
+        job.status = "failed"
+        job.errors.append({"error": str(e)})
+    finally:
+        job.finished_at = datetime.now().isoformat(timespec="seconds")
+
+
+_running_tasks = set()
+
+
+def start_job(job: StatementJob, fetch_rows: Callable[[], List[Dict]]):
+    # Keep a reference so the task is not garbage collected mid-run
+    task = asyncio.create_task(run_job(job, fetch_rows))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+
+
+def statement_file_path(job: StatementJob, name: str) -> Optional[Path]:
+    """Resolves a file name from the job listing; anything else is rejected."""
+    if name not in job.files:
+        return None
+    path = job.output_dir / name
+    return path if path.is_file() else None
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from mysql.connector import errors, pooling
+from dotenv import load_dotenv
+
+from . import profiling
+from .data_versions import commit_writes, note_write, ALL_TABLES
+from .metrics import current_stats
+from .slow_query import slow_log
+
+load_dotenv()
+
+# ----------------------------------------------------------
+# CONFIGURATION
+# ----------------------------------------------------------
+DB_NAME_FINANCE = os.getenv('DB_NAME_FINANCE', 'btggasify_finance_live')
+
+SYNC_POOL_SIZE = min(int(os.getenv("SYNC_DB_POOL_SIZE", "10")), pooling.CNX_POOL_MAXSIZE)
+SYNC_POOL_TIMEOUT = float(os.getenv("SYNC_DB_POOL_TIMEOUT", "30"))
+SYNC_POOL_RETRY_INTERVAL = 0.02
+
+_pools: Dict[str, pooling.MySQLConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(database: str) -> pooling.MySQLConnectionPool:
+    pool = _pools.get(database)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(database)
+            if pool is None:
+                pool = pooling.MySQLConnectionPool(
+                    pool_name=f"sync_{database}"[:64],
+                    pool_size=SYNC_POOL_SIZE,
+                    pool_reset_session=True,
+                    host=os.getenv('DB_HOST'),
+                    user=os.getenv('DB_USER'),
+                    password=os.getenv('DB_PASSWORD'),
+                    port=int(os.getenv('DB_PORT', 3306)),
+                    database=database,
+                    ssl_disabled=True,
+                )
+                _pools[database] = pool
+    return pool
+
+
+# ----------------------------------------------------------
+# TRACING PROXIES
+# ----------------------------------------------------------
+class TracedCursor:
+    """mysql.connector cursor proxy that feeds /metrics and the slow-query log."""
+
+    def __init__(self, cursor, database: str, pending_writes: set):
+        self._cursor = cursor
+        self._database = database
+        self._pending_writes = pending_writes
+
+    def _observe(self, statement, params, elapsed):
+        note_write(self._pending_writes, statement)
+        stats = current_stats()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+        slow_log.record(statement, params, elapsed, source=f"sync:{self._database}", database=self._database)
+        profiling.record_sql(statement, elapsed, f"sync:{self._database}")
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._observe(operation, params, time.perf_counter() - start)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._observe(operation, seq_params, time.perf_counter() - start)
+
+    def callproc(self, procname, args=()):
+        # Procedures can write any table
+        self._pending_writes.add(ALL_TABLES)
+        return self._cursor.callproc(procname, args)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TracedConnection:
+    """Pooled connection proxy; close() hands the connection back to the pool."""
+
+    def __init__(self, conn, database: str):
+        self._conn = conn
+        self._database = database
+        self._pending_writes = set()
+
+    def cursor(self, *args, **kwargs):
+        return TracedCursor(self._conn.cursor(*args, **kwargs), self._database, self._pending_writes)
+
+    def commit(self):
+        self._conn.commit()
+        commit_writes(self._pending_writes)
+
+    def rollback(self):
+        self._pending_writes.clear()
+        return self._conn.rollback()
+
+    def close(self):
+        # Pool reset rolls back anything uncommitted
+        self._pending_writes.clear()
+        return self._conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+# ----------------------------------------------------------
+# PUBLIC ENTRY POINT
+# ----------------------------------------------------------
+def get_connection(database: Optional[str] = None, traced: bool = True):
+    """
+    Pooled mysql.connector connection for the sync report/legacy endpoints.
+    Waits up to SYNC_DB_POOL_TIMEOUT when every pooled connection is in use.
+    """
+    database = database or DB_NAME_FINANCE
+    pool = _get_pool(database)
+
+    start = time.perf_counter()
+    deadline = start + SYNC_POOL_TIMEOUT
+    while True:
+        try:
+            conn = pool.get_connection()
+            break
+        except errors.PoolError:
+            if time.perf_counter() >= deadline:
+                raise
+            time.sleep(SYNC_POOL_RETRY_INTERVAL)
+
+    stats = current_stats()
+    if stats is not None:
+        stats.pool_wait_seconds += time.perf_counter() - start
+
+    return TracedConnection(conn, database) if traced else conn
@@ -0,0 +1,7 @@
+-- Indexes supporting the AR book and AR aging reports (finance DB)
+-- The aging query filters by org/branch/date and joins DN/CN links on the trimmed invoice number.
+CREATE INDEX idx_ar_org_branch_date ON tbl_accounts_receivable (orgid, branchid, is_active, invoice_date, customer_id);
+CREATE INDEX idx_receipt_ag_ar_ar_date ON tbl_receipt_ag_ar (ar_id, is_active, receipt_date);
+CREATE INDEX idx_ar_receipt_unallocated ON tbl_ar_receipt (orgid, branchid, is_active, ar_id, receipt_date);
+CREATE INDEX idx_debit_invoice_note ON debit_invoice (DebitNoteId, InvoiceNo);
+CREATE INDEX idx_credit_invoice_note ON credit_invoice (CreditNoteId, InvoiceNo);
@@ -0,0 +1,27 @@
+-- Content-addressed attachment store (finance DB)
+-- Each distinct file is stored once on disk as <sha256><ext>; owning records
+-- (petty cash, procurement memo attachments) keep their own display name.
+--
+-- Blobs are written under the .NET content root, UploadedFiles/blobs/<aa>/,
+-- and memo rows store that content-root-relative path so the .NET
+-- download-file endpoint can open them. Blobs written earlier to
+-- Python/app/uploads/blobs are still served by the Python API only. To hand
+-- them to .NET as well, move the files into UploadedFiles/blobs and rewrite
+-- the paths (<legacy> = absolute path of Python/app/uploads/blobs,
+-- <store> = absolute path of UploadedFiles/blobs):
+--   UPDATE tbl_attachment_blob
+--      SET storage_path = REPLACE(storage_path, '<legacy>', '<store>');
+--   UPDATE tbl_purchasememo_Attachment
+--      SET AttachmentPath = REPLACE(AttachmentPath, '<legacy>', 'UploadedFiles/blobs')
+--    WHERE AttachmentPath LIKE '<legacy>%';
+CREATE TABLE IF NOT EXISTS tbl_attachment_blob (
+    attachment_id INT AUTO_INCREMENT PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL,
+    size_bytes BIGINT NOT NULL DEFAULT 0,
+    content_type VARCHAR(100),
+    original_name VARCHAR(255),
+    storage_path VARCHAR(500) NOT NULL,
+    created_by INT,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_attachment_blob_sha256 (sha256)
+);
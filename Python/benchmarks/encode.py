@@ -0,0 +1,111 @@
+"""
+Response encoding benchmark: FastAPI's default paths vs FastJSONResponse.
+
+Builds synthetic rows shaped like /pyapi/GetSalesDetails (Decimal amounts,
+strings) and times, per row count:
+
+  response_model   validate every row as SalesReportItem, dump, json.dumps
+                   (what FastAPI does for routes declaring response_model)
+  jsonable_encoder jsonable_encoder + json.dumps (routes returning plain dicts)
+  fast_json        FastJSONResponse.render (orjson when installed)
+
+    python benchmarks/encode.py --rows 1000,10000,50000 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.responses import FastJSONResponse, orjson  # noqa: E402
+from app.routers.invoice_api import SalesReportItem  # noqa: E402
+
+
+def make_rows(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        qty = Decimal(rnd.randint(1, 50))
+        price = Decimal(rnd.randint(1000, 500000)) / 100
+        rows.append({
+            "DetailId": i + 1,
+            "Salesinvoicesdate": f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+            "CustomerName": f"Customer {rnd.randint(1, 500)}",
+            "InvoiceCurrency": rnd.choice(["IDR", "USD", "SGD"]),
+            "InvoiceNo": f"INV-{i:07d}",
+            "DONumber": f"DO-{i:07d}",
+            "ItemName": rnd.choice(["Oxygen", "Nitrogen", "Argon", "CO2"]),
+            "Qty": qty,
+            "UnitPrice": price,
+            "OriginalTotal": qty * price,
+            "ConvertedTotal": qty * price * Decimal("1.0000"),
+        })
+    return rows
+
+
+_adapter = TypeAdapter(List[SalesReportItem])
+
+
+def encode_response_model(rows):
+    validated = _adapter.validate_python(rows)
+    return json.dumps(_adapter.dump_python(validated, mode="json"), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def encode_jsonable(rows):
+    return json.dumps(jsonable_encoder(rows), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+_fast = FastJSONResponse(content=None)
+
+
+def encode_fast(rows):
+    return _fast.render(rows)
+
+
+ENCODERS = {
+    "response_model": encode_response_model,
+    "jsonable_encoder": encode_jsonable,
+    "fast_json": encode_fast,
+}
+
+
+def time_encoder(fn, rows, repeat: int):
+    samples = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(fn(rows))
+        samples.append(time.perf_counter() - start)
+    return {"median_ms": round(statistics.median(samples) * 1000, 2), "min_ms": round(min(samples) * 1000, 2), "bytes": size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON encoding paths by row count.")
+    parser.add_argument("--rows", default="1000,10000,50000", help="comma separated row counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    result = {"orjson": orjson is not None, "runs": {}}
+    for n in [int(x) for x in args.rows.split(",") if x.strip()]:
+        rows = make_rows(n)
+        run = {name: time_encoder(fn, rows, args.repeat) for name, fn in ENCODERS.items()}
+        base = run["response_model"]["median_ms"]
+        for name in run:
+            run[name]["speedup_vs_response_model"] = round(base / run[name]["median_ms"], 1) if run[name]["median_ms"] else None
+        result["runs"][str(n)] = run
+        print(f"{n} rows: " + ", ".join(f"{k}={v['median_ms']}ms" for k, v in run.items()), file=sys.stderr)
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Repeatable load benchmark for the finance API.
+
+Drives the key endpoints against a running server (seeded with
+benchmarks/seed.py) and prints per-scenario latency percentiles and
+throughput as JSON, so runs can be compared before/after a change.
+
+    python benchmarks/run.py --base-url http://127.0.0.1:8000 --concurrency 8 --requests 200
+    python benchmarks/run.py --scenarios ar_book,bank_report --out before.json
+    python benchmarks/run.py --out after.json --compare before.json
+
+Write scenarios (verify, create_invoice) change data; re-seed with --clean between runs.
+Only the standard library is used so it runs from any checkout.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+MANIFEST_PATH = Path(__file__).parent / "manifest.json"
+
+
+# ----------------------------------------------------------
+# SCENARIOS
+# ----------------------------------------------------------
+class Context:
+    """Shared state for request builders (manifest ids, counters for write scenarios)."""
+
+    def __init__(self, manifest: dict, args):
+        self.manifest = manifest
+        self.org_id = manifest.get("org_id", 1)
+        self.branch_id = manifest.get("branch_id", 1)
+        self.customers = manifest.get("customer_ids") or [0]
+        dr = manifest.get("date_range") or {}
+        self.from_date = dr.get("from", str(date.today() - timedelta(days=365)))
+        self.to_date = dr.get("to", str(date.today()))
+        self.pending = list(manifest.get("pending_receipts") or [])
+        self._pending_lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self.run_tag = datetime.now().strftime("%Y%m%d%H%M%S")
+        self.username = args.username or os.getenv("BENCH_USERNAME")
+        self.password = args.password or os.getenv("BENCH_PASSWORD")
+
+    def next_pending(self):
+        with self._pending_lock:
+            return self.pending.pop() if self.pending else None
+
+
+def ar_book(ctx, rnd):
+    return "GET", f"/AR/getARBook?orgid={ctx.org_id}&branchid={ctx.branch_id}&customer_id=0&from_date={ctx.from_date}&to_date={ctx.to_date}", None
+
+
+def ar_book_customer(ctx, rnd):
+    cust = rnd.choice(ctx.customers)
+    return "GET", f"/AR/getARBook?orgid={ctx.org_id}&branchid={ctx.branch_id}&customer_id={cust}&from_date={ctx.from_date}&to_date={ctx.to_date}", None
+
+
+def bank_report(ctx, rnd):
+    return "GET", f"/AR/get-report?from_date={ctx.from_date}&to_date={ctx.to_date}&bank_id=0", None
+
+
+def cash_report(ctx, rnd):
+    return "GET", f"/AR/cash/get-report?from_date={ctx.from_date}&to_date={ctx.to_date}&bank_id=0", None
+
+
+def get_all_invoices(ctx, rnd):
+    body = {"customerid": 0, "FromDate": ctx.from_date, "ToDate": ctx.to_date, "BranchId": ctx.branch_id, "IsAR": 1}
+    return "POST", "/pyapi/GetALLInvoices", body
+
+
+def verify(ctx, rnd):
+    item = ctx.next_pending()
+    if item is None:
+        return None  # pool of seeded pending receipts is used up
+    body = {
+        "customer_id": item["customer_id"],
+        "bank_charges": 0,
+        "tax_deduction": 0,
+        "exchange_rate": 1.0,
+        "allocations": [{"invoice_id": item["invoice_id"], "amount_allocated": item["amount"]}],
+        "user_id": 1,
+    }
+    return "PUT", f"/AR/verify/{item['receipt_id']}", body
+
+
+def create_invoice(ctx, rnd):
+    nbr = f"BENCH-RUN-{ctx.run_tag}-{next(ctx._seq):06d}"
+    details = [
+        {"gasCodeId": rnd.randint(1, 30), "pickedQty": rnd.randint(1, 20), "UnitPrice": rnd.randint(10, 200) * 1000, "CurrencyId": 1, "UomId": 1}
+        for _ in range(rnd.randint(1, 4))
+    ]
+    body = {
+        "header": {
+            "customerId": rnd.choice(ctx.customers), "salesInvoiceDate": ctx.to_date, "salesInvoiceNbr": nbr,
+            "userId": 1, "orgId": ctx.org_id, "branchId": ctx.branch_id, "isSubmitted": 0, "ismanual": 1,
+        },
+        "details": details,
+    }
+    return "POST", "/pyapi/CreateInvoice", body
+
+
+def login(ctx, rnd):
+    if not ctx.username:
+        return None
+    return "POST", "/api/Authenticate/login", {"Username": ctx.username, "Password": ctx.password or ""}
+
+
+SCENARIOS = {
+    "ar_book": ar_book,
+    "ar_book_customer": ar_book_customer,
+    "bank_report": bank_report,
+    "cash_report": cash_report,
+    "get_all_invoices": get_all_invoices,
+    "verify": verify,
+    "create_invoice": create_invoice,
+    "login": login,
+}
+
+
+# ----------------------------------------------------------
+# RUNNER
+# ----------------------------------------------------------
+def send(base_url: str, method: str, path: str, body, timeout: float):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method)
+    req.add_header("Accept-Encoding", "identity")
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            size = len(resp.read())
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        size = len(e.read() or b"")
+        status = e.code
+    except Exception:
+        size, status = 0, 0
+    return time.perf_counter() - start, status, size
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def run_scenario(name, builder, ctx, args):
+    rnd = random.Random(args.seed)
+    requests_ = []
+    for _ in range(args.requests):
+        spec = builder(ctx, rnd)
+        if spec is None:
+            break
+        requests_.append(spec)
+    if not requests_:
+        return {"skipped": True, "reason": "no input available (manifest/credentials)"}
+
+    # Warm-up is not measured (connection pools, caches, JIT of query plans)
+    for method, path, body in requests_[:args.warmup]:
+        send(args.base_url, method, path, body, args.timeout)
+    measured = requests_[args.warmup:] or requests_
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda spec: send(args.base_url, *spec, args.timeout), measured))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    statuses = {}
+    for _, status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(n for s, n in statuses.items() if not s.startswith("2") and s != "304")
+
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "status_counts": statuses,
+        "throughput_rps": round(len(results) / wall, 2) if wall else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "mean": round(statistics.fmean(latencies), 2),
+            "max": round(latencies[-1], 2),
+        },
+        "avg_response_bytes": round(sum(r[2] for r in results) / len(results)),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def compare(current: dict, previous: dict):
+    """p50/p95/p99 and throughput change in percent vs a previous result file."""
+    out = {}
+    for name, cur in current["scenarios"].items():
+        prev = previous.get("scenarios", {}).get(name)
+        if not prev or cur.get("skipped") or prev.get("skipped"):
+            continue
+        delta = {}
+        for p in ("p50", "p95", "p99"):
+            a, b = prev["latency_ms"][p], cur["latency_ms"][p]
+            delta[f"{p}_pct"] = round((b - a) * 100 / a, 1) if a else None
+        a, b = prev["throughput_rps"], cur["throughput_rps"]
+        delta["throughput_pct"] = round((b - a) * 100 / a, 1) if a else None
+        out[name] = delta
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the finance API.")
+    parser.add_argument("--base-url", default=os.getenv("BENCH_BASE_URL", "http://127.0.0.1:8000"))
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated: " + ",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario (after warm-up)")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--manifest", default=str(MANIFEST_PATH))
+    parser.add_argument("--username", help="login scenario user (or BENCH_USERNAME)")
+    parser.add_argument("--password", help="login scenario password (or BENCH_PASSWORD)")
+    parser.add_argument("--out", help="write the JSON result to this file")
+    parser.add_argument("--compare", help="previous result file to diff against")
+    args = parser.parse_args()
+    args.requests += args.warmup
+
+    manifest = {}
+    if Path(args.manifest).exists():
+        manifest = json.loads(Path(args.manifest).read_text())
+    ctx = Context(manifest, args)
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenario(s): {', '.join(unknown)}")
+
+    result = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "base_url": args.base_url,
+            "git_revision": git_revision(),
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests - args.warmup,
+            "dataset": {"scale": manifest.get("scale"), "counts": manifest.get("counts")},
+        },
+        "scenarios": {},
+    }
+    for name in names:
+        result["scenarios"][name] = run_scenario(name, SCENARIOS[name], ctx, args)
+        print(f"{name}: {json.dumps(result['scenarios'][name].get('latency_ms', result['scenarios'][name]))}", file=sys.stderr)
+
+    if args.compare:
+        result["compare"] = compare(result, json.loads(Path(args.compare).read_text()))
+
+    text = json.dumps(result, indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Synthetic data generator for local performance testing.
+
+Fills the finance / userpanel schemas of a LOCAL MySQL/MariaDB copy with
+customers, sales invoices (+details), AR rows, receipts and allocations,
+debit/credit notes, petty cash and claims. All generated rows use primary
+keys from --id-base upwards so they can be removed again with --clean.
+
+    python benchmarks/seed.py --scale 1          # ~200 customers, 5k invoices
+    python benchmarks/seed.py --scale 10 --clean
+    python benchmarks/seed.py --clean-only
+
+Writes benchmarks/manifest.json (ids the benchmark runner needs).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import mysql.connector
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_NAME_FINANCE = os.getenv('DB_NAME_FINANCE', 'btggasify_finance_live')
+DB_NAME_USER = os.getenv('DB_NAME_USER', 'btggasify_live')
+DB_NAME_USER_NEW = os.getenv('DB_NAME_USER_NEW', 'btggasify_userpanel_live')
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "mysql", "mariadb", "db"}
+MANIFEST_PATH = Path(__file__).parent / "manifest.json"
+BATCH_SIZE = 1000
+
+# Row counts at --scale 1
+BASE_COUNTS = {
+    "customers": 200,
+    "invoices": 5000,
+    "unallocated_receipts": 300,
+    "debit_notes": 200,
+    "credit_notes": 200,
+    "petty_cash": 1000,
+    "claims": 300,
+}
+PENDING_VERIFICATION_SHARE = 0.05
+POSTED_SHARE = 0.6
+PAID_SHARE = 0.7
+
+# Primary key ranges per table, offset from --id-base
+ID_SLOTS = {
+    "customer": 0,
+    "invoice": 1,
+    "invoice_detail": 2,
+    "ar": 3,
+    "receipt": 4,
+    "debit_note": 5,
+    "credit_note": 6,
+    "petty_cash": 7,
+    "claim": 8,
+}
+SLOT_WIDTH = 10_000_000
+
+
+def ids_for(base: int, kind: str) -> int:
+    return base + ID_SLOTS[kind] * SLOT_WIDTH
+
+
+# ----------------------------------------------------------
+# DB HELPERS
+# ----------------------------------------------------------
+def connect():
+    return mysql.connector.connect(
+        host=os.getenv('DB_HOST'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD'),
+        port=int(os.getenv('DB_PORT', 3306)),
+        database=DB_NAME_FINANCE,
+        ssl_disabled=True,
+        autocommit=False,
+    )
+
+
+def insert_rows(cursor, table: str, columns, rows):
+    if not rows:
+        return
+    placeholders = ", ".join(["%s"] * len(columns))
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    for i in range(0, len(rows), BATCH_SIZE):
+        cursor.executemany(sql, rows[i:i + BATCH_SIZE])
+
+
+def clean(cursor, base: int):
+    """Deletes everything a previous run generated (by primary key range)."""
+    def rng(kind):
+        start = ids_for(base, kind)
+        return start, start + SLOT_WIDTH - 1
+
+    statements = [
+        (f"DELETE FROM {DB_NAME_FINANCE}.tbl_receipt_ag_ar WHERE receipt_id BETWEEN %s AND %s", rng("receipt")),
+        (f"DELETE FROM {DB_NAME_FINANCE}.tbl_ar_receipt WHERE receipt_id BETWEEN %s AND %s", rng("receipt")),
+        (f"DELETE FROM {DB_NAME_FINANCE}.tbl_accounts_receivable WHERE ar_id BETWEEN %s AND %s", rng("ar")),
+        (f"DELETE FROM {DB_NAME_FINANCE}.debit_invoice WHERE DebitNoteId BETWEEN %s AND %s", rng("debit_note")),
+        (f"DELETE FROM {DB_NAME_FINANCE}.Debit_Notes WHERE DebitNoteId BETWEEN %s AND %s", rng("debit_note")),
+        (f"DELETE FROM {DB_NAME_FINANCE}.credit_invoice WHERE CreditNoteId BETWEEN %s AND %s", rng("credit_note")),
+        (f"DELETE FROM {DB_NAME_FINANCE}.Credit_Notes WHERE CreditNoteId BETWEEN %s AND %s", rng("credit_note")),
+        (f"DELETE FROM {DB_NAME_FINANCE}.tbl_petty_cash WHERE PettyCashId BETWEEN %s AND %s", rng("petty_cash")),
+        (f"DELETE FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_details WHERE id BETWEEN %s AND %s", rng("invoice_detail")),
+        (f"DELETE FROM {DB_NAME_USER_NEW}.tbl_salesinvoices_header WHERE id BETWEEN %s AND %s", rng("invoice")),
+        (f"DELETE FROM {DB_NAME_USER_NEW}.tbl_claim_header WHERE id BETWEEN %s AND %s", rng("claim")),
+        (f"DELETE FROM {DB_NAME_USER_NEW}.master_customer WHERE Id BETWEEN %s AND %s", rng("customer")),
+    ]
+    if DB_NAME_USER != DB_NAME_USER_NEW:
+        statements.append((f"DELETE FROM {DB_NAME_USER}.master_customer WHERE Id BETWEEN %s AND %s", rng("customer")))
+    for sql, params in statements:
+        cursor.execute(sql, params)
+
+
+# ----------------------------------------------------------
+# GENERATORS
+# ----------------------------------------------------------
+def rand_date(rnd: random.Random, days_back: int = 365) -> date:
+    return date.today() - timedelta(days=rnd.randint(0, days_back))
+
+
+def rand_amount(rnd: random.Random, median: float = 2_500_000) -> float:
+    # Right-skewed like real invoice values: most small, a few very large
+    return round(rnd.lognormvariate(0, 1.0) * median, 2)
+
+
+def seed(cursor, args):
+    rnd = random.Random(args.seed)
+    scale = args.scale
+    counts = {k: max(1, int(v * scale)) for k, v in BASE_COUNTS.items()}
+    org, branch, user = args.org_id, args.branch_id, args.user_id
+    base = args.id_base
+    manifest = {"scale": scale, "org_id": org, "branch_id": branch, "id_base": base, "seed": args.seed}
+
+    # 1. Customers
+    cust_start = ids_for(base, "customer")
+    customers = [(cust_start + i, f"BENCH Customer {i:05d}", 1, rnd.randint(1, 10)) for i in range(counts["customers"])]
+    cust_cols = ("Id", "CustomerName", "IsActive", "SalesPersonId")
+    insert_rows(cursor, f"{DB_NAME_USER_NEW}.master_customer", cust_cols, customers)
+    if DB_NAME_USER != DB_NAME_USER_NEW:
+        insert_rows(cursor, f"{DB_NAME_USER}.master_customer", cust_cols, customers)
+    customer_names = {c[0]: c[1] for c in customers}
+    # A few large customers own most of the invoices (as in production)
+    weights = [1.0 / (i + 1) ** 0.8 for i in range(len(customers))]
+
+    # 2. Sales invoices, details and AR rows
+    inv_start, det_start, ar_start = ids_for(base, "invoice"), ids_for(base, "invoice_detail"), ids_for(base, "ar")
+    headers, details, ar_rows = [], [], []
+    det_id = det_start
+    for i in range(counts["invoices"]):
+        inv_id = inv_start + i
+        cust_id = rnd.choices(customers, weights=weights)[0][0]
+        inv_date = rand_date(rnd)
+        currency_id = 1 if rnd.random() < 0.85 else rnd.choice((2, 3))
+        rate = 1.0 if currency_id == 1 else rnd.choice((15500.0, 16800.0))
+        posted = rnd.random() < POSTED_SHARE
+        nbr = f"BENCH-{base}-{i:07d}"
+
+        total = 0.0
+        for _ in range(rnd.randint(1, 4)):
+            qty = rnd.randint(1, 40)
+            price = round(rand_amount(rnd, 60_000 if currency_id == 1 else 4), 2)
+            line = round(qty * price, 2)
+            total += line
+            details.append((
+                det_id, inv_id, rnd.randint(1, 30), qty, price, line, round(line * rate, 2),
+                currency_id, rate, 1, f"DO-{i:07d}", f"PO-{i:07d}", "", "", ""
+            ))
+            det_id += 1
+        total = round(total, 2)
+        headers.append((inv_id, nbr, cust_id, inv_date, total, 1 if posted else 0, round(total * rate, 2), user, org, branch, 1, 1))
+
+        if posted:
+            ar_rows.append([
+                ar_start + i, org, branch, f"AR-{nbr}", nbr, inv_id, inv_date, cust_id, customer_names[cust_id],
+                total, total, 0.0, round(total * rate, 2), currency_id, user, "127.0.0.1", 1, 0
+            ])
+
+    insert_rows(cursor, f"{DB_NAME_USER_NEW}.tbl_salesinvoices_header",
+                ("id", "salesinvoicenbr", "customerid", "Salesinvoicesdate", "TotalAmount", "IsSubmitted",
+                 "CalculatedPrice", "createdby", "OrgId", "BranchId", "IsManual", "isactive"), headers)
+    insert_rows(cursor, f"{DB_NAME_USER_NEW}.tbl_salesinvoices_details",
+                ("id", "salesinvoicesheaderid", "gascodeid", "PickedQty", "UnitPrice", "TotalPrice", "Price",
+                 "Currencyid", "ExchangeRate", "uomid", "DOnumber", "PONumber", "DriverName", "TruckName", "DeliveryAddress"), details)
+
+    # 3. Receipts and allocations against posted invoices
+    rec_start = ids_for(base, "receipt")
+    receipts, allocations, pending_ids = [], [], []
+    rec_id = rec_start
+    for ar in ar_rows:
+        if rnd.random() >= PAID_SHARE:
+            continue
+        ar_id, inv_date, cust_id, total, currency_id = ar[0], ar[6], ar[7], ar[9], ar[13]
+        paid = total if rnd.random() < 0.75 else round(total * rnd.uniform(0.2, 0.9), 2)
+        rec_date = min(inv_date + timedelta(days=rnd.randint(0, 120)), date.today())
+        via_bank = rnd.random() < 0.7
+        pending = rnd.random() < PENDING_VERIFICATION_SHARE
+        receipts.append((
+            rec_id, None if pending else ar_id, rec_date, cust_id,
+            0.0 if via_bank else paid, paid if via_bank else 0.0, 0.0, 0.0,
+            f"REF-{rec_id}", str(rnd.randint(1, 3)) if via_bank else None,
+            1 if pending else 0, 0 if pending else 1, 1, currency_id, org, branch, 1, str(user), "127.0.0.1"
+        ))
+        if pending:
+            pending_ids.append({"receipt_id": rec_id, "customer_id": cust_id, "invoice_id": ar[5], "amount": paid})
+        else:
+            allocations.append((rec_id, ar_id, paid, rec_date, str(user), "127.0.0.1", 1))
+            ar[11] = paid
+            ar[10] = round(total - paid, 2)
+            ar[17] = 1 if paid < total else 0
+        rec_id += 1
+
+    for _ in range(counts["unallocated_receipts"]):
+        amount = rand_amount(rnd)
+        receipts.append((
+            rec_id, None, rand_date(rnd), rnd.choice(customers)[0], 0.0, amount, 0.0, 0.0,
+            f"REF-{rec_id}", str(rnd.randint(1, 3)), 0, 1, 1, 1, org, branch, 1, str(user), "127.0.0.1"
+        ))
+        rec_id += 1
+
+    insert_rows(cursor, f"{DB_NAME_FINANCE}.tbl_accounts_receivable",
+                ("ar_id", "orgid", "branchid", "ar_no", "invoice_no", "invoice_id", "invoice_date", "customer_id", "customer_name",
+                 "inv_amount", "balance_amount", "already_received", "invoice_amt_idr", "currencyid",
+                 "created_by", "created_ip", "is_active", "is_partial"), [tuple(r) for r in ar_rows])
+    insert_rows(cursor, f"{DB_NAME_FINANCE}.tbl_ar_receipt",
+                ("receipt_id", "ar_id", "receipt_date", "customer_id", "cash_amount", "bank_amount", "contra_amount", "bank_charges",
+                 "reference_no", "deposit_bank_id", "pending_verification", "is_posted", "is_submitted", "currencyid",
+                 "orgid", "branchid", "is_active", "created_by", "created_ip"), receipts)
+    insert_rows(cursor, f"{DB_NAME_FINANCE}.tbl_receipt_ag_ar",
+                ("receipt_id", "ar_id", "payment_amount", "receipt_date", "created_by", "created_ip", "is_active"), allocations)
+
+    # 4. Debit / credit notes, half of them linked to a posted invoice
+    def notes(kind, prefix, count):
+        start = ids_for(base, kind)
+        rows, links = [], []
+        for i in range(count):
+            note_id = start + i
+            linked = ar_rows and rnd.random() < 0.5
+            ar = rnd.choice(ar_rows) if linked else None
+            cust_id = ar[7] if ar else rnd.choice(customers)[0]
+            rows.append((note_id, f"{prefix}-{note_id}", rand_date(rnd), rand_amount(rnd, 400_000), "BENCH", cust_id, 1, 1))
+            if ar:
+                links.append((note_id, ar[4]))
+        return rows, links
+
+    dn_rows, dn_links = notes("debit_note", "DN", counts["debit_notes"])
+    cn_rows, cn_links = notes("credit_note", "CN", counts["credit_notes"])
+    insert_rows(cursor, f"{DB_NAME_FINANCE}.Debit_Notes",
+                ("DebitNoteId", "DebitNoteNumber", "TransactionDate", "Amount", "Description", "CustomerId", "CurrencyId", "IsSubmitted"), dn_rows)
+    insert_rows(cursor, f"{DB_NAME_FINANCE}.debit_invoice", ("DebitNoteId", "InvoiceNo"), dn_links)
+    insert_rows(cursor, f"{DB_NAME_FINANCE}.Credit_Notes",
+                ("CreditNoteId", "CreditNoteNumber", "TransactionDate", "Amount", "Description", "CustomerId", "CurrencyId", "IsSubmitted"), cn_rows)
+    insert_rows(cursor, f"{DB_NAME_FINANCE}.credit_invoice", ("CreditNoteId", "InvoiceNo"), cn_links)
+
+    # 5. Petty cash and claims
+    pc_start = ids_for(base, "petty_cash")
+    petty = []
+    for i in range(counts["petty_cash"]):
+        amount = rand_amount(rnd, 150_000)
+        petty.append((pc_start + i, f"PC-{pc_start + i}", str(pc_start + i), rand_date(rnd), rnd.randint(1, 8), rnd.randint(1, 20),
+                      "BENCH expense", amount, amount, rnd.random() < 0.8, org, branch, "BENCH", "Vendor", 1, 1.0, user))
+    insert_rows(cursor, f"{DB_NAME_FINANCE}.tbl_petty_cash",
+                ("PettyCashId", "pc_number", "VoucherNo", "ExpDate", "category_id", "expense_type_id", "ExpenseDescription",
+                 "AmountIDR", "Amount", "IsSubmitted", "OrgId", "BranchId", "Who", "Whom", "currencyid", "exchangeRate", "CreatedBy"), petty)
+
+    claim_start = ids_for(base, "claim")
+    claims = [(claim_start + i, f"SPC-BENCH-{i}", rand_date(rnd), org, branch, user, rnd.choice(("Draft", "Submitted", "Approved")), 1)
+              for i in range(counts["claims"])]
+    insert_rows(cursor, f"{DB_NAME_USER_NEW}.tbl_claim_header",
+                ("id", "ClaimNo", "ClaimDate", "OrgId", "BranchId", "CreatedBy", "Status", "IsActive"), claims)
+
+    manifest.update({
+        "counts": {
+            "customers": len(customers), "invoices": len(headers), "invoice_details": len(details), "ar_rows": len(ar_rows),
+            "receipts": len(receipts), "allocations": len(allocations), "debit_notes": len(dn_rows), "credit_notes": len(cn_rows),
+            "petty_cash": len(petty), "claims": len(claims),
+        },
+        "customer_ids": [c[0] for c in customers],
+        "pending_receipts": pending_ids,
+        "date_range": {"from": str(date.today() - timedelta(days=365)), "to": str(date.today())},
+    })
+    return manifest
+
+
+# ----------------------------------------------------------
+# CLI
+# ----------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Seed a local finance database with synthetic data.")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the base row counts")
+    parser.add_argument("--seed", type=int, default=42, help="random seed (same seed + scale = same data)")
+    parser.add_argument("--org-id", type=int, default=1)
+    parser.add_argument("--branch-id", type=int, default=1)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--id-base", type=int, default=900_000_000, help="first primary key used for generated rows")
+    parser.add_argument("--clean", action="store_true", help="remove previously generated rows first")
+    parser.add_argument("--clean-only", action="store_true", help="remove generated rows and exit")
+    parser.add_argument("--allow-remote", action="store_true", help="allow a DB_HOST that is not local")
+    args = parser.parse_args()
+
+    host = (os.getenv("DB_HOST") or "").lower()
+    if host not in LOCAL_HOSTS and not args.allow_remote:
+        sys.exit(f"Refusing to seed DB_HOST={host!r}: point .env at a local database or pass --allow-remote")
+
+    conn = connect()
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    try:
+        if args.clean or args.clean_only:
+            clean(cursor, args.id_base)
+            conn.commit()
+            print(f"Removed generated rows (id base {args.id_base})")
+            if args.clean_only:
+                return
+
+        manifest = seed(cursor, args)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2))
+    print(json.dumps({"counts": manifest["counts"], "seconds": round(time.perf_counter() - started, 1), "manifest": str(MANIFEST_PATH)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
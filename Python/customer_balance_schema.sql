@@ -0,0 +1,23 @@
+-- Customer balance read model (finance DB)
+-- One row per customer per org/branch, in IDR. Maintained by app/customer_balance.refresh(),
+-- called right after AR receipts, receipt verification, invoice posting and DN/CN saves commit.
+-- Unlinked DN/CN go to the customer's first org/branch only. Without this table the refresh
+-- disables itself (or set CUSTOMER_BALANCE_ENABLED=0); writes do not depend on it.
+-- Backfill / repair: POST /admin/customer-balance/verify?repair=true
+CREATE TABLE IF NOT EXISTS tbl_customer_balance (
+    orgid INT NOT NULL,
+    branchid INT NOT NULL,
+    customer_id INT NOT NULL,
+    invoice_outstanding DECIMAL(18, 2) NOT NULL DEFAULT 0.00,
+    unapplied_credits DECIMAL(18, 2) NOT NULL DEFAULT 0.00,
+    total_outstanding DECIMAL(18, 2) NOT NULL DEFAULT 0.00,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY (orgid, branchid, customer_id),
+    KEY idx_customer_balance_customer (customer_id)
+);
+
+-- The per-customer source recompute filters these by customer
+CREATE INDEX idx_ar_customer ON tbl_accounts_receivable (customer_id, is_active);
+CREATE INDEX idx_ar_receipt_customer ON tbl_ar_receipt (customer_id, is_active, ar_id);
+CREATE INDEX idx_debit_notes_customer ON Debit_Notes (CustomerId, IsSubmitted);
+CREATE INDEX idx_credit_notes_customer ON Credit_Notes (CustomerId, IsSubmitted);
@@ -0,0 +1,118 @@
+import asyncio
+import re
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app import crud, customer_balance
+from app.models.finance import ARReceipt
+
+sqlite3.register_adapter(Decimal, str)
+
+FINANCE_SCHEMA = {
+    crud.DB_NAME_FINANCE: [
+        "CREATE TABLE tbl_accounts_receivable (ar_id INTEGER PRIMARY KEY, orgid, branchid, ar_no, invoice_no,"
+        " invoice_id, invoice_date, customer_id, customer_name, inv_amount, balance_amount, already_received DEFAULT 0,"
+        " invoice_amt_idr, currencyid, created_by, created_ip, created_date, updated_by, updated_date,"
+        " is_active DEFAULT 1, is_partial DEFAULT 0)",
+        "CREATE TABLE tbl_receipt_ag_ar (receipt_id, ar_id, payment_amount, receipt_date, created_date,"
+        " created_by, created_ip, is_active)",
+    ],
+    crud.DB_NAME_USER_NEW: [
+        "CREATE TABLE tbl_salesinvoices_header (id INTEGER PRIMARY KEY, salesinvoicenbr, Salesinvoicesdate,"
+        " customerid, TotalAmount, CalculatedPrice, PaidAmount, isactive DEFAULT 1, IsAR DEFAULT 0)",
+        "CREATE TABLE tbl_salesinvoices_details (salesinvoicesheaderid, DOnumber, Currencyid)",
+        "CREATE TABLE master_customer (Id INTEGER PRIMARY KEY, CustomerName)",
+    ],
+}
+
+# MySQL multi-table UPDATE: UPDATE t a [INNER|LEFT] JOIN <table or (subquery)> b ON ... SET ... WHERE ...
+_UPDATE_JOIN_RE = re.compile(
+    r"^\s*UPDATE\s+(\S+)\s+(\w+)\s+(?:INNER\s+|LEFT\s+)?JOIN\s+(.*?)\s+(\w+)\s+ON\s+(.*?)\s+SET\s+(.*?)\s+WHERE\s+(.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _sqlite_statement(statement: str) -> str:
+    """Rewrites MySQL UPDATE ... JOIN into sqlite's UPDATE ... FROM (inner-join semantics)."""
+    match = _UPDATE_JOIN_RE.match(statement)
+    if not match:
+        return statement
+    target, alias, joined, joined_alias, on, assignments, where = match.groups()
+    # sqlite does not accept qualified column names on the left of SET
+    assignments = re.sub(rf"\b{alias}\.(\w+)\s*=", r"\1 =", assignments)
+    return f"UPDATE {target} AS {alias} SET {assignments} FROM {joined} AS {joined_alias} WHERE ({on}) AND ({where})"
+
+
+@pytest.fixture
+def run():
+    return asyncio.run
+
+
+@pytest.fixture
+def refreshed(monkeypatch):
+    """Customer ids passed to customer_balance.refresh (which would open the live engine)."""
+    calls = []
+
+    async def refresh(customer_ids):
+        calls.append(set(customer_ids))
+
+    monkeypatch.setattr(customer_balance, "refresh", refresh)
+    return calls
+
+
+@pytest.fixture
+def finance_db(run):
+    """AsyncSession factory over in-memory sqlite with the finance and user-panel databases attached."""
+    # Named parameters so a rewritten statement can reorder its clauses
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool, paramstyle="named")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function("NOW", 0, lambda: datetime.now().isoformat(sep=" "))
+        dbapi_connection.create_function("CONCAT", -1, lambda *parts: "".join(str(p) for p in parts))
+        cursor = dbapi_connection.cursor()
+        for name in FINANCE_SCHEMA:
+            cursor.execute(f"ATTACH DATABASE ':memory:' AS {name}")
+        cursor.close()
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute", retval=True)
+    def _rewrite(conn, cursor, statement, parameters, context, executemany):
+        return _sqlite_statement(statement), parameters
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(ARReceipt.__table__.create)
+            for name, statements in FINANCE_SCHEMA.items():
+                for statement in statements:
+                    await conn.execute(text(statement.replace("CREATE TABLE ", f"CREATE TABLE {name}.", 1)))
+
+    run(setup())
+
+    def session():
+        return AsyncSession(engine, expire_on_commit=False)
+
+    yield session
+    run(engine.dispose())
+
+
+@pytest.fixture
+def sql(run, finance_db):
+    """Runs raw SQL in its own committed session; returns the rows as tuples."""
+
+    def execute(statement, params=None):
+        async def go():
+            async with finance_db() as db:
+                result = await db.execute(text(statement), params or {})
+                rows = result.fetchall() if result.returns_rows else None
+                await db.commit()
+                return [tuple(row) for row in rows] if rows is not None else None
+
+        return run(go())
+
+    return execute
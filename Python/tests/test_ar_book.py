@@ -0,0 +1,130 @@
+import re
+import sqlite3
+
+import pytest
+
+from app.routers import finance
+
+
+SCHEMA = {
+    finance.DB_NAME_FINANCE: [
+        "CREATE TABLE tbl_accounts_receivable (ar_id INTEGER PRIMARY KEY, orgid, branchid, customer_id, is_active,"
+        " invoice_date, inv_amount, already_received, invoice_amt_idr, balance_amount, currencyid, ar_no, invoice_no, invoice_id)",
+        "CREATE TABLE tbl_ar_receipt (receipt_id INTEGER PRIMARY KEY, orgid, branchid, customer_id, is_active, ar_id,"
+        " receipt_date, receipt_no, reference_no, cash_amount, bank_amount, deposit_bank_id, currencyid)",
+        "CREATE TABLE tbl_receipt_ag_ar (receipt_id, ar_id, payment_amount)",
+        "CREATE TABLE Debit_Notes (DebitNoteId INTEGER PRIMARY KEY, CustomerId, DebitNoteNumber, TransactionDate,"
+        " Amount, IsSubmitted, Description, CurrencyId)",
+        "CREATE TABLE Credit_Notes (CreditNoteId INTEGER PRIMARY KEY, CustomerId, CreditNoteNumber, TransactionDate,"
+        " Amount, IsSubmitted, Description, CurrencyId)",
+        "CREATE TABLE debit_invoice (DebitNoteId, InvoiceNo)",
+        "CREATE TABLE credit_invoice (CreditNoteId, InvoiceNo)",
+    ],
+    finance.DB_NAME_USER_NEW: ["CREATE TABLE master_customer (Id INTEGER PRIMARY KEY, CustomerName)"],
+    finance.DB_NAME_OLD: ["CREATE TABLE master_currency (CurrencyId INTEGER PRIMARY KEY, CurrencyCode, ExchangeRate)"],
+}
+
+ROWS = [
+    # Names that sort differently by collation (case-insensitive) and by code point
+    "INSERT INTO master_customer VALUES (1, 'alpha'), (2, 'Bravo'), (3, 'Émile'), (4, 'bravo'), (5, 'Zulu')",
+    "INSERT INTO master_currency VALUES (1, 'IDR', 1), (2, 'USD', 15000)",
+    "INSERT INTO tbl_accounts_receivable VALUES"
+    " (1, 1, 1, 1, 1, '2026-01-05 10:30:00', 100, 40, 100, 60, 1, 'AR-2', 'INV-2', 12),"
+    " (2, 1, 1, 1, 1, '2026-01-05', 50, 0, 50, 50, 1, 'AR-1', 'INV-1', 11),"
+    " (3, 1, 1, 2, 1, '2026-01-03', 70, 70, 70, 0, 2, 'AR-3', 'INV-3', 13),"
+    " (4, 1, 1, 4, 1, '2026-01-02', 30, 0, 30, 30, 1, 'AR-4', 'INV-4', 14),"
+    " (5, 1, 1, 3, 1, '2026-01-01', 20, 0, 20, 20, 1, 'AR-5', 'INV-5', 15),"
+    " (6, 1, 2, 5, 1, '2026-01-01', 99, 0, 99, 99, 1, 'AR-6', 'INV-6', 16)",
+    "INSERT INTO tbl_ar_receipt VALUES"
+    " (1, 1, 1, 1, 1, 1, '2026-01-05', 'RC-1', 'REF-1', 0, 40, '7', 1),"
+    " (2, 1, 1, 2, 1, 3, '2026-01-04', 'RC-2', 'REF-2', 70, 0, '0', 2),"
+    " (3, 1, 1, 5, 1, NULL, '2026-01-06', 'RC-3', NULL, 10, 0, '0', NULL),"
+    " (4, 1, 1, 1, 1, NULL, '2026-01-05', 'RC-4', 'AR-2', 5, 0, NULL, 1)",
+    "INSERT INTO tbl_receipt_ag_ar VALUES (1, 1, 40), (2, 3, 70)",
+    "INSERT INTO Debit_Notes VALUES (1, 1, 'DN-1', '2026-01-05', 12.5, 1, 'fuel', 1), (2, 4, 'DN-2', '2026-01-02', 3, 1, 'fee', 1),"
+    " (3, 1, 'DN-3', '2026-01-05', 8, 1, 'linked', 1)",
+    "INSERT INTO debit_invoice VALUES (3, 'INV-1 ')",
+    "INSERT INTO Credit_Notes VALUES (1, 3, 'CN-1', '2026-01-01', 4, 1, 'rebate', 1)",
+]
+
+
+class _Cursor:
+    """Dictionary cursor over sqlite that accepts the mysql-connector %(name)s params."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._rows = []
+
+    def execute(self, query, params=None):
+        self._rows = self._conn.execute(re.sub(r"%\((\w+)\)s", r":\1", query), params or {}).fetchall()
+
+    def fetchall(self):
+        return [dict(row) for row in self._rows]
+
+    def close(self):
+        pass
+
+
+class _Connection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, dictionary=False):
+        return _Cursor(self._conn)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def ar_book_db(monkeypatch):
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    # Stand-in for a case-insensitive collation's weight string
+    conn.create_function("WEIGHT_STRING", 1, lambda s: None if s is None else str(s).casefold().encode())
+    for database, statements in SCHEMA.items():
+        conn.execute(f"ATTACH ':memory:' AS {database}")
+        for statement in statements:
+            conn.execute(statement.replace("CREATE TABLE ", f"CREATE TABLE {database}.", 1))
+    for statement in ROWS:
+        conn.execute(statement)
+
+    monkeypatch.setattr(finance, "get_db_connection_sync", lambda: _Connection(conn))
+    monkeypatch.setattr(
+        finance, "gather_reads_sync",
+        lambda database, *queries, **kwargs: [query(_Cursor(conn)) for query in queries],
+    )
+    yield conn
+    conn.close()
+
+
+def _fetch(monkeypatch, parallel, **filters):
+    monkeypatch.setattr(finance, "AR_BOOK_PARALLEL", parallel)
+    args = {"org_id": 1, "branch_id": 1, "customer_id": 0, "from_date": None, "to_date": None}
+    args.update(filters)
+    return finance.fetch_ar_book(**args)
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"customer_id": 1},
+    {"from_date": "2026-01-02", "to_date": "2026-01-05"},
+])
+def test_parallel_and_union_paths_return_identical_rows(ar_book_db, monkeypatch, filters):
+    union_rows = _fetch(monkeypatch, False, **filters)
+    parallel_rows = _fetch(monkeypatch, True, **filters)
+    assert union_rows
+    assert parallel_rows == union_rows
+
+
+def test_rows_follow_collation_order_without_sort_keys(ar_book_db, monkeypatch):
+    rows = _fetch(monkeypatch, True)
+    names = [row["customer_name"] for row in rows]
+    # Case-insensitive order; Bravo and bravo share a weight and are split by customer_id
+    assert names == sorted(names, key=str.casefold)
+    assert [r["customer_id"] for r in rows if r["customer_name"].lower() == "bravo"] == sorted(
+        r["customer_id"] for r in rows if r["customer_name"].lower() == "bravo"
+    )
+    assert not any(column in row for row in rows for column in finance.AR_BOOK_SORT_COLUMNS)
+    # One ledger_date format whatever the source column type
+    assert {len(row["ledger_date"]) for row in rows} == {10}
@@ -0,0 +1,77 @@
+import pytest
+
+from app import crud
+
+FIN = crud.DB_NAME_FINANCE
+USR = crud.DB_NAME_USER_NEW
+
+
+@pytest.fixture
+def ar_rows(sql):
+    sql(f"INSERT INTO {USR}.tbl_salesinvoices_header (id, salesinvoicenbr) VALUES"
+        " (10, 'INV-10'), (11, 'INV-11'), (12, 'INV-12'), (13, 'INV-13'), (14, 'INV-14'), (15, 'INV-15')")
+    sql(f"INSERT INTO {USR}.tbl_salesinvoices_details (salesinvoicesheaderid, DOnumber) VALUES"
+        " (10, 'DO-10'), (10, 'DO-10b'), (11, 'DO-11'), (12, 'DO-12'), (13, 'DO-13'), (14, 'DO-14'), (15, 'DO-15')")
+    sql(f"INSERT INTO {FIN}.tbl_accounts_receivable (ar_id, invoice_no, invoice_id, customer_id) VALUES"
+        " (1, 'INV-10', 10, 1), (2, 'INV-11', 11, 1), (3, 'INV-12', 12, 2),"
+        " (4, 'INV-13', 13, 2), (5, 'INV-14', 14, 3), (6, 'INV-15', 15, 4)")
+
+
+def _update(run, finance_db, ar_ids, reference):
+    """Runs bulk_update_ar_reference; returns its result and the id list bound to each statement."""
+    bound = []
+
+    async def go():
+        async with finance_db() as db:
+            execute = db.execute
+
+            async def spy(statement, params=None, *args, **kwargs):
+                if params and "ids" in params:
+                    bound.append(list(params["ids"]))
+                return await execute(statement, params, *args, **kwargs)
+
+            db.execute = spy
+            return await crud.bulk_update_ar_reference(db, ar_ids, reference)
+
+    return run(go()), bound
+
+
+def test_renames_across_chunks_of_the_in_list(run, finance_db, sql, ar_rows, refreshed, monkeypatch):
+    monkeypatch.setattr(crud, "BULK_REFERENCE_CHUNK", 2)
+
+    result, bound = _update(run, finance_db, [1, 2, 3, 2, 4, 5], "REF-9")
+
+    # Every requested id is counted, as the per-id loop did; the repeated id is updated once
+    assert result == 6
+    chunks = [ids for i, ids in enumerate(bound) if i % 4 == 0]
+    assert chunks == [[1, 2], [3, 4], [5]]
+    assert all(len(ids) <= 2 for ids in bound)
+
+    assert sql(f"SELECT ar_id, invoice_no FROM {FIN}.tbl_accounts_receivable ORDER BY ar_id") == [
+        (1, "REF-9"), (2, "REF-9"), (3, "REF-9"), (4, "REF-9"), (5, "REF-9"), (6, "INV-15"),
+    ]
+    assert sql(f"SELECT id, salesinvoicenbr FROM {USR}.tbl_salesinvoices_header ORDER BY id") == [
+        (10, "REF-9"), (11, "REF-9"), (12, "REF-9"), (13, "REF-9"), (14, "REF-9"), (15, "INV-15"),
+    ]
+    assert sql(f"SELECT DOnumber FROM {USR}.tbl_salesinvoices_details ORDER BY rowid") == [
+        ("REF-9",), ("REF-9",), ("REF-9",), ("REF-9",), ("REF-9",), ("REF-9",), ("DO-15",),
+    ]
+    assert refreshed == [{1, 2, 3}]
+
+
+def test_empty_request_does_nothing(run, finance_db, refreshed):
+    assert _update(run, finance_db, [], "REF-9") == (0, [])
+    assert refreshed == []
+
+
+def test_failure_rolls_back_the_whole_request(run, finance_db, sql, ar_rows, refreshed, monkeypatch):
+    monkeypatch.setattr(crud, "BULK_REFERENCE_CHUNK", 2)
+    # Two headers cannot share a number here, so the header rename fails after the AR and DO writes
+    sql(f"CREATE UNIQUE INDEX {USR}.uq_nbr ON tbl_salesinvoices_header (salesinvoicenbr)")
+
+    result, _ = _update(run, finance_db, [1, 2, 3, 4, 5], "REF-9")
+
+    assert result == -1
+    assert sql(f"SELECT COUNT(*) FROM {FIN}.tbl_accounts_receivable WHERE invoice_no = 'REF-9'") == [(0,)]
+    assert sql(f"SELECT COUNT(*) FROM {USR}.tbl_salesinvoices_details WHERE DOnumber = 'REF-9'") == [(0,)]
+    assert refreshed == []
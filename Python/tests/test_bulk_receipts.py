@@ -0,0 +1,102 @@
+from datetime import date
+
+import pytest
+
+from app import crud, schemas
+from app.models.finance import ARReceipt
+
+FIN = crud.DB_NAME_FINANCE
+USR = crud.DB_NAME_USER_NEW
+
+
+@pytest.fixture
+def receipts(run, finance_db, sql):
+    async def add():
+        async with finance_db() as db:
+            db.add_all([
+                ARReceipt(receipt_id=1, receipt_date=date(2026, 1, 5), customer_id=1, pending_verification=True,
+                          reference_no="TRF 0105", created_by="7", created_ip="10.0.0.1"),
+                ARReceipt(receipt_id=2, receipt_date=date(2026, 1, 5), customer_id=1, pending_verification=False,
+                          is_submitted=True, created_by="7", created_ip="10.0.0.1"),
+                ARReceipt(receipt_id=3, receipt_date=date(2026, 1, 6), customer_id=2, pending_verification=True,
+                          created_by="7", created_ip="10.0.0.1"),
+            ])
+            await db.commit()
+
+    run(add())
+    sql(f"INSERT INTO {USR}.tbl_salesinvoices_header (id, salesinvoicenbr, customerid, PaidAmount) VALUES"
+        " (10, 'INV-10', 1, NULL), (11, 'INV-11', 3, 5)")
+    # Two AR rows for INV-10: allocations go to the first, as in the single-receipt path
+    sql(f"INSERT INTO {FIN}.tbl_accounts_receivable (ar_id, invoice_no, invoice_id, customer_id, inv_amount,"
+        " balance_amount, already_received) VALUES"
+        " (100, 'INV-10', 10, 1, 100, 100, 0), (101, 'INV-10', 10, 1, 100, 100, 0), (110, 'INV-11', 11, 3, 20, 15, 5)")
+
+
+def _item(receipt_id, *allocations, customer_id=0):
+    return schemas.BulkVerifyItem(
+        receipt_id=receipt_id, customer_id=customer_id, bank_charges=0, tax_deduction=0, user_id=9,
+        allocations=[
+            schemas.InvoiceAllocation(invoice_id=inv, invoice_no="", payment_type="full", amount_allocated=amount)
+            for inv, amount in allocations
+        ],
+    )
+
+
+def test_bulk_verify_codes_and_batched_writes(run, finance_db, sql, receipts, refreshed):
+    items = [
+        _item(1, (10, 40)),
+        _item(99, (10, 1)),
+        _item(2, (10, 1)),
+        _item(1, (10, 1)),
+        _item(3, (10, 10), (11, 5), (11, 0)),
+    ]
+
+    async def verify():
+        async with finance_db() as db:
+            return await crud.bulk_verify_receipts(db, items)
+
+    results = run(verify())
+
+    assert [r["code"] for r in results] == [
+        crud.BULK_OK_VERIFIED, crud.BULK_NOT_FOUND, crud.BULK_NOT_PENDING, crud.BULK_DUPLICATE, crud.BULK_OK_VERIFIED,
+    ]
+    assert sql(f"SELECT id, PaidAmount FROM {USR}.tbl_salesinvoices_header ORDER BY id") == [(10, 50), (11, 10)]
+    assert sql(f"SELECT receipt_id, ar_id, payment_amount FROM {FIN}.tbl_receipt_ag_ar ORDER BY receipt_id, ar_id") == [
+        (1, 100, 40), (3, 100, 10), (3, 110, 5),
+    ]
+    assert sql(f"SELECT ar_id, already_received, balance_amount FROM {FIN}.tbl_accounts_receivable ORDER BY ar_id") == [
+        (100, 50, 50), (101, 0, 100), (110, 10, 10),
+    ]
+    assert sql("SELECT receipt_id, pending_verification, ar_id, reference_no FROM tbl_ar_receipt ORDER BY receipt_id") == [
+        (1, 0, 100, "TRF 0105 (Inv: INV-10)"),
+        (2, 0, None, None),
+        (3, 0, 100, "(Inv: INV-10, INV-11)"),
+    ]
+    assert refreshed == [{1, 2, 3}]
+
+
+def test_bulk_verify_with_nothing_to_verify_writes_nothing(run, finance_db, sql, receipts, refreshed):
+    async def verify():
+        async with finance_db() as db:
+            return await crud.bulk_verify_receipts(db, [_item(2, (10, 5)), _item(98, (10, 5))])
+
+    assert [r["code"] for r in run(verify())] == [crud.BULK_NOT_PENDING, crud.BULK_NOT_FOUND]
+    assert sql(f"SELECT COUNT(*) FROM {FIN}.tbl_receipt_ag_ar") == [(0,)]
+    assert refreshed == []
+
+
+def test_bulk_submit_codes(run, finance_db, sql, receipts):
+    async def submit():
+        async with finance_db() as db:
+            return await crud.bulk_submit_receipts(db, [1, 2, 1, 99, 3])
+
+    assert [(r["receipt_id"], r["code"]) for r in run(submit())] == [
+        (1, crud.BULK_OK_SUBMITTED),
+        (2, crud.BULK_ALREADY_SUBMITTED),
+        (1, crud.BULK_DUPLICATE),
+        (99, crud.BULK_NOT_FOUND),
+        (3, crud.BULK_OK_SUBMITTED),
+    ]
+    assert sql("SELECT receipt_id, is_submitted, pending_verification FROM tbl_ar_receipt ORDER BY receipt_id") == [
+        (1, 1, 1), (2, 1, 0), (3, 1, 1),
+    ]
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app import data_versions as data_versions_module
+from app.cache import InvalidationBus, MemoryBackend, RedisBackend, check_backend
+from app.data_versions import BUS_KIND, DataVersions
+
+
+async def _wait_for(predicate, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() >= deadline:
+            raise AssertionError("timed out waiting for the invalidation to arrive")
+        await asyncio.sleep(0.01)
+
+
+def test_data_versions_bump_reaches_the_other_worker(monkeypatch):
+    async def scenario():
+        server = fakeredis.FakeServer()
+        sender = InvalidationBus(RedisBackend(client=fakeredis.aioredis.FakeRedis(server=server)), channel="test:invalidate", worker_id="worker-a")
+        receiver = InvalidationBus(RedisBackend(client=fakeredis.aioredis.FakeRedis(server=server)), channel="test:invalidate", worker_id="worker-b")
+
+        local, remote = DataVersions(), DataVersions()
+        sender.on(BUS_KIND, lambda tables: local.bump(*tables, broadcast=False))
+        receiver.on(BUS_KIND, lambda tables: remote.bump(*tables, broadcast=False))
+        # bump() publishes on the module-level bus; point it at worker A's
+        monkeypatch.setattr(data_versions_module, "bus", sender)
+
+        await sender.start()
+        await receiver.start()
+        try:
+            # Let both listeners subscribe before the first publish
+            await asyncio.sleep(0.1)
+            before = remote.snapshot(["tbl_accounts_receivable", "tbl_ar_receipt"])
+
+            local.bump("tbl_accounts_receivable", "tbl_ar_receipt")
+            await _wait_for(lambda: receiver.received == 1)
+
+            assert remote.snapshot(["tbl_accounts_receivable", "tbl_ar_receipt"]) == (before[0], 1, 1)
+            assert local.snapshot(["tbl_accounts_receivable"]) == (0, 1)
+            # The sender ignores its own message, so its counter is bumped once, not twice
+            assert sender.received == 0
+            assert sender.sent == 1
+
+            local.bump_all()
+            await _wait_for(lambda: receiver.received == 2)
+            assert remote.all_versions()["*"] == 1
+        finally:
+            await sender.stop()
+            await receiver.stop()
+            await sender.backend.close()
+            await receiver.backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_multiple_workers_require_a_shared_backend():
+    asyncio.run(check_backend(MemoryBackend(), workers=1))
+    with pytest.raises(RuntimeError, match="CACHE_BACKEND=redis"):
+        asyncio.run(check_backend(MemoryBackend(), workers=4))
+
+
+def test_unreachable_redis_fails_startup():
+    async def scenario():
+        reachable = RedisBackend(client=fakeredis.aioredis.FakeRedis())
+        await check_backend(reachable, workers=4)
+        await reachable.close()
+
+        server = fakeredis.FakeServer()
+        server.connected = False
+        down = RedisBackend(client=fakeredis.aioredis.FakeRedis(server=server))
+        with pytest.raises(RuntimeError, match="unreachable"):
+            await check_backend(down, workers=4)
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.data_versions import ALL_TABLES, DataVersions, instrument_engine, written_tables
+from app import data_versions as data_versions_module
+from app.sync_db import TracedConnection
+
+
+@pytest.mark.parametrize("statement, tables", [
+    ("SELECT * FROM tbl_invoice", set()),
+    ("INSERT INTO tbl_ar (id) VALUES (1)", {"tbl_ar"}),
+    ("INSERT IGNORE tbl_ar (id) VALUES (1)", {"tbl_ar"}),
+    ("REPLACE LOW_PRIORITY INTO `tbl_ar` VALUES (1)", {"tbl_ar"}),
+    ("INSERT INTO tbl_ar (id) SELECT id FROM tbl_invoice WHERE posted = 0", {"tbl_ar"}),
+    ("INSERT INTO finance_db.`tbl_AR` VALUES (1)", {"tbl_ar"}),
+    ("UPDATE finance_db.tbl_ar SET posted = 1", {"tbl_ar"}),
+    ("UPDATE `user_db`.`master_customer` c SET c.Balance = 0", {"master_customer"}),
+    (
+        "UPDATE tbl_receipt r JOIN tbl_ar a ON (a.receipt_id = r.id) "
+        "LEFT JOIN finance_db.tbl_bank b ON b.id = r.bank_id SET r.verified = 1",
+        {"tbl_receipt", "tbl_ar", "tbl_bank"},
+    ),
+    ("UPDATE tbl_a a, tbl_b b SET a.x = b.x WHERE a.id = b.id", {"tbl_a", "tbl_b"}),
+    (
+        "UPDATE tbl_ar SET total = (SELECT SUM(amount) FROM tbl_receipt) WHERE id IN (SELECT id FROM tbl_x)",
+        {"tbl_ar"},
+    ),
+    ("DELETE FROM tbl_ar WHERE id = 1", {"tbl_ar"}),
+    ("DELETE QUICK FROM finance_db.tbl_ar ORDER BY id LIMIT 5", {"tbl_ar"}),
+    (
+        "DELETE a, r FROM tbl_ar a JOIN tbl_receipt r ON r.id = a.receipt_id WHERE a.id = 1",
+        {"tbl_ar", "tbl_receipt"},
+    ),
+    ("DELETE FROM a USING tbl_ar AS a JOIN tbl_receipt r WHERE a.id = r.id", {"tbl_ar", "tbl_receipt"}),
+    ("CALL sp_post_invoices(1)", {ALL_TABLES}),
+    ("UPDATE SET x = 1", {ALL_TABLES}),
+    ("DELETE WHERE 1", {ALL_TABLES}),
+])
+def test_written_tables(statement, tables):
+    assert written_tables(statement) == tables
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    versions = DataVersions()
+    monkeypatch.setattr(data_versions_module, "data_versions", versions)
+    return versions
+
+
+def test_sqlalchemy_commit_bumps_and_rollback_does_not(versions):
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE tbl_ar (id INTEGER)"))
+    before = versions.snapshot(["tbl_ar"])
+
+    conn = engine.connect()
+    conn.execute(text("INSERT INTO tbl_ar VALUES (1)"))
+    conn.rollback()
+    conn.close()
+    assert versions.snapshot(["tbl_ar"]) == before
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO tbl_ar VALUES (2)"))
+    assert versions.snapshot(["tbl_ar"]) > before
+
+
+def test_sync_connection_commit_bumps_and_rollback_does_not(versions):
+    conn = TracedConnection(sqlite3.connect(":memory:"), "finance_db")
+    conn.cursor().execute("CREATE TABLE tbl_receipt (id INTEGER)", ())
+    conn.commit()
+    before = versions.snapshot(["tbl_receipt", "tbl_ar"])
+
+    conn.cursor().execute("INSERT INTO tbl_receipt VALUES (1)", ())
+    conn.rollback()
+    assert versions.snapshot(["tbl_receipt", "tbl_ar"]) == before
+
+    conn.cursor().execute("INSERT INTO tbl_receipt VALUES (2)", ())
+    conn.commit()
+    receipt, ar = versions.snapshot(["tbl_receipt", "tbl_ar"])[1:]
+    assert receipt == before[1] + 1 and ar == before[2]
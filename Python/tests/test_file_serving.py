@@ -0,0 +1,75 @@
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import attachment_store, file_serving
+from app.routers import download_file
+
+
+@pytest.fixture
+def attachment_root(tmp_path, monkeypatch):
+    root = tmp_path / "UploadedFiles"
+    (root / "ProcurementMemo" / "7").mkdir(parents=True)
+    (root / "ProcurementMemo" / "7" / "quote.pdf").write_bytes(b"%PDF-1.4 memo")
+    (tmp_path / "secret.env").write_text("DB_PASSWORD=hunter2")
+
+    monkeypatch.setattr(file_serving, "ATTACHMENT_ROOTS", [os.path.realpath(root)])
+    monkeypatch.setattr(file_serving, "_path_index", file_serving._PathIndex(16))
+    return root
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(download_file.router)
+    return TestClient(app)
+
+
+def test_resolves_files_inside_an_attachment_root(attachment_root):
+    path = str(attachment_root / "ProcurementMemo" / "7" / "quote.pdf")
+    assert file_serving.resolve_attachment_path(path) == path
+
+
+def test_content_root_relative_paths_resolve(attachment_root, monkeypatch):
+    # Memo rows store the path the .NET download-file endpoint joins onto its content root
+    monkeypatch.setattr(attachment_store, "DOTNET_CONTENT_ROOT", str(attachment_root.parent))
+    monkeypatch.setattr(file_serving, "DOTNET_CONTENT_ROOT", str(attachment_root.parent))
+    path = str(attachment_root / "ProcurementMemo" / "7" / "quote.pdf")
+
+    stored = attachment_store.content_root_path(path)
+    assert stored == "UploadedFiles/ProcurementMemo/7/quote.pdf"
+    assert file_serving.resolve_attachment_path(stored) == path
+    assert attachment_store.content_root_path("/elsewhere/quote.pdf") == "/elsewhere/quote.pdf"
+
+
+@pytest.mark.parametrize("requested", [
+    "Python/.env",
+    "/Python/.env",
+    "Python/app/main.py",
+    "{root}/../secret.env",
+    "{root}/ProcurementMemo/../../secret.env",
+    "{tmp}/secret.env",
+])
+def test_refuses_paths_outside_the_attachment_roots(attachment_root, requested):
+    requested = requested.format(root=attachment_root, tmp=attachment_root.parent)
+    assert file_serving.resolve_attachment_path(requested) is None
+
+
+def test_refuses_symlinks_out_of_a_root(attachment_root):
+    link = attachment_root / "ProcurementMemo" / "7" / "link.pdf"
+    link.symlink_to(attachment_root.parent / "secret.env")
+    assert file_serving.resolve_attachment_path(str(link)) is None
+
+
+def test_download_endpoint_returns_404_outside_the_roots(attachment_root, client):
+    for requested in ("Python/.env", f"{attachment_root}/../secret.env"):
+        response = client.get("/api/download_file/download", params={"file_path": requested})
+        assert response.status_code == 404
+        assert b"hunter2" not in response.content and b"DB_" not in response.content
+
+    inside = str(attachment_root / "ProcurementMemo" / "7" / "quote.pdf")
+    response = client.get("/api/download_file/download", params={"file_path": inside})
+    assert response.status_code == 200
+    assert response.content == b"%PDF-1.4 memo"
@@ -0,0 +1,85 @@
+import pytest
+
+from app import crud, schemas
+
+FIN = crud.DB_NAME_FINANCE
+USR = crud.DB_NAME_USER_NEW
+
+
+@pytest.fixture
+def invoices(sql):
+    # INV-A is split over two headers; INV-B is already on the AR book
+    sql(f"INSERT INTO {USR}.tbl_salesinvoices_header (id, salesinvoicenbr, Salesinvoicesdate, customerid,"
+        " TotalAmount, CalculatedPrice, isactive) VALUES"
+        " (10, 'INV-A', '2026-01-05', 1, 100, 1500000, 1), (11, 'INV-A', '2026-01-05', 1, 50, 750000, 1),"
+        " (12, 'INV-B', '2026-01-06', 2, 30, 30, 1), (13, 'INV-B', '2026-01-06', 2, 99, 99, 0),"
+        " (14, '', '2026-01-07', 2, 5, 5, 1)")
+    sql(f"INSERT INTO {USR}.tbl_salesinvoices_details (salesinvoicesheaderid, DOnumber, Currencyid) VALUES"
+        " (10, 'DO-1', 2), (11, NULL, 2), (12, '', 1)")
+    sql(f"INSERT INTO {USR}.master_customer (Id, CustomerName) VALUES (1, 'Acme')")
+    sql(f"INSERT INTO {FIN}.tbl_accounts_receivable (ar_id, invoice_no, invoice_id, customer_id, inv_amount,"
+        " balance_amount, already_received, is_active) VALUES"
+        " (500, 'INV-B', 12, 2, 20, 10, 10, 1), (501, 'DO-1', NULL, 1, 100, 100, 0, 1)")
+
+
+def _post(run, finance_db, invoice_ids):
+    request = schemas.PostInvoicesToARRequest(orgId=1, branchId=2, userId=7, invoiceIds=invoice_ids)
+
+    async def go():
+        async with finance_db() as db:
+            return await crud.post_invoices_to_ar(db, request)
+
+    return run(go())
+
+
+def test_posts_one_ar_row_per_invoice_number(run, finance_db, sql, invoices, refreshed):
+    outcomes = _post(run, finance_db, [10, 11, 12, 99, 14, 10])
+
+    assert [(o["invoice_id"], o["invoice_no"], o["code"]) for o in outcomes] == [
+        (10, "INV-A", crud.POST_INSERTED),
+        (11, "INV-A", crud.POST_UPDATED),
+        (12, "INV-B", crud.POST_UPDATED),
+        (99, None, crud.BULK_NOT_FOUND),
+        (14, None, crud.BULK_NOT_FOUND),
+    ]
+    assert sql(f"""
+        SELECT invoice_no, ar_no, invoice_id, customer_id, customer_name, inv_amount, balance_amount,
+               invoice_amt_idr, currencyid, orgid, branchid, created_by
+        FROM {FIN}.tbl_accounts_receivable WHERE invoice_no = 'INV-A'
+    """) == [("INV-A", "AR-INV-A", 10, 1, "Acme", 150, 150, 2250000, 2, 1, 2, 7)]
+    # Re-aggregated over the active headers only, keeping what was already received
+    assert sql(f"""
+        SELECT inv_amount, balance_amount, already_received, updated_by
+        FROM {FIN}.tbl_accounts_receivable WHERE invoice_no = 'INV-B'
+    """) == [(30, 20, 10, 7)]
+    assert sql(f"SELECT is_active FROM {FIN}.tbl_accounts_receivable WHERE ar_id = 501") == [(0,)]
+    assert sql(f"SELECT id, IsAR FROM {USR}.tbl_salesinvoices_header ORDER BY id") == [
+        (10, 1), (11, 1), (12, 1), (13, 0), (14, 0),
+    ]
+    assert refreshed == [{1, 2}]
+
+
+def test_posting_again_updates_instead_of_inserting(run, finance_db, sql, invoices, refreshed):
+    _post(run, finance_db, [10])
+    outcomes = _post(run, finance_db, [11, 10])
+
+    assert [o["code"] for o in outcomes] == [crud.POST_UPDATED, crud.POST_UPDATED]
+    assert sql(f"SELECT COUNT(*) FROM {FIN}.tbl_accounts_receivable WHERE invoice_no = 'INV-A'") == [(1,)]
+
+
+def test_nothing_to_post(run, finance_db, sql, invoices, refreshed):
+    assert _post(run, finance_db, []) == []
+    assert [o["code"] for o in _post(run, finance_db, [99])] == [crud.BULK_NOT_FOUND]
+    assert refreshed == []
+
+
+def test_failure_returns_none_and_rolls_back(run, finance_db, sql, invoices, refreshed):
+    # The insert reads the details table; without it the batch fails after updating INV-B
+    sql(f"DROP TABLE {USR}.tbl_salesinvoices_details")
+
+    assert _post(run, finance_db, [10, 12]) is None
+
+    assert sql(f"SELECT inv_amount, updated_by FROM {FIN}.tbl_accounts_receivable WHERE ar_id = 500") == [(20, None)]
+    assert sql(f"SELECT COUNT(*) FROM {FIN}.tbl_accounts_receivable WHERE invoice_no = 'INV-A'") == [(0,)]
+    assert sql(f"SELECT COUNT(*) FROM {USR}.tbl_salesinvoices_header WHERE IsAR = 1") == [(0,)]
+    assert refreshed == []
@@ -0,0 +1,30 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.routers import procurement_memo
+
+
+class _Session:
+    def __init__(self):
+        self.rolled_back = False
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+def test_rejected_upload_returns_its_error_status():
+    session = _Session()
+    app = FastAPI()
+    app.include_router(procurement_memo.router)
+    app.dependency_overrides[get_db] = lambda: session
+
+    response = TestClient(app).post(
+        f"{procurement_memo.router.prefix}/upload-doc",
+        data={"memoid": "7", "BranchId": "1", "UserId": "1"},
+        files={"file": ("payload.exe", b"MZ", "application/octet-stream")},
+    )
+
+    assert response.status_code == 415
+    assert response.json()["Status"] is False
+    assert session.rolled_back
@@ -0,0 +1,35 @@
+from decimal import Decimal
+
+from app.routers.invoice_api import enrich_sales_rows
+
+CUSTOMERS = {1: {"CustomerName": " bravo ", "SalesPersonId": 4}, 2: {"CustomerName": "Alpha", "SalesPersonId": 5}}
+CURRENCIES = {1: {"CurrencyCode": "IDR", "ExchangeRate": Decimal("1")}, 2: {"CurrencyCode": "USD", "ExchangeRate": Decimal("15000")}}
+
+
+def _row(detail_id, customer_id, currency_id, total, invoice_no):
+    return {
+        "DetailId": detail_id, "Salesinvoicesdate": "2026-01-05", "customerid": customer_id, "Currencyid": currency_id,
+        "InvoiceNo": invoice_no, "DONumber": "", "ItemName": "Item", "Qty": 1, "UnitPrice": total,
+        "OriginalTotal": total,
+    }
+
+
+def test_enriches_names_and_currency_and_sorts_by_name():
+    rows = [
+        _row(1, 1, 1, Decimal("10"), "INV-1"),
+        _row(2, 9, None, Decimal("5"), "INV-2"),
+        _row(3, 2, 2, Decimal("2"), "INV-3"),
+        _row(4, 1, 2, Decimal("1"), "INV-4"),
+    ]
+
+    enriched = enrich_sales_rows(rows, CUSTOMERS, CURRENCIES)
+
+    assert [(r["DetailId"], r["CustomerName"], r["InvoiceCurrency"], r["ConvertedTotal"]) for r in enriched] == [
+        (3, "Alpha", "USD", Decimal("30000")),
+        # Same customer keeps the SQL order (date, invoice number)
+        (1, "bravo", "IDR", Decimal("10")),
+        (4, "bravo", "USD", Decimal("15000")),
+        # Unknown customer and currency, as the LEFT JOINs returned them
+        (2, "Unknown", None, Decimal("5")),
+    ]
+    assert "customerid" not in enriched[0] and "Currencyid" not in enriched[0]